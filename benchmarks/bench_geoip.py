@@ -0,0 +1,67 @@
+"""Microbenchmark: local GeoIP range table compile, open and lookup times.
+
+Writes a synthetic DB-IP style CSV dump with the given number of IPv4
+ranges (and a tenth as many IPv6 ranges), compiles it into a range table,
+then times opening the memory-mapped table and looking up random
+addresses.
+
+Usage:
+    python benchmarks/bench_geoip.py [--ranges N] [--lookups N]
+"""
+import argparse
+import ipaddress
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from honeypot.core.geoip import RangeTable
+
+def write_dump(path: Path, ranges: int):
+    """Write evenly spread IPv4 ranges and a tenth as many IPv6 /64 ranges."""
+    step4 = (1 << 32) // ranges
+    with open(path, 'w') as f:
+        for i in range(ranges):
+            start = i * step4
+            f.write(f"{ipaddress.IPv4Address(start)},{ipaddress.IPv4Address(start + step4 - 2)},EU,DE,"
+                    f"Region {i % 500},City {i % 20000},{(i % 180) - 90}.5,{(i % 360) - 180}.25\n")
+        for i in range(ranges // 10):
+            start = (0x2001 << 112) | (i << 64)
+            f.write(f"{ipaddress.IPv6Address(start)},{ipaddress.IPv6Address(start + (1 << 64) - 1)},EU,FR,"
+                    f"Region {i % 100},City {i % 5000},48.85,2.35\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the local GeoIP range table")
+    parser.add_argument('--ranges', type=int, default=1000000, help='IPv4 ranges in the dump')
+    parser.add_argument('--lookups', type=int, default=200000, help='Addresses to look up')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = Path(directory) / 'dump.csv'
+        write_dump(source, args.ranges)
+        print(f"Dump: {source.stat().st_size / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        RangeTable.open(source).close()
+        print(f"First open (compiles): {time.perf_counter() - start:.2f} s")
+
+        start = time.perf_counter()
+        table = RangeTable.open(source)
+        print(f"Open compiled table:   {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        random.seed(1)
+        addresses = [str(ipaddress.IPv4Address(random.getrandbits(32))) for _ in range(args.lookups)]
+        addresses6 = [str(ipaddress.IPv6Address((0x2001 << 112) | random.randrange(args.ranges // 10) << 64
+                                                | random.getrandbits(64))) for _ in range(args.lookups // 10)]
+        for name, sample in (("IPv4", addresses), ("IPv6", addresses6)):
+            start = time.perf_counter()
+            found = sum(1 for ip in sample if table.lookup(ip))
+            elapsed = time.perf_counter() - start
+            print(f"{name} lookups: {elapsed / len(sample) * 1e6:.2f} us each, {found}/{len(sample)} found")
+        table.close()
+
+if __name__ == '__main__':
+    main()
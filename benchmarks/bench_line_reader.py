@@ -0,0 +1,96 @@
+"""Microbenchmark: byte-at-a-time recv versus the buffered LineReader.
+
+Feeds credential-stuffing style traffic (USER/PASS line pairs) through a
+socketpair and counts the recv() syscalls each reader needs.
+
+Usage:
+    python benchmarks/bench_line_reader.py [--lines N]
+"""
+import argparse
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from honeypot.core.line_reader import LineReader
+
+class CountingSocket:
+    """Socket wrapper that counts recv() calls."""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.recv_calls = 0
+
+    def recv(self, bufsize: int) -> bytes:
+        self.recv_calls += 1
+        return self.sock.recv(bufsize)
+
+def legacy_read_line(sock) -> bytes:
+    """The previous BaseHoneypot._read_line loop (one recv per byte)."""
+    buffer = bytearray()
+    while True:
+        data = sock.recv(1)
+        if not data:
+            break
+        if data == b'\r':
+            next_char = sock.recv(1)
+            if next_char == b'\n':
+                return bytes(buffer)
+            buffer.extend(data)
+            if next_char:
+                buffer.extend(next_char)
+        elif data == b'\n':
+            return bytes(buffer)
+        else:
+            buffer.extend(data)
+    return bytes(buffer)
+
+def make_payload(lines: int) -> bytes:
+    """Build alternating USER/PASS lines like a credential stuffing client."""
+    out = bytearray()
+    for i in range(lines // 2):
+        out += b'USER admin%d\r\nPASS hunter2-%d\r\n' % (i, i)
+    return bytes(out)
+
+def run(name: str, payload: bytes, read_all) -> None:
+    """Send the payload through a socketpair and time the reader."""
+    server, client = socket.socketpair()
+    sender = threading.Thread(target=lambda: (client.sendall(payload), client.close()))
+    counting = CountingSocket(server)
+    sender.start()
+    start = time.perf_counter()
+    lines = read_all(counting)
+    elapsed = time.perf_counter() - start
+    sender.join()
+    server.close()
+    print(f"{name:<10} lines={lines:<8} recv_calls={counting.recv_calls:<10} "
+          f"recv/line={counting.recv_calls / max(lines, 1):<8.2f} time={elapsed * 1000:.1f}ms")
+
+def read_all_legacy(sock) -> int:
+    count = 0
+    while legacy_read_line(sock):
+        count += 1
+    return count
+
+def read_all_buffered(sock) -> int:
+    reader = LineReader(sock)
+    count = 0
+    while reader.readline():
+        count += 1
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=20000, help='Number of lines to send')
+    args = parser.parse_args()
+
+    payload = make_payload(args.lines)
+    print(f"Payload: {args.lines} lines, {len(payload)} bytes")
+    run('legacy', payload, read_all_legacy)
+    run('buffered', payload, read_all_buffered)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Benchmark: SQLite capture throughput and dashboard latency by connection profile.
+
+Runs the same workload against two engine setups on a fresh database:
+
+    legacy  rollback journal, one 20+30 QueuePool shared by writes and reads
+    tuned   WAL profile from honeypot.database.models: one writer connection
+            and a pool of read-only connections
+
+Capture threads push login attempts through an AttemptWriter at a fixed
+offered rate (0 for as fast as possible) while reader threads run the
+dashboard's queries in a loop. Reports inserts per second, commit latency,
+query latency percentiles and failed queries (such as "database is locked").
+
+Usage:
+    python benchmarks/bench_sqlite_profile.py [--seconds N] [--rate N] [--producers N] [--readers N]
+"""
+import argparse
+import logging
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from honeypot.database.models import Base, LoginAttempt, Protocol, create_sqlite_engines, query_client_ips
+from honeypot.database.writer import AttemptWriter
+
+def legacy_engines(url: str):
+    """The engine models.py created before the SQLite profile."""
+    engine = create_engine(url, connect_args={"check_same_thread": False}, poolclass=QueuePool,
+                           pool_size=20, max_overflow=30, pool_timeout=60)
+    return engine, engine
+
+def dashboard_queries(session):
+    """The queries behind the dashboard's first load and the IP export."""
+    session.query(LoginAttempt).order_by(LoginAttempt.timestamp.desc()).limit(100).all()
+    session.query(func.count(LoginAttempt.id)).scalar()
+    query_client_ips(session).count()
+    session.rollback()
+
+def run(name: str, make_engines, seconds: float, rate: float, producers: int, readers: int, preload: int):
+    """Time capture and dashboard queries against one engine setup."""
+    url = f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench.db'}"
+    writer_engine, reader_engine = make_engines(url)
+    Base.metadata.create_all(writer_engine)
+    Reads = sessionmaker(bind=reader_engine)
+
+    writer = AttemptWriter(sessionmaker(bind=writer_engine, expire_on_commit=False))
+    for i in range(preload):
+        writer.write(LoginAttempt, protocol=Protocol.SSH, username=f"user{i}", password="pw",
+                     client_ip=f"10.{i % 256}.{i // 256 % 256}.1")
+    writer.flush()
+    written_before = writer.get_stats()['rows_written']
+
+    stop = threading.Event()
+    latencies = []
+    failures = [0]
+
+    def produce(index: int):
+        interval = producers / rate if rate else 0
+        next_write = time.perf_counter()
+        i = 0
+        while not stop.is_set():
+            writer.write(LoginAttempt, protocol=Protocol.SSH, username=f"user{index}-{i}", password="pw",
+                         client_ip=f"192.0.2.{i % 250}")
+            i += 1
+            if interval:
+                next_write += interval
+                delay = next_write - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+    def read():
+        while not stop.is_set():
+            session = Reads()
+            start = time.perf_counter()
+            try:
+                dashboard_queries(session)
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception:
+                failures[0] += 1
+            finally:
+                session.close()
+
+    threads = [threading.Thread(target=produce, args=(i,)) for i in range(producers)]
+    threads += [threading.Thread(target=read) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    writer.stop()
+
+    stats = writer.get_stats()
+    inserted = stats['rows_written'] - written_before
+    p50 = statistics.median(latencies) if latencies else float('nan')
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) >= 20 else float('nan')
+    print(f"{name:<7} inserts/s={inserted / seconds:<9.0f} dropped={stats['rows_dropped']:<6} "
+          f"avg_commit={stats['avg_commit_ms']:<7}ms queries={len(latencies):<6} "
+          f"p50={p50:.1f}ms p95={p95:.1f}ms failed_queries={failures[0]}")
+    writer_engine.dispose()
+    reader_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10, help='Duration of each run')
+    parser.add_argument('--rate', type=float, default=2000, help='Offered login attempts per second, 0 for unlimited')
+    parser.add_argument('--producers', type=int, default=8, help='Threads capturing login attempts')
+    parser.add_argument('--readers', type=int, default=4, help='Threads running dashboard queries')
+    parser.add_argument('--preload', type=int, default=50000, help='Rows written before timing starts')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    for name, make_engines in (('legacy', legacy_engines), ('tuned', create_sqlite_engines)):
+        run(name, make_engines, args.seconds, args.rate, args.producers, args.readers, args.preload)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark: SSH handshakes per second by host key type and handshake workers.
+
+Starts the SSH honeypot on a local port, offering one host key type at a
+time, and drives password logins at it from client processes, so
+client-side crypto does not share the server's GIL. Compare key types to
+pick a cheap signature algorithm, and runs with different --workers values
+on a multi-core machine.
+
+Usage:
+    python benchmarks/bench_ssh_handshakes.py [--key-types T ...] [--workers N]
+                                              [--connections N] [--clients N]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def login(port: int) -> bool:
+    """Complete one handshake and password login against the honeypot."""
+    import paramiko
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    try:
+        client.connect('127.0.0.1', port, username='root', password='123456',
+                       look_for_keys=False, allow_agent=False, timeout=30)
+        return True
+    except Exception:
+        return False
+    finally:
+        client.close()
+
+def run(key_type: str, workers: int, connections: int, clients: int):
+    """Start a honeypot offering one host key type and time logins against it.
+
+    Runs in its own process, because the honeypot reads its configuration
+    from the environment at import time.
+    """
+    warnings.simplefilter('ignore')
+    logging.basicConfig(level=logging.WARNING)
+
+    from honeypot.core.ssh_server import SSHHoneypot
+    from honeypot.database.models import init_db
+    init_db()
+
+    # Keys are generated before timing starts, as on any start after the first
+    port = free_port()
+    server = SSHHoneypot(host='127.0.0.1', port=port)
+    threading.Thread(target=server.start, daemon=True).start()
+    # Give the listener and any handshake workers time to come up
+    time.sleep(3)
+
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(clients) as pool:
+        pool.map(login, [port] * clients)  # warm up the client processes
+        start = time.perf_counter()
+        results = pool.map(login, [port] * connections, chunksize=1)
+        elapsed = time.perf_counter() - start
+
+    print(f"key={key_type:<10} workers={workers:<3} cpus={os.cpu_count():<3} clients={clients:<4} "
+          f"ok={sum(results)}/{connections:<6} time={elapsed:.2f}s "
+          f"handshakes/s={sum(results) / elapsed:.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--key-types', nargs='+', default=['ed25519', 'ecdsa-256', 'ecdsa-521', 'rsa'],
+                        help='Host key types to compare')
+    parser.add_argument('--workers', type=int, default=0, help='SSH_HANDSHAKE_WORKERS for the server')
+    parser.add_argument('--connections', type=int, default=200, help='Number of logins per key type')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent client processes')
+    args = parser.parse_args()
+
+    scratch = Path(tempfile.mkdtemp())
+    os.environ['DATABASE_URL'] = f'sqlite:///{scratch / "bench.db"}'
+    os.environ['SSH_HOST_KEY_DIR'] = str(scratch / 'keys')
+    os.environ['SSH_HANDSHAKE_WORKERS'] = str(args.workers)
+    os.environ['MAX_THREADS'] = str(max(50, args.clients * 2))
+    os.environ['MAX_CONNECTIONS_PER_IP'] = str(args.connections + args.clients)
+    os.environ['LOG_LEVEL'] = 'WARNING'
+    os.environ['PYTHONWARNINGS'] = 'ignore'
+
+    context = multiprocessing.get_context('spawn')
+    for key_type in args.key_types:
+        os.environ['SSH_HOST_KEY_TYPES'] = key_type
+        process = context.Process(target=run, args=(key_type, args.workers, args.connections, args.clients))
+        process.start()
+        process.join()
+
+if __name__ == '__main__':
+    main()
@@ -3,8 +3,18 @@
 # Exit on error
 set -e
 
-# Create logs directory if it doesn't exist
-mkdir -p logs
+# Create logs, SSH host key and data directories if they don't exist
+mkdir -p logs ssh_host_keys data
+
+# The database used to be mounted as a single file; move it into the data directory
+if [ -f honeypot.db ] && [ ! -e data/honeypot.db ]; then
+    echo "Moving honeypot.db into data/..."
+    for file in honeypot.db honeypot.db-wal honeypot.db-shm; do
+        if [ -f "$file" ]; then
+            mv "$file" data/
+        fi
+    done
+fi
 
 echo "Starting SSH Honeypot container..."
 
@@ -26,7 +36,8 @@ docker run -d \
     -p 3306:3306 \
     -p 8080:8080 \
     -v "$(pwd)/logs:/app/logs" \
-    -v "$(pwd)/honeypot.db:/app/honeypot.db" \
+    -v "$(pwd)/data:/app/data" \
+    -v "$(pwd)/ssh_host_keys:/app/ssh_host_keys" \
     ssh-honeypot
 
 echo "Container started successfully!"
@@ -0,0 +1,126 @@
+"""Asyncio listener engine for honeypot servers."""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Any, Optional, TYPE_CHECKING
+from honeypot.core.geolocation import geolocation_service
+from honeypot.core.config import ASYNC_BLOCKING_WORKERS, MAX_LINE_LENGTH
+
+if TYPE_CHECKING:
+    from honeypot.core.base_server import BaseHoneypot
+
+logger = logging.getLogger(__name__)
+
+class AsyncEngine:
+    """Runs asyncio honeypot listeners on a single background event loop."""
+    
+    def __init__(self, blocking_workers: int = ASYNC_BLOCKING_WORKERS):
+        """Initialize the engine.
+        
+        The event loop thread is started lazily by the first server that
+        uses the engine.
+        
+        Args:
+            blocking_workers: Number of threads used for blocking calls
+        """
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=blocking_workers,
+            thread_name_prefix="async-blocking"
+        )
+    
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the shared event loop thread if it is not running yet."""
+        with self._loop_lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self.loop.run_forever,
+                    name="Async-Engine-Loop",
+                    daemon=True
+                )
+                self._loop_thread.start()
+                logger.info("Started asyncio listener engine")
+            return self.loop
+    
+    def serve(self, server: 'BaseHoneypot') -> None:
+        """Serve a honeypot on the shared event loop.
+        
+        Blocks the calling thread for as long as the listener runs, which
+        matches the behaviour of BaseHoneypot.start() for threaded servers.
+        
+        Args:
+            server: The honeypot server to serve
+        """
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self._serve(server), loop)
+        future.result()
+    
+    async def _serve(self, server: 'BaseHoneypot') -> None:
+        """Bind the server's port and accept connections forever."""
+        listener = await asyncio.start_server(
+            lambda reader, writer: self._handle_connection(server, reader, writer),
+            host=server.host,
+            port=server.port,
+            reuse_address=True,
+            reuse_port=server.reuse_port or None,
+            backlog=100,
+            limit=MAX_LINE_LENGTH
+        )
+        logger.info(f"{server.protocol.value.upper()} Honeypot listening on "
+                   f"{server.host}:{server.port} (asyncio engine)")
+        async with listener:
+            await listener.serve_forever()
+    
+    async def _handle_connection(self, server: 'BaseHoneypot',
+                                 reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter) -> None:
+        """Apply per-IP limits and run the server's async client handler."""
+        peername = writer.get_extra_info('peername')
+        client_ip = peername[0] if peername else 'unknown'
+        
+        # Share the per-IP connection limits and deadlines with the threaded engine
+        loop = asyncio.get_running_loop()
+        handle = server.thread_manager.acquire_connection(
+            client_ip, lambda: loop.call_soon_threadsafe(writer.transport.abort)
+        )
+        if handle is None:
+            writer.close()
+            return
+        
+        # Each connection runs in its own task, so the binding is per connection
+        server.thread_manager.bind_connection(handle)
+        try:
+            # Prefetch geolocation data for the client as soon as they connect
+            geolocation_service.prefetch_location(client_ip)
+            await server._handle_client_async(reader, writer, client_ip)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            logger.debug(f"Connection from {client_ip} closed or timed out")
+        except Exception as e:
+            logger.error(f"Error handling client {client_ip}: {str(e)}")
+        finally:
+            server.thread_manager.release_connection(handle)
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+    
+    async def run_blocking(self, func: Callable, *args) -> Any:
+        """Run a blocking function in the engine's executor.
+        
+        Args:
+            func: The function to call
+            *args: Arguments to pass to the function
+        
+        Returns:
+            The function's return value
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+# Create a singleton instance
+async_engine = AsyncEngine()
@@ -1,30 +1,173 @@
 """Base Honeypot server implementation."""
 import socket
-import threading
 import logging
 import asyncio
 from abc import ABC, abstractmethod
-from typing import Optional, Dict
-from honeypot.database.models import LoginAttempt, get_db, Protocol
-from honeypot.web.app import broadcast_attempt
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from typing import Optional, Dict, Callable, List
+from honeypot.database.models import LoginAttempt, ScanProbe, Protocol
+from honeypot.database.writer import attempt_deduplicator, attempt_enricher, attempt_writer
+from honeypot.web.app import broadcast_attempt, broadcast_attempt_enriched, broadcast_attempt_hits, schedule_broadcast
 from honeypot.core.geolocation import geolocation_service
-from honeypot.core.thread_manager import ThreadManager
-from honeypot.core.config import (
-    MAX_THREADS, MAX_CONNECTIONS_PER_IP, CONNECTION_TIMEOUT, MAX_QUEUED_CONNECTIONS
-)
+from honeypot.core.thread_manager import thread_manager
+from honeypot.core.async_engine import async_engine
+from honeypot.core.line_reader import LineReader, LineTooLongError
+from honeypot.core.config import CONNECTION_TIMEOUT, ASYNC_PROTOCOLS
 
 logger = logging.getLogger(__name__)
 
+# Receives every login attempt as (protocol, username, password, client_ip).
+# None stores attempts in this process; prefork workers forward them instead.
+_attempt_sink: Optional[Callable[[Protocol, str, str, str], None]] = None
+
+# Receives every scan probe as (protocol, client_ip, kind, payload), like _attempt_sink
+_probe_sink: Optional[Callable[[Protocol, str, str, str], None]] = None
+
+def set_attempt_sink(sink: Optional[Callable[[Protocol, str, str, str], None]]):
+    """Send login attempts to a callable instead of storing them in this process.
+    
+    Args:
+        sink: Function called with (protocol, username, password, client_ip), or None to store locally
+    """
+    global _attempt_sink
+    _attempt_sink = sink
+
+def set_probe_sink(sink: Optional[Callable[[Protocol, str, str, str], None]]):
+    """Send scan probes to a callable instead of storing them in this process.
+    
+    Args:
+        sink: Function called with (protocol, client_ip, kind, payload), or None to store locally
+    """
+    global _probe_sink
+    _probe_sink = sink
+
+def store_attempt(protocol: Protocol, username: str, password: str, client_ip: str):
+    """Queue a login attempt for the database writer.
+    
+    The attempt is broadcast to WebSocket clients once its batch is committed.
+    Repeats of an attempt within DEDUP_WINDOW are only counted on it, without
+    a geolocation lookup or a row of their own. An attempt from an address
+    that is not located yet is stored without a location, and the enricher
+    fills it in once the lookup finishes.
+    
+    Args:
+        protocol: The protocol the attempt was made over
+        username: The attempted username
+        password: The attempted password
+        client_ip: The client's IP address
+    """
+    # Clients can send a password before a username, or commands without an argument
+    username = username if username is not None else ''
+    password = password if password is not None else ''
+    timestamp = datetime.now(ZoneInfo("UTC"))
+    if not attempt_deduplicator.admit(protocol, username, password, client_ip, timestamp):
+        return
+    
+    # Usually cached by now due to prefetching, and never waited for
+    known, location = geolocation_service.peek_location(client_ip)
+    
+    written = attempt_writer.write(
+        LoginAttempt,
+        protocol=protocol,
+        username=username,
+        password=password,
+        client_ip=client_ip,
+        timestamp=timestamp,
+        latitude=location['latitude'] if location else None,
+        longitude=location['longitude'] if location else None,
+        country=location['country'] if location else None,
+        city=location['city'] if location else None,
+        region=location['region'] if location else None
+    )
+    if written and not known:
+        # Queued after the row, so the row is in the database when the location is written
+        geolocation_service.get_location_async(client_ip, attempt_enricher.expect(client_ip))
+
+def _broadcast_attempts(rows: List):
+    """Broadcast newly committed login attempts to WebSocket clients."""
+    attempts = [row.to_dict() for row in rows if isinstance(row, LoginAttempt)]
+    if not attempts:
+        return
+    
+    async def broadcast_all():
+        for attempt in attempts:
+            await broadcast_attempt(attempt)
+    
+    schedule_broadcast(broadcast_all())
+
+attempt_writer.add_listener(_broadcast_attempts)
+
+def _broadcast_hits(totals: List[Dict]):
+    """Broadcast new hit counts of deduplicated attempts to WebSocket clients."""
+    schedule_broadcast(broadcast_attempt_hits(totals))
+
+attempt_deduplicator.add_listener(_broadcast_hits)
+
+def _broadcast_enriched(enriched: List[Dict]):
+    """Broadcast locations filled in on stored attempts to WebSocket clients."""
+    schedule_broadcast(broadcast_attempt_enriched(enriched))
+
+attempt_enricher.add_listener(_broadcast_enriched)
+
+def record_attempt(protocol: Protocol, username: str, password: str, client_ip: str):
+    """Store a login attempt, or hand it to the attempt sink if one is set.
+    
+    Args:
+        protocol: The protocol the attempt was made over
+        username: The attempted username
+        password: The attempted password
+        client_ip: The client's IP address
+    """
+    if _attempt_sink is not None:
+        _attempt_sink(protocol, username, password, client_ip)
+    else:
+        store_attempt(protocol, username, password, client_ip)
+
+def store_probe(protocol: Protocol, client_ip: str, kind: str, payload: str):
+    """Queue a scan probe for the database writer.
+    
+    Probes are not geolocated or broadcast, so they stay cheap to record.
+    
+    Args:
+        protocol: The protocol whose port was probed
+        client_ip: The client's IP address
+        kind: How the probe was classified
+        payload: The first bytes the client sent, escaped as text
+    """
+    attempt_writer.write(
+        ScanProbe, protocol=protocol, client_ip=client_ip, kind=kind, payload=payload,
+        timestamp=datetime.now(ZoneInfo("UTC"))
+    )
+
+def record_probe(protocol: Protocol, client_ip: str, kind: str, payload: str = ''):
+    """Store a scan probe, or hand it to the probe sink if one is set.
+    
+    Args:
+        protocol: The protocol whose port was probed
+        client_ip: The client's IP address
+        kind: How the probe was classified
+        payload: The first bytes the client sent, escaped as text
+    """
+    if _probe_sink is not None:
+        _probe_sink(protocol, client_ip, kind, payload)
+    else:
+        store_probe(protocol, client_ip, kind, payload)
+
 class BaseHoneypot(ABC):
     """Abstract base class for honeypot servers."""
     
-    # Create a shared thread manager for all honeypot instances
-    thread_manager = ThreadManager(
-        max_workers=MAX_THREADS,
-        max_connections_per_ip=MAX_CONNECTIONS_PER_IP,
-        connection_timeout=CONNECTION_TIMEOUT,
-        max_queued_connections=MAX_QUEUED_CONNECTIONS
-    )
+    # Shared thread manager for all honeypot instances
+    thread_manager = thread_manager
+    
+    # Servers that implement _handle_client_async can run on the asyncio engine
+    supports_async = False
+    
+    # Workers this protocol may use while other protocols are waiting (None for no limit)
+    worker_quota: Optional[int] = None
+    
+    # Bind with SO_REUSEPORT so several processes can share the listening ports
+    reuse_port = False
     
     def __init__(self, host: str, port: int, protocol: Protocol):
         """Initialize the honeypot server.
@@ -40,11 +183,22 @@ class BaseHoneypot(ABC):
         self.server_socket = None
         logger.debug(f"Initialized {self.__class__.__name__} on {host}:{port}")
 
+    @property
+    def uses_async_engine(self) -> bool:
+        """Whether this server is configured to run on the asyncio engine."""
+        return self.supports_async and self.protocol.value in ASYNC_PROTOCOLS
+
     def start(self):
         """Start the honeypot server."""
+        if self.uses_async_engine:
+            async_engine.serve(self)
+            return
+        
         try:
             self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if self.reuse_port:
+                self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
             self.server_socket.bind((self.host, self.port))
             self.server_socket.listen(100)
             
@@ -63,7 +217,8 @@ class BaseHoneypot(ABC):
                     
                     # Submit the connection to the thread manager instead of creating a new thread
                     if not self.thread_manager.submit_connection(
-                        self._handle_client, client_address[0], client_socket, client_address[0]
+                        self._handle_client, client_address[0], client_socket, client_address[0],
+                        client_socket=client_socket, pool=self.protocol.value
                     ):
                         # If connection was rejected (e.g., too many connections from this IP)
                         try:
@@ -96,8 +251,21 @@ class BaseHoneypot(ABC):
         """
         pass
 
+    async def _handle_client_async(self, reader: asyncio.StreamReader,
+                                   writer: asyncio.StreamWriter, client_ip: str):
+        """Handle an individual client connection on the asyncio engine.
+        
+        Servers that set supports_async must implement this method.
+        
+        Args:
+            reader: The client's stream reader
+            writer: The client's stream writer
+            client_ip: The client's IP address
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} does not support the asyncio engine")
+
     def _log_attempt(self, username: str, password: str, client_ip: str):
-        """Log a login attempt to the database and broadcast to WebSocket clients.
+        """Log a login attempt and store it, or hand it to the attempt sink if one is set.
         
         Args:
             username: The attempted username
@@ -110,86 +278,74 @@ class BaseHoneypot(ABC):
         logger.info(f"{self.protocol.value.upper()} login attempt from {client_ip}: "
                    f"Username: {username}, Password: {password}")
         
-        # Get geolocation data - should be cached by now due to prefetching
-        location = geolocation_service.get_location(client_ip)
+        record_attempt(self.protocol, username, password, client_ip)
+
+    def _line_reader(self, client_socket: socket.socket, client_ip: str) -> LineReader:
+        """Create a buffered line reader for a client connection.
         
-        db = None
-        try:
-            # Get a database session
-            db_generator = get_db()
-            db = next(db_generator)
-            
-            attempt = LoginAttempt(
-                protocol=self.protocol,
-                username=username,
-                password=password,
-                client_ip=client_ip,
-                latitude=location['latitude'] if location else None,
-                longitude=location['longitude'] if location else None,
-                country=location['country'] if location else None,
-                city=location['city'] if location else None,
-                region=location['region'] if location else None
-            )
-            db.add(attempt)
-            db.commit()
-            
-            # Broadcast to WebSocket clients
-            attempt_dict = attempt.to_dict()
-            threading.Thread(target=lambda: asyncio.run(broadcast_attempt(attempt_dict))).start()
+        Activity is reported once per received chunk rather than once per
+        line, straight to the connection's handle when called from a handler.
+        
+        Args:
+            client_socket: The client's socket connection
+            client_ip: The client's IP address
             
-        except Exception as e:
-            logger.error(f"Failed to log login attempt: {str(e)}")
-            # Rollback transaction in case of error
-            if db:
-                try:
-                    db.rollback()
-                except Exception as rollback_err:
-                    logger.error(f"Failed to rollback transaction: {str(rollback_err)}")
-        finally:
-            # Always ensure the session is closed and removed from registry
-            if db:
-                try:
-                    db.close()
-                    # Note: SessionLocal.remove() is called in get_db()'s finally clause
-                except Exception as close_err:
-                    logger.error(f"Failed to close database session: {str(close_err)}")
+        Returns:
+            A LineReader bound to the socket
+        """
+        handle = self.thread_manager.current_connection()
+        if handle is not None:
+            on_data = handle.touch
+        else:
+            on_data = lambda: self.thread_manager.update_activity(client_ip)
+        return LineReader(client_socket, on_data=on_data)
 
-    def _read_line(self, sock: socket.socket) -> bytes:
-        """Read a line from the socket.
+    def _read_line(self, reader: LineReader) -> bytes:
+        """Read a line from a client connection.
         
         Args:
-            sock: The socket to read from
+            reader: The connection's line reader
             
         Returns:
-            The line read from the socket as bytes
+            The line read from the socket as bytes, or empty bytes on EOF,
+            timeout or an oversized line
         """
-        # Update activity timestamp to prevent timeout
-        client_ip = sock.getpeername()[0]
-        self.thread_manager.update_activity(client_ip)
+        try:
+            return reader.readline()
+        except socket.timeout:
+            # Socket timeout - this could be a legitimate timeout
+            logger.debug(f"Socket timeout while reading {self.protocol.value.upper()} line")
+        except LineTooLongError as e:
+            logger.warning(f"Dropping {self.protocol.value.upper()} client: {str(e)}")
+        except OSError as e:
+            logger.debug(f"Socket error while reading line: {str(e)}")
+        return b''
+
+    async def _log_attempt_async(self, username: str, password: str, client_ip: str):
+        """Log a login attempt from the asyncio engine without blocking the loop.
         
-        buffer = bytearray()
-        while True:
-            try:
-                data = sock.recv(1)
-                if not data:
-                    break
-                    
-                # Handle line endings
-                if data == b'\r':
-                    next_char = sock.recv(1)
-                    if next_char == b'\n':
-                        return bytes(buffer)
-                    else:
-                        buffer.extend(data)
-                        if next_char:
-                            buffer.extend(next_char)
-                elif data == b'\n':
-                    return bytes(buffer)
-                else:
-                    buffer.extend(data)
-            except socket.timeout:
-                # Socket timeout - this could be a legitimate timeout
-                logger.debug(f"Socket timeout while reading from {client_ip}")
-                break
-                
-        return bytes(buffer) 
\ No newline at end of file
+        Args:
+            username: The attempted username
+            password: The attempted password
+            client_ip: The client's IP address
+        """
+        await async_engine.run_blocking(self._log_attempt, username, password, client_ip)
+
+    async def _read_line_async(self, reader: asyncio.StreamReader) -> bytes:
+        """Read a line from an asyncio stream.
+        
+        Args:
+            reader: The stream reader to read from
+            
+        Returns:
+            The line without its line ending, or empty bytes on EOF or timeout
+        """
+        try:
+            line = await asyncio.wait_for(reader.readline(), timeout=CONNECTION_TIMEOUT)
+        except asyncio.TimeoutError:
+            return b''
+        except ValueError:
+            # Line exceeded the stream reader's buffer limit
+            return b''
+        self.thread_manager.touch()
+        return line.rstrip(b'\r\n')
@@ -24,10 +24,57 @@ WEB_PORT = int(os.getenv('WEB_PORT', 8080))
 MAX_THREADS = int(os.getenv('MAX_THREADS', 50))  # Maximum worker threads
 MAX_CONNECTIONS_PER_IP = int(os.getenv('MAX_CONNECTIONS_PER_IP', 5))  # Max connections from a single IP
 CONNECTION_TIMEOUT = int(os.getenv('CONNECTION_TIMEOUT', 5))  # Timeout in seconds for inactive connections
-MAX_QUEUED_CONNECTIONS = int(os.getenv('MAX_QUEUED_CONNECTIONS', 100))  # Max queued connections
+MAX_QUEUED_CONNECTIONS = int(os.getenv('MAX_QUEUED_CONNECTIONS', 100))  # Max connections waiting for a worker
+ADMISSION_POLICY = os.getenv('ADMISSION_POLICY', 'drop-newest').strip().lower()  # drop-newest, drop-oldest or prefer-new-ips
+# Workers each protocol may use while other protocols are waiting, e.g. "ssh=20,rdp=10"
+WORKER_QUOTAS = {
+    name.strip().lower(): int(value)
+    for name, value in (item.split('=', 1) for item in os.getenv('WORKER_QUOTAS', '').split(',') if '=' in item)
+}
+CONNECTION_MAX_LIFETIME = int(os.getenv('CONNECTION_MAX_LIFETIME', 300))  # Max seconds a connection may stay open, 0 for no limit
+MAX_LINE_LENGTH = int(os.getenv('MAX_LINE_LENGTH', 4096))  # Max bytes per protocol line before the client is dropped
+
+# Listener engine settings
+# Comma-separated protocols served by the asyncio engine instead of the thread pool
+# (supported: telnet, ftp, smtp, mysql, sip)
+ASYNC_PROTOCOLS = [p.strip().lower() for p in os.getenv('ASYNC_PROTOCOLS', '').split(',') if p.strip()]
+ASYNC_BLOCKING_WORKERS = int(os.getenv('ASYNC_BLOCKING_WORKERS', 8))  # Threads for DB/geolocation calls from the event loop
+
+# Process settings
+WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', 0))  # Listener processes sharing the ports via SO_REUSEPORT, 0 to listen in the main process
+# SSH host keys, generated into SSH_HOST_KEY_DIR on first start
+SSH_HOST_KEY_DIR = os.getenv('SSH_HOST_KEY_DIR', str(BASE_DIR / 'ssh_host_keys'))
+# Comma-separated key types to offer (supported: ed25519, ecdsa-256, ecdsa-384, ecdsa-521, rsa)
+SSH_HOST_KEY_TYPES = [t.strip().lower() for t in os.getenv('SSH_HOST_KEY_TYPES', 'ed25519,ecdsa-256,rsa').split(',') if t.strip()]
+SSH_BANNER_TIMEOUT = float(os.getenv('SSH_BANNER_TIMEOUT', 3))  # Seconds a client has to send its SSH identification before it counts as a probe
+SSH_HANDSHAKE_WORKERS = int(os.getenv('SSH_HANDSHAKE_WORKERS', 0))  # Processes running SSH handshakes for the main listener, 0 to run them in worker threads
 
 # Database settings
 DATABASE_URL = os.getenv('DATABASE_URL', f'sqlite:///{BASE_DIR}/honeypot.db')
+# SQLite connection profile: WAL journal, one writer connection and a pool of read-only connections
+SQLITE_READ_POOL_SIZE = int(os.getenv('SQLITE_READ_POOL_SIZE', 4))  # Read-only connections for the web interface
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # Bytes of the database file to memory-map
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 64 * 1024))  # Page cache per connection in KiB
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))  # How long to wait for a lock before failing
+WRITE_BATCH_SIZE = int(os.getenv('WRITE_BATCH_SIZE', 500))  # Max rows per group commit
+WRITE_BATCH_WINDOW_MS = int(os.getenv('WRITE_BATCH_WINDOW_MS', 50))  # Max milliseconds a row waits for its batch
+WRITE_QUEUE_SIZE = int(os.getenv('WRITE_QUEUE_SIZE', 10000))  # Max rows waiting to be written
+DIMENSION_CACHE_SIZE = int(os.getenv('DIMENSION_CACHE_SIZE', 100000))  # Usernames, passwords, IPs and locations whose ids are kept in memory, per table
+DEDUP_WINDOW = float(os.getenv('DEDUP_WINDOW', 0))  # Seconds in which identical attempts from one IP are counted on the first, 0 to store each
+# Archival of old login attempts into compressed monthly files
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', str(BASE_DIR / 'archive'))
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 0))  # Days attempts stay in the database before they are archived, 0 to keep them
+ARCHIVE_RETENTION_DAYS = int(os.getenv('ARCHIVE_RETENTION_DAYS', 0))  # Days archived months are kept before their files are deleted, 0 to keep them
+ARCHIVE_INTERVAL = int(os.getenv('ARCHIVE_INTERVAL', 3600))  # Seconds between archival runs
+
+# Geolocation settings
+GEOIP_DATABASE = os.getenv('GEOIP_DATABASE', '')  # Local .mmdb file or CSV range dump answering lookups offline, empty to only use ip-api.com
+GEOIP_API_FALLBACK = os.getenv('GEOIP_API_FALLBACK', 'true').strip().lower() in ('1', 'true', 'yes')  # Ask ip-api.com about addresses the local database does not cover
+GEO_CACHE_FILE = os.getenv('GEO_CACHE_FILE', str(BASE_DIR / 'geolocation_cache.db'))  # SQLite file keeping looked-up locations across restarts
+GEO_CACHE_SIZE = int(os.getenv('GEO_CACHE_SIZE', 100000))  # Looked-up locations kept in memory, older ones are read from GEO_CACHE_FILE
+GEO_CACHE_TTL_DAYS = float(os.getenv('GEO_CACHE_TTL_DAYS', 30))  # Days a looked-up location is used before the address is looked up again
+GEO_CACHE_PRIVATE_TTL_DAYS = float(os.getenv('GEO_CACHE_PRIVATE_TTL_DAYS', 365))  # Days an address ip-api.com reports as private or reserved is not looked up again
+GEO_CACHE_FAILURE_TTL = int(os.getenv('GEO_CACHE_FAILURE_TTL', 600))  # Seconds before an address whose lookup failed is looked up again
 
 # Logging settings
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -1,6 +1,8 @@
 """FTP Honeypot server implementation."""
 import socket
 import logging
+import asyncio
+from typing import Dict, Optional, Tuple
 from honeypot.core.base_server import BaseHoneypot
 from honeypot.database.models import Protocol
 from honeypot.core.config import HOST, FTP_PORT
@@ -8,10 +10,24 @@ from honeypot.core.server_registry import register_server
 
 logger = logging.getLogger(__name__)
 
+WELCOME_MESSAGE = b'220 Welcome to FTP server\r\n'
+
+# Fixed responses for common FTP commands
+SIMPLE_RESPONSES = {
+    'SYST': b'215 UNIX Type: L8\r\n',
+    'FEAT': b'211-Features:\r\n PASV\r\n211 End\r\n',
+    'PWD': b'257 "/" is current directory.\r\n',
+    'TYPE': b'200 Switching to ASCII mode.\r\n',
+    'PASV': b'227 Entering Passive Mode (127,0,0,1,0,0).\r\n',
+    'PORT': b'200 PORT command successful.\r\n',
+}
+
 @register_server
 class FTPHoneypot(BaseHoneypot):
     """FTP Honeypot server implementation."""
     
+    supports_async = True
+    
     def __init__(self, host: str = HOST, port: int = FTP_PORT):
         """Initialize the FTP honeypot server."""
         super().__init__(host, port, Protocol.FTP)
@@ -20,80 +36,79 @@ class FTPHoneypot(BaseHoneypot):
         """Handle an individual FTP client connection."""
         try:
             # Send welcome message
-            client_socket.send(b'220 Welcome to FTP server\r\n')
+            client_socket.send(WELCOME_MESSAGE)
             
             # Initialize state
-            username = None
-            password = None
+            state = {'username': None}
+            reader = self._line_reader(client_socket, client_ip)
             
             while True:
                 # Read command
-                command = self._read_line(client_socket).decode('ascii', errors='ignore').strip()
+                command = self._read_line(reader).decode('ascii', errors='ignore').strip()
                 if not command:
                     break
-                    
-                # Parse command and arguments
-                cmd, *args = command.split(' ', 1)
-                cmd = cmd.upper()
-                arg = args[0] if args else None
                 
-                # Handle different commands
-                if cmd == 'USER':
-                    username = arg
-                    client_socket.send(b'331 Please specify the password.\r\n')
-                elif cmd == 'PASS':
-                    password = arg
+                response, close, credentials = self._handle_command(command, state)
+                if credentials:
                     # Log the attempt and broadcast
-                    self._log_attempt(username, password, client_ip)
-                    # Send error message
-                    client_socket.send(b'530 Login incorrect.\r\n')
+                    self._log_attempt(*credentials, client_ip)
+                client_socket.send(response)
+                if close:
                     break
-                elif cmd == 'QUIT':
-                    client_socket.send(b'221 Goodbye.\r\n')
-                    break
-                elif cmd in ['SYST', 'FEAT', 'PWD', 'TYPE', 'PASV', 'PORT']:
-                    # Handle common FTP commands
-                    if cmd == 'SYST':
-                        client_socket.send(b'215 UNIX Type: L8\r\n')
-                    elif cmd == 'FEAT':
-                        client_socket.send(b'211-Features:\r\n PASV\r\n211 End\r\n')
-                    elif cmd == 'PWD':
-                        client_socket.send(b'257 "/" is current directory.\r\n')
-                    elif cmd == 'TYPE':
-                        client_socket.send(b'200 Switching to ASCII mode.\r\n')
-                    elif cmd == 'PASV':
-                        client_socket.send(b'227 Entering Passive Mode (127,0,0,1,0,0).\r\n')
-                    elif cmd == 'PORT':
-                        client_socket.send(b'200 PORT command successful.\r\n')
-                else:
-                    # Unknown command
-                    client_socket.send(b'500 Unknown command.\r\n')
             
         except Exception as e:
             logger.error(f"Error handling client {client_ip}: {str(e)}")
         finally:
             client_socket.close()
 
-    def _read_line(self, sock: socket.socket) -> bytes:
-        """Read a line from the socket."""
-        buffer = bytearray()
+    async def _handle_client_async(self, reader: asyncio.StreamReader,
+                                   writer: asyncio.StreamWriter, client_ip: str):
+        """Handle an individual FTP client connection on the asyncio engine."""
+        writer.write(WELCOME_MESSAGE)
+        await writer.drain()
+        
+        state = {'username': None}
+        
         while True:
-            data = sock.recv(1)
-            if not data:
+            command = (await self._read_line_async(reader)).decode('ascii', errors='ignore').strip()
+            if not command:
                 break
-                
-            # Handle line endings
-            if data == b'\r':
-                next_char = sock.recv(1)
-                if next_char == b'\n':
-                    return bytes(buffer)
-                else:
-                    buffer.extend(data)
-                    if next_char:
-                        buffer.extend(next_char)
-            elif data == b'\n':
-                return bytes(buffer)
-            else:
-                buffer.extend(data)
-                
-        return bytes(buffer) 
\ No newline at end of file
+            
+            response, close, credentials = self._handle_command(command, state)
+            if credentials:
+                await self._log_attempt_async(*credentials, client_ip)
+            writer.write(response)
+            await writer.drain()
+            if close:
+                break
+
+    def _handle_command(self, command: str, state: Dict) -> Tuple[bytes, bool, Optional[Tuple[str, str]]]:
+        """Process a single FTP command.
+        
+        Args:
+            command: The command line received from the client
+            state: Per-connection state, updated in place
+            
+        Returns:
+            Tuple of (response, whether to close the connection, captured
+            (username, password) credentials or None)
+        """
+        # Parse command and arguments
+        cmd, *args = command.split(' ', 1)
+        cmd = cmd.upper()
+        arg = args[0] if args else None
+        
+        # Handle different commands
+        if cmd == 'USER':
+            state['username'] = arg
+            return b'331 Please specify the password.\r\n', False, None
+        elif cmd == 'PASS':
+            # Send error message after the attempt is logged
+            return b'530 Login incorrect.\r\n', True, (state['username'], arg)
+        elif cmd == 'QUIT':
+            return b'221 Goodbye.\r\n', True, None
+        elif cmd in SIMPLE_RESPONSES:
+            # Handle common FTP commands
+            return SIMPLE_RESPONSES[cmd], False, None
+        # Unknown command
+        return b'500 Unknown command.\r\n', False, None
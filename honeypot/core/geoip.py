@@ -0,0 +1,412 @@
+"""Offline IP geolocation from a CSV range dump or a MaxMind .mmdb file.
+
+Compile a dump and look addresses up with:
+
+    python -m honeypot.core.geoip <file> --lookup <ip> ...
+"""
+import argparse
+import bisect
+import csv
+import logging
+import mmap
+import os
+import socket
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TABLE_MAGIC = b'HPGEOIP1'
+TABLE_SUFFIX = '.ranges'
+
+# Magic, byte order of the arrays, source file size and mtime, then the
+# number of IPv4 ranges, IPv6 ranges and locations
+TABLE_HEADER = struct.Struct('<8s8sQQQQQ')
+
+# Separates the fields of a stored location
+FIELD_SEPARATOR = '\x1f'
+
+LOCATION_FIELDS = ('country', 'region', 'city', 'latitude', 'longitude')
+
+# Column names accepted in the header row of a CSV range dump
+CSV_COLUMNS = {
+    'start': ('start', 'ip_start', 'start_ip', 'range_start', 'ip_from'),
+    'end': ('end', 'ip_end', 'end_ip', 'range_end', 'ip_to'),
+    'country': ('country', 'country_name'),
+    'region': ('region', 'region_name', 'stateprov', 'subdivision'),
+    'city': ('city', 'city_name'),
+    'latitude': ('latitude', 'lat'),
+    'longitude': ('longitude', 'lon', 'lng'),
+}
+
+# Columns of dumps without a header row. DB-IP lite (start, end, continent,
+# country, stateprov, city, latitude, longitude) and IP2Location LITE DB5
+# (ip_from, ip_to, country_code, country_name, region, city, latitude,
+# longitude) share these positions.
+HEADERLESS_COLUMNS = {'start': 0, 'end': 1, 'country': 3, 'region': 4, 'city': 5, 'latitude': 6, 'longitude': 7}
+
+# IPv4 addresses are kept as IPv4-mapped IPv6 integers while compiling
+IPV4_MAPPED = 0xffff << 32
+
+def _parse_address(text: str) -> int:
+    """Parse a range bound given as an address or an integer into an IPv6 integer."""
+    text = text.strip()
+    if text.isdigit():
+        value = int(text)
+        # Integer dumps of IPv4 ranges count from 0.0.0.0
+        return IPV4_MAPPED | value if value <= 0xffffffff else value
+    try:
+        return IPV4_MAPPED | int.from_bytes(socket.inet_pton(socket.AF_INET, text), 'big')
+    except OSError:
+        pass
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET6, text), 'big')
+    except OSError:
+        raise ValueError(f"Not an IP address: {text!r}")
+
+def _is_ipv4(value: int) -> bool:
+    return value >> 32 == 0xffff
+
+def _column_positions(row: List[str]) -> Tuple[Dict[str, int], bool]:
+    """Find the location columns from the first row of a dump.
+
+    Returns:
+        Tuple of (column positions, whether the row is a header)
+    """
+    try:
+        _parse_address(row[0])
+        return HEADERLESS_COLUMNS, False
+    except ValueError:
+        pass
+    names = [name.strip().lower() for name in row]
+    positions = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in names:
+                positions[field] = names.index(alias)
+                break
+    if 'start' not in positions or 'end' not in positions:
+        raise ValueError(f"CSV header has no start and end address columns: {row}")
+    return positions, True
+
+def _cell(row: List[str], position: Optional[int]) -> str:
+    if position is None or position >= len(row):
+        return ''
+    value = row[position].strip()
+    # IP2Location marks missing values with a dash
+    return '' if value == '-' else value
+
+def _permute(values, order: List[int]):
+    permuted = [values[i] for i in order]
+    return array(values.typecode, permuted) if isinstance(values, array) else permuted
+
+def _aligned(data: bytes) -> bytes:
+    return data + b'\0' * (-len(data) % 8)
+
+def compile_ranges(source: Path, target: Path) -> Tuple[int, int, int]:
+    """Compile a CSV range dump into a range table file.
+
+    Rows are expected to be sorted by start address, as published. They are
+    sorted here if they are not. Ranges must not overlap.
+
+    Args:
+        source: The CSV file
+        target: The range table file to write, replaced atomically
+
+    Returns:
+        Tuple of (IPv4 ranges, IPv6 ranges, distinct locations)
+    """
+    starts4, ends4, locations4 = array('I'), array('I'), array('I')
+    starts6: List[int] = []
+    ends6: List[int] = []
+    locations6 = array('I')
+    locations: Dict[str, int] = {}
+
+    with open(source, newline='', encoding='utf-8', errors='replace') as f:
+        reader = csv.reader(f)
+        positions = None
+        for row in reader:
+            if not row:
+                continue
+            if positions is None:
+                positions, is_header = _column_positions(row)
+                if is_header:
+                    continue
+            try:
+                start = _parse_address(_cell(row, positions['start']))
+                end = _parse_address(_cell(row, positions['end']))
+            except (ValueError, IndexError):
+                logger.debug(f"Skipping GeoIP row with an invalid range: {row}")
+                continue
+            location = FIELD_SEPARATOR.join(_cell(row, positions.get(field)) for field in LOCATION_FIELDS)
+            index = locations.setdefault(location, len(locations))
+            if _is_ipv4(start) and _is_ipv4(end):
+                starts4.append(start & 0xffffffff)
+                ends4.append(end & 0xffffffff)
+                locations4.append(index)
+            else:
+                starts6.append(start)
+                ends6.append(end)
+                locations6.append(index)
+
+    if any(starts4[i] > starts4[i + 1] for i in range(len(starts4) - 1)):
+        order = sorted(range(len(starts4)), key=starts4.__getitem__)
+        starts4, ends4, locations4 = (_permute(values, order) for values in (starts4, ends4, locations4))
+    if any(starts6[i] > starts6[i + 1] for i in range(len(starts6) - 1)):
+        order = sorted(range(len(starts6)), key=starts6.__getitem__)
+        starts6, ends6, locations6 = (_permute(values, order) for values in (starts6, ends6, locations6))
+
+    blob = bytearray()
+    offsets = array('Q', [0])
+    for location in locations:
+        blob += location.encode('utf-8')
+        offsets.append(len(blob))
+
+    stat = source.stat()
+    header = TABLE_HEADER.pack(TABLE_MAGIC, sys.byteorder.encode().ljust(8, b'\0'), stat.st_size,
+                               stat.st_mtime_ns, len(starts4), len(starts6), len(locations))
+    temporary = target.with_name(target.name + '.tmp')
+    with open(temporary, 'wb') as f:
+        f.write(_aligned(header))
+        for section in (starts4.tobytes(), ends4.tobytes(), locations4.tobytes(),
+                        b''.join(value.to_bytes(16, 'big') for value in starts6),
+                        b''.join(value.to_bytes(16, 'big') for value in ends6),
+                        locations6.tobytes(), offsets.tobytes(), bytes(blob)):
+            f.write(_aligned(section))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, target)
+    return len(starts4), len(starts6), len(locations)
+
+class _PackedKeys:
+    """Sequence view of 16-byte big-endian keys, for bisect."""
+
+    def __init__(self, view: memoryview):
+        self.view = view
+
+    def __len__(self) -> int:
+        return len(self.view) // 16
+
+    def __getitem__(self, index: int) -> bytes:
+        return bytes(self.view[index * 16:index * 16 + 16])
+
+class RangeTable:
+    """Memory-mapped range table answering lookups with binary search."""
+
+    def __init__(self, path: Path):
+        """Map a compiled range table.
+
+        Args:
+            path: The range table file written by compile_ranges()
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = view = memoryview(self._mmap)
+        magic, byteorder, self.source_size, self.source_mtime_ns, count4, count6, count_locations = \
+            TABLE_HEADER.unpack_from(view)
+        if magic != TABLE_MAGIC or byteorder.rstrip(b'\0') != sys.byteorder.encode():
+            view.release()
+            self._mmap.close()
+            raise ValueError(f"{path} is not a range table for this machine")
+
+        offset = TABLE_HEADER.size + -TABLE_HEADER.size % 8
+
+        def section(size: int) -> memoryview:
+            nonlocal offset
+            part = view[offset:offset + size]
+            offset += size + -size % 8
+            return part
+
+        self.starts4 = section(count4 * 4).cast('I')
+        self.ends4 = section(count4 * 4).cast('I')
+        self.locations4 = section(count4 * 4).cast('I')
+        self.starts6 = _PackedKeys(section(count6 * 16))
+        self.ends6 = _PackedKeys(section(count6 * 16))
+        self.locations6 = section(count6 * 4).cast('I')
+        self.location_offsets = section((count_locations + 1) * 8).cast('Q')
+        self.location_data = section(self.location_offsets[count_locations])
+        self.ranges = count4 + count6
+
+    @classmethod
+    def open(cls, source: Path) -> 'RangeTable':
+        """Open the range table of a CSV dump, compiling it first if it is missing or older than the dump.
+
+        The table is written next to the dump, or in the temporary directory
+        if that is not writable. A .ranges file is opened as it is.
+
+        Args:
+            source: The CSV dump or a compiled range table
+
+        Returns:
+            The mapped range table
+        """
+        if source.suffix == TABLE_SUFFIX:
+            return cls(source)
+        stat = source.stat()
+        candidates = [source.with_name(source.name + TABLE_SUFFIX),
+                      Path(tempfile.gettempdir()) / (source.name + TABLE_SUFFIX)]
+        for path in candidates:
+            try:
+                table = cls(path)
+            except (OSError, ValueError):
+                continue
+            if (table.source_size, table.source_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                return table
+            table.close()
+
+        for path in candidates:
+            try:
+                logger.info(f"Compiling GeoIP ranges from {source} into {path}, this is done once")
+                start = time.monotonic()
+                count4, count6, count_locations = compile_ranges(source, path)
+            except OSError as e:
+                logger.warning(f"Could not write GeoIP range table {path}: {str(e)}")
+                continue
+            logger.info(f"Compiled {count4} IPv4 and {count6} IPv6 ranges with {count_locations} locations "
+                        f"in {time.monotonic() - start:.1f}s")
+            return cls(path)
+        raise OSError(f"No writable location for the range table of {source}")
+
+    def _location(self, index: int) -> Optional[Dict]:
+        data = bytes(self.location_data[self.location_offsets[index]:self.location_offsets[index + 1]])
+        country, region, city, latitude, longitude = data.decode('utf-8').split(FIELD_SEPARATOR)
+        if not (country or region or city or latitude):
+            return None
+        try:
+            latitude, longitude = float(latitude), float(longitude)
+        except ValueError:
+            latitude = longitude = None
+        return {
+            'latitude': latitude,
+            'longitude': longitude,
+            'country': country or None,
+            'city': city or None,
+            'region': region or None
+        }
+
+    def lookup(self, ip: str) -> Optional[Dict]:
+        """Look up the location of an address.
+
+        Args:
+            ip: IPv4 or IPv6 address
+
+        Returns:
+            Location dictionary with latitude, longitude, country, city and region, or None if not covered
+        """
+        try:
+            value = int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+        except OSError:
+            try:
+                packed = socket.inet_pton(socket.AF_INET6, ip)
+            except OSError:
+                return None
+            if packed[:12] != b'\0' * 10 + b'\xff\xff':
+                index = bisect.bisect_right(self.starts6, packed) - 1
+                if index < 0 or self.ends6[index] < packed:
+                    return None
+                return self._location(self.locations6[index])
+            value = int.from_bytes(packed[12:], 'big')
+
+        index = bisect.bisect_right(self.starts4, value) - 1
+        if index < 0 or self.ends4[index] < value:
+            return None
+        return self._location(self.locations4[index])
+
+    def close(self):
+        """Unmap the table."""
+        for view in (self.starts4, self.ends4, self.locations4, self.starts6.view, self.ends6.view,
+                     self.locations6, self.location_offsets, self.location_data, self._view):
+            view.release()
+        self._mmap.close()
+
+class MMDBProvider:
+    """Lookups in a MaxMind DB file (GeoLite2 or DB-IP .mmdb) through the maxminddb package."""
+
+    def __init__(self, path: Path):
+        """Open the database memory-mapped.
+
+        Args:
+            path: The .mmdb file
+
+        Raises:
+            ImportError: If the maxminddb package is not installed
+        """
+        import maxminddb
+        self.path = path
+        self.reader = maxminddb.open_database(str(path), maxminddb.MODE_MMAP)
+
+    @staticmethod
+    def _name(record: Optional[Dict]) -> Optional[str]:
+        return (record or {}).get('names', {}).get('en')
+
+    def lookup(self, ip: str) -> Optional[Dict]:
+        """Look up the location of an address.
+
+        Args:
+            ip: IPv4 or IPv6 address
+
+        Returns:
+            Location dictionary with latitude, longitude, country, city and region, or None if not covered
+        """
+        try:
+            record = self.reader.get(ip)
+        except ValueError:
+            return None
+        if not record:
+            return None
+        location = record.get('location', {})
+        subdivisions = record.get('subdivisions') or [None]
+        return {
+            'latitude': location.get('latitude'),
+            'longitude': location.get('longitude'),
+            'country': self._name(record.get('country')),
+            'city': self._name(record.get('city')),
+            'region': self._name(subdivisions[0])
+        }
+
+def open_local_provider(path: str):
+    """Open the local GeoIP database configured in GEOIP_DATABASE.
+
+    Args:
+        path: A .mmdb file, a CSV range dump or a compiled range table, empty for none
+
+    Returns:
+        A provider with a lookup(ip) method, or None if there is no usable local database
+    """
+    if not path:
+        return None
+    path = Path(path)
+    try:
+        if path.suffix.lower() == '.mmdb':
+            provider = MMDBProvider(path)
+        else:
+            provider = RangeTable.open(path)
+        logger.info(f"Using local GeoIP database {path}")
+        return provider
+    except ImportError:
+        logger.warning("maxminddb not installed - install it with 'pip install maxminddb' to read .mmdb files")
+    except Exception as e:
+        logger.error(f"Error opening GeoIP database {path}: {str(e)}")
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile and query local GeoIP range databases")
+    parser.add_argument('database', help='A .mmdb file, a CSV range dump or a compiled range table')
+    parser.add_argument('--lookup', nargs='*', default=[], metavar='IP', help='Addresses to look up')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    provider = open_local_provider(args.database)
+    if provider is None:
+        sys.exit(1)
+    for ip in args.lookup:
+        print(f"{ip}: {provider.lookup(ip)}")
+
+if __name__ == '__main__':
+    main()
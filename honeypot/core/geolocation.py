@@ -10,6 +10,13 @@ from threading import Lock, Thread
 from queue import Queue
 import atexit
 import queue
+from concurrent.futures import Future
+from honeypot.core.config import (
+    GEOIP_API_FALLBACK, GEOIP_DATABASE, GEO_CACHE_FILE, GEO_CACHE_SIZE, GEO_CACHE_TTL_DAYS,
+    GEO_CACHE_PRIVATE_TTL_DAYS, GEO_CACHE_FAILURE_TTL
+)
+from honeypot.core.geoip import open_local_provider
+from honeypot.core.location_cache import LocationCache
 
 logger = logging.getLogger(__name__)
 
@@ -17,26 +24,51 @@ class GeolocationService:
     """Service to get geolocation data for IP addresses."""
     
     def __init__(self):
-        self.cache = {}
+        self.cache: Optional[LocationCache] = None
         self.last_request_time = 0
         # ip-api.com allows 45 requests per minute (free tier)
         self.min_request_interval = 60 / 45  # ~1.33 seconds between requests
         
-        # Set up cache file path in the same directory as this module
-        self.cache_file = Path(__file__).parent / 'geolocation_cache.json'
+        # Cache file, and the JSON file of earlier versions imported into it
+        self.cache_file = Path(GEO_CACHE_FILE)
+        self.legacy_cache_file = Path(__file__).parent / 'geolocation_cache.json'
+        
+        # Seconds a location is cached, and a missing one for private and failed lookups
+        self.cache_ttl = GEO_CACHE_TTL_DAYS * 86400
+        self.private_ttl = GEO_CACHE_PRIVATE_TTL_DAYS * 86400
+        self.failure_ttl = GEO_CACHE_FAILURE_TTL
         
         # Add mutex lock for thread safety
         self.cache_lock = Lock()
         
+        # Lookups queued or in progress, shared by every caller asking for the same IP
+        self.pending: Dict[str, Future] = {}
+        
+        # Serializes the reservation of API request slots
+        self.rate_lock = Lock()
+        
+        # Lookup statistics
+        self.api_requests = 0
+        self.coalesced_requests = 0
+        self.skipped_queue_entries = 0
+        
         # Batch processing queue and worker thread
         self.batch_queue = Queue()
         self.batch_worker = None
         self.batch_size = 10  # Process up to 10 IPs at once when possible
         self.running = True
         
-        # Auto-save interval (save every 5 minutes)
-        self.last_save_time = time.time()
-        self.save_interval = 300  # 5 minutes
+        # Expired cache entries are purged from the file hourly
+        self.last_purge_time = time.time()
+        self.purge_interval = 3600
+        
+        # Set in prefork worker processes, where the parent owns lookups and the cache file
+        self.persist_cache = True
+        self._prefetch_forward = None
+        
+        # Local range database answering lookups without the API, if configured
+        self.local_provider = open_local_provider(GEOIP_DATABASE)
+        self.api_fallback = GEOIP_API_FALLBACK
         
         # Load cache and start worker
         self._load_cache()
@@ -46,28 +78,40 @@ class GeolocationService:
         atexit.register(self._cleanup)
 
     def _load_cache(self):
-        """Load the cache from file if it exists."""
-        try:
-            if self.cache_file.exists():
-                with open(self.cache_file, 'r') as f:
-                    self.cache = json.load(f)
-                logger.info(f"Loaded {len(self.cache)} cached IP locations")
-        except Exception as e:
-            logger.error(f"Error loading geolocation cache: {str(e)}")
-            self.cache = {}
+        """Set up the cache; its file is opened on first use."""
+        self.cache = LocationCache(self.cache_file, GEO_CACHE_SIZE)
 
-    def _save_cache(self):
-        """Save the cache to file."""
+    def import_legacy_cache(self):
+        """Import the JSON cache file of earlier versions into a new, empty cache file.
+        
+        Called once by the main process at startup, since worker processes
+        do not write to the cache file.
+        """
+        if not self.persist_cache or not self.legacy_cache_file.exists():
+            return
         try:
-            # Ensure the directory exists
-            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
-            with self.cache_lock:
-                with open(self.cache_file, 'w') as f:
-                    json.dump(self.cache, f)
-                self.last_save_time = time.time()
-                logger.debug(f"Saved {len(self.cache)} IP locations to cache file")
+            if not self.cache.is_empty():
+                return
+            with open(self.legacy_cache_file, 'r') as f:
+                legacy = json.load(f)
+            now = time.time()
+            self.cache.put_many(
+                (ip, location, now + (self.cache_ttl if location else self.private_ttl))
+                for ip, location in legacy.items()
+            )
+            logger.info(f"Imported {len(legacy)} cached IP locations from {self.legacy_cache_file}")
         except Exception as e:
-            logger.error(f"Error saving geolocation cache: {str(e)}")
+            logger.error(f"Error importing geolocation cache: {str(e)}")
+
+    def _cache_location(self, ip: str, location: Optional[Dict], ttl: float):
+        """Cache a lookup result, writing it to the cache file unless another process owns it."""
+        self.cache.put(ip, location, ttl, persist=self.persist_cache)
+
+    def _purge_cache(self):
+        """Delete expired entries from the cache file."""
+        self.last_purge_time = time.time()
+        if self.persist_cache:
+            self.cache.purge_expired()
     
     def _start_batch_worker(self):
         """Start the background thread for batch processing IP lookups."""
@@ -79,27 +123,22 @@ class GeolocationService:
     def _batch_processor(self):
         """Process IP lookups in batches."""
         batch_ips = []
-        result_callbacks = []
         
         while self.running:
             try:
                 # Try to collect a batch of IPs to process
                 try:
                     # Wait for the first item with a timeout
-                    ip, callback = self.batch_queue.get(timeout=5)
-                    batch_ips.append(ip)
-                    result_callbacks.append(callback)
+                    batch_ips.append(self.batch_queue.get(timeout=5))
                     
                     # Collect more items without blocking (up to batch size)
                     while len(batch_ips) < self.batch_size and not self.batch_queue.empty():
-                        ip, callback = self.batch_queue.get_nowait()
-                        batch_ips.append(ip)
-                        result_callbacks.append(callback)
+                        batch_ips.append(self.batch_queue.get_nowait())
                 
                 except queue.Empty:  # Queue.get timeout raises Empty, not TimeoutError
-                    # No items in the queue, check if we should save cache
-                    if time.time() - self.last_save_time > self.save_interval:
-                        self._save_cache()
+                    # No items in the queue, check if we should purge the cache
+                    if time.time() - self.last_purge_time > self.purge_interval:
+                        self._purge_cache()
                     continue
                 except Exception as e:
                     logger.error(f"Error collecting batch items: {str(e)}", exc_info=True)
@@ -111,19 +150,23 @@ class GeolocationService:
                 
                 # For free tier IP-API we can only do single lookups
                 # For a paid API this could be replaced with batch API calls
-                for i, ip in enumerate(batch_ips):
+                for ip in batch_ips:
                     try:
-                        location = self._fetch_location(ip)
-                        if result_callbacks[i]:
-                            result_callbacks[i](location)
+                        future, owner = self._claim(ip)
+                        if owner:
+                            self._resolve(ip, future)
+                        else:
+                            # A synchronous get_location() got to it first
+                            with self.cache_lock:
+                                self.skipped_queue_entries += 1
                     except Exception as e:
                         logger.error(f"Error processing IP {ip} in batch: {str(e)}", exc_info=True)
                     finally:
                         self.batch_queue.task_done()
                 
-                # Check if we should autosave the cache
-                if time.time() - self.last_save_time > self.save_interval:
-                    self._save_cache()
+                # Check if we should purge the cache
+                if time.time() - self.last_purge_time > self.purge_interval:
+                    self._purge_cache()
                     
             except Exception as e:
                 logger.error(f"Critical error in batch processor: {str(e)}", exc_info=True)
@@ -132,22 +175,23 @@ class GeolocationService:
             finally:
                 # Clear for next batch
                 batch_ips = []
-                result_callbacks = []
     
     def _fetch_location(self, ip: str) -> Optional[Dict]:
         """Fetch location data for an IP from the API."""
         try:
-            # Respect rate limiting
-            current_time = time.time()
-            time_since_last_request = current_time - self.last_request_time
-            if time_since_last_request < self.min_request_interval:
-                time.sleep(self.min_request_interval - time_since_last_request)
+            # Respect rate limiting by reserving the next free request slot
+            with self.rate_lock:
+                current_time = time.time()
+                wait = max(0.0, self.last_request_time + self.min_request_interval - current_time)
+                self.last_request_time = current_time + wait
+                self.api_requests += 1
+            if wait > 0:
+                time.sleep(wait)
 
             # Make API request
             logger.debug(f"Fetching geolocation data for IP {ip}")
             try:
                 response = requests.get(f'http://ip-api.com/json/{ip}', timeout=10)
-                self.last_request_time = time.time()
             except requests.RequestException as e:
                 logger.error(f"Network error when fetching geolocation for IP {ip}: {str(e)}", exc_info=True)
                 return None
@@ -163,17 +207,15 @@ class GeolocationService:
                             'city': data.get('city'),
                             'region': data.get('regionName')
                         }
-                        # Cache the result in memory
-                        with self.cache_lock:
-                            self.cache[ip] = location_data
+                        # Cache the result, in memory and in the cache file
+                        self._cache_location(ip, location_data, self.cache_ttl)
                         return location_data
                     else:
                         error_msg = data.get('message', 'Unknown error')
                         logger.warning(f"IP-API returned error for IP {ip}: {error_msg}")
-                        if error_msg == 'private range':
-                            logger.info(f"IP {ip} is in a private range, caching as None")
-                            with self.cache_lock:
-                                self.cache[ip] = None
+                        if error_msg in ('private range', 'reserved range'):
+                            logger.info(f"IP {ip} is in a {error_msg}, caching as None")
+                            self._cache_location(ip, None, self.private_ttl)
                         return None
                 except ValueError as e:
                     logger.error(f"Invalid JSON response for IP {ip}: {str(e)}", exc_info=True)
@@ -193,25 +235,95 @@ class GeolocationService:
             logger.error(f"Unexpected error getting location for IP {ip}: {str(e)}", exc_info=True)
             return None
 
+    def _lookup_local(self, ip: str) -> Optional[Dict]:
+        """Look up an IP in the local database, if one is configured.
+        
+        Local results are not added to the cache, since the database answers
+        at least as fast as the cache.
+        """
+        if self.local_provider is None:
+            return None
+        try:
+            return self.local_provider.lookup(ip)
+        except Exception as e:
+            logger.error(f"Error looking up IP {ip} in the local GeoIP database: {str(e)}")
+            return None
+
+    def _claim(self, ip: str) -> Tuple[Future, bool]:
+        """Get the shared lookup of an IP, and whether the caller has to run it.
+        
+        The first caller to claim a queued or new lookup runs it. Everyone
+        else gets the same future, so an IP is never fetched twice at once.
+        """
+        with self.cache_lock:
+            future = self.pending.get(ip)
+            if future is None:
+                cached, location = self.cache.get(ip)
+                if cached:
+                    # Cached since the caller checked
+                    future = Future()
+                    future.set_result(location)
+                    return future, False
+            if future is None:
+                future = Future()
+                self.pending[ip] = future
+            if future.running() or future.done():
+                return future, False
+            future.set_running_or_notify_cancel()
+            return future, True
+
+    def _resolve(self, ip: str, future: Future):
+        """Fetch an IP claimed with _claim() and hand the result to everyone waiting for it."""
+        location = None
+        try:
+            location = self._fetch_location(ip)
+            if location is None and not self.cache.get(ip)[0]:
+                # Failed lookups are retried after a while, not on every attempt from the address
+                self._cache_location(ip, None, self.failure_ttl)
+        finally:
+            with self.cache_lock:
+                self.pending.pop(ip, None)
+            future.set_result(location)
+
+    def peek_location(self, ip: str) -> Tuple[bool, Optional[Dict]]:
+        """Get geolocation data for an IP address if it is known without an API request.
+        
+        Args:
+            ip: The IP address to look up
+        
+        Returns:
+            Tuple of (known, location). Unknown addresses need get_location()
+            or get_location_async(); known ones may still have no location.
+        """
+        # Skip private/local IPs
+        if ip.startswith(('10.', '172.', '192.168.', '127.')):
+            return True, None
+
+        location = self._lookup_local(ip)
+        if location is not None or not self.api_fallback:
+            return True, location
+
+        # Cached locations, and addresses recently found to have none
+        return self.cache.get(ip)
+
     def get_location(self, ip: str) -> Optional[Dict]:
         """Get geolocation data for an IP address.
         
         This is a synchronous wrapper that returns cached data immediately
         or queues a lookup if not in cache.
         """
-        # Skip private/local IPs
-        if ip.startswith(('10.', '172.', '192.168.', '127.')):
-            return None
-
-        # Check cache with thread safety
-        with self.cache_lock:
-            if ip in self.cache:
-                return self.cache[ip]
+        known, location = self.peek_location(ip)
+        if known:
+            return location
         
-        # IP not in cache, fetch it synchronously for now
-        # (We could make this async in the future)
-        location = self._fetch_location(ip)
-        return location
+        # IP not in cache, fetch it now or wait for the lookup already running
+        future, owner = self._claim(ip)
+        if owner:
+            self._resolve(ip, future)
+        else:
+            with self.cache_lock:
+                self.coalesced_requests += 1
+        return future.result()
     
     def get_location_async(self, ip: str, callback=None):
         """Queue an asynchronous lookup for an IP address.
@@ -220,33 +332,83 @@ class GeolocationService:
             ip: The IP address to look up
             callback: Optional function to call with the result
         """
-        # Skip private/local IPs
-        if ip.startswith(('10.', '172.', '192.168.', '127.')):
+        known, location = self.peek_location(ip)
+        if known:
             if callback:
-                callback(None)
+                callback(location)
             return
             
-        # Check cache first
+        # Check cache and lookups already queued or running
         with self.cache_lock:
-            if ip in self.cache:
-                if callback:
-                    callback(self.cache[ip])
-                return
+            cached, location = self.cache.get(ip)
+            if cached:
+                future = None
+            else:
+                future = self.pending.get(ip)
+                queued = future is None
+                if queued:
+                    future = Future()
+                    self.pending[ip] = future
+                else:
+                    self.coalesced_requests += 1
         
-        # Queue for batch processing
-        self.batch_queue.put((ip, callback))
+        if future is None:
+            if callback:
+                callback(location)
+            return
+        if callback:
+            future.add_done_callback(lambda done: callback(done.result()))
+        if queued:
+            self.batch_queue.put(ip)
     
     def prefetch_location(self, ip: str):
         """Prefetch location data for an IP address without waiting for result."""
+        if self.local_provider is not None and (not self.api_fallback or self._lookup_local(ip) is not None):
+            # Answered from the local database when it is needed
+            return
+        if self._prefetch_forward is not None:
+            self._prefetch_forward(ip)
+            return
         self.get_location_async(ip)
     
+    def delegate_prefetch(self, forward):
+        """Send prefetch requests to another process instead of looking them up here.
+        
+        Used by prefork worker processes. The parent process does the lookups
+        and owns the cache file, so this process stops writing to it.
+        
+        Args:
+            forward: Function called with the IP address to prefetch
+        """
+        self._prefetch_forward = forward
+        self.persist_cache = False
+    
+    def get_stats(self) -> Dict:
+        """Get cache and lookup statistics.
+        
+        Returns:
+            Dictionary with the entries cached in memory, cache statistics, lookups
+            pending, API requests made, requests that shared a pending lookup, and
+            queue entries skipped
+        """
+        with self.cache_lock:
+            return {
+                'cached': len(self.cache),
+                'cache': self.cache.get_stats(),
+                'pending': len(self.pending),
+                'queued': self.batch_queue.qsize(),
+                'api_requests': self.api_requests,
+                'coalesced_requests': self.coalesced_requests,
+                'skipped_queue_entries': self.skipped_queue_entries,
+            }
+    
     def _cleanup(self):
         """Cleanup resources when the service is shutting down."""
         logger.info("Shutting down geolocation service")
         self.running = False
         if self.batch_worker and self.batch_worker.is_alive():
             self.batch_worker.join(timeout=2)
-        self._save_cache()
+        self.cache.close()
 
 # Create a singleton instance
 geolocation_service = GeolocationService() 
\ No newline at end of file
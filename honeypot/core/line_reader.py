@@ -0,0 +1,129 @@
+"""Buffered line reader for honeypot client sockets."""
+import socket
+import logging
+from typing import Callable, Optional
+from honeypot.core.config import MAX_LINE_LENGTH
+
+logger = logging.getLogger(__name__)
+
+# Bytes requested from the socket per recv call
+RECV_CHUNK_SIZE = 4096
+
+class LineTooLongError(ValueError):
+    """Raised when a client sends a line longer than the configured maximum."""
+
+class LineReader:
+    """Per-connection buffered reader for line-based protocols.
+    
+    Reads the socket in chunks instead of one byte per recv call and splits
+    lines out of an internal buffer. The buffer is bounded: a line that grows
+    past max_line_length raises LineTooLongError instead of consuming memory.
+    """
+    
+    def __init__(
+        self,
+        sock: socket.socket,
+        max_line_length: int = MAX_LINE_LENGTH,
+        chunk_size: int = RECV_CHUNK_SIZE,
+        on_data: Optional[Callable[[], None]] = None
+    ):
+        """Initialize the line reader.
+        
+        Args:
+            sock: The client socket to read from
+            max_line_length: Maximum line length in bytes, excluding the line ending
+            chunk_size: Number of bytes to request per recv call
+            on_data: Optional callback invoked whenever data is received
+        """
+        self.sock = sock
+        self.max_line_length = max_line_length
+        self.chunk_size = chunk_size
+        self.on_data = on_data
+        self.eof = False
+        self._buffer = bytearray()
+        # Offset up to which the buffer is known to contain no line feed
+        self._scanned = 0
+    
+    def _fill(self) -> bool:
+        """Receive one chunk from the socket into the buffer.
+        
+        Returns:
+            False if the peer closed the connection, True otherwise
+        """
+        if self.eof:
+            return False
+        data = self.sock.recv(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self._buffer.extend(data)
+        if self.on_data:
+            self.on_data()
+        return True
+    
+    def readline(self) -> bytes:
+        """Read one line from the socket.
+        
+        Lines end with LF or CRLF; the line ending is not returned. A lone CR
+        is kept as data. Socket timeouts are propagated to the caller.
+        
+        Returns:
+            The line as bytes, the remaining data if the peer closed the
+            connection mid-line, or empty bytes on EOF
+        
+        Raises:
+            LineTooLongError: If the line exceeds max_line_length
+        """
+        while True:
+            index = self._buffer.find(b'\n', self._scanned)
+            if index >= 0:
+                end = index - 1 if index > 0 and self._buffer[index - 1] == 0x0D else index
+                if end > self.max_line_length:
+                    del self._buffer[:index + 1]
+                    self._scanned = 0
+                    raise LineTooLongError(f"Line exceeds {self.max_line_length} bytes")
+                line = bytes(self._buffer[:end])
+                del self._buffer[:index + 1]
+                self._scanned = 0
+                return line
+            
+            self._scanned = len(self._buffer)
+            # Allow one extra byte for a CR that may be followed by LF
+            if len(self._buffer) > self.max_line_length + 1:
+                self._buffer.clear()
+                self._scanned = 0
+                raise LineTooLongError(f"Line exceeds {self.max_line_length} bytes")
+            
+            if not self._fill():
+                line = bytes(self._buffer)
+                self._buffer.clear()
+                self._scanned = 0
+                return line
+    
+    def read_byte(self) -> bytes:
+        """Read a single byte, served from the buffer when possible.
+        
+        Returns:
+            One byte, or empty bytes on EOF
+        """
+        if not self._buffer and not self._fill():
+            return b''
+        byte = bytes(self._buffer[:1])
+        del self._buffer[:1]
+        self._scanned = max(0, self._scanned - 1)
+        return byte
+    
+    def read_chunk(self) -> bytes:
+        """Return all buffered data, receiving from the socket if the buffer is empty.
+        
+        Used by protocols that parse the stream themselves, such as Telnet.
+        
+        Returns:
+            The available data, or empty bytes on EOF
+        """
+        if not self._buffer and not self._fill():
+            return b''
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        self._scanned = 0
+        return data
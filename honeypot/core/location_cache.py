@@ -0,0 +1,208 @@
+"""Bounded, expiring cache of IP locations, persisted entry by entry in a SQLite file."""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Expired rows deleted per statement when purging
+PURGE_CHUNK_SIZE = 5000
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS locations (ip TEXT PRIMARY KEY, location TEXT, expires REAL NOT NULL) "
+    "WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS ix_locations_expires ON locations (expires)",
+)
+
+class LocationCache:
+    """LRU cache of IP locations with a lifetime per entry, backed by a SQLite file."""
+
+    def __init__(self, path: Optional[Path], max_entries: int):
+        """Initialize the cache.
+
+        Args:
+            path: SQLite file keeping the entries across restarts, None to keep them in memory only
+            max_entries: Entries kept in memory; older ones are only in the file
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        # ip -> (expires, location), least recently used first
+        self._entries: OrderedDict = OrderedDict()
+        self._store_lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.purged = 0
+
+    def _store(self) -> Optional[sqlite3.Connection]:
+        """Get this process's connection to the file, opening it on first use. Called with _store_lock held."""
+        if self.path is None:
+            return None
+        if self._connection is None or self._pid != os.getpid():
+            # A connection inherited from a parent process must not be used
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                self._connection.execute(statement)
+            self._connection.commit()
+            self._pid = os.getpid()
+        return self._connection
+
+    def _remember(self, ip: str, expires: float, location: Optional[Dict]):
+        """Keep an entry in memory, evicting the least recently used. Called with the lock held."""
+        self._entries[ip] = (expires, location)
+        self._entries.move_to_end(ip)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, ip: str) -> Tuple[bool, Optional[Dict]]:
+        """Look up an IP address.
+
+        Args:
+            ip: The IP address
+
+        Returns:
+            Tuple of (found, location); a found entry may be a cached None for an address without a location
+        """
+        now = time.time()
+        with self.lock:
+            entry = self._entries.get(ip)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(ip)
+                    self.hits += 1
+                    return True, entry[1]
+                del self._entries[ip]
+
+        row = None
+        if self.path is not None:
+            try:
+                with self._store_lock:
+                    row = self._store().execute(
+                        "SELECT location, expires FROM locations WHERE ip = ?", (ip,)
+                    ).fetchone()
+            except (sqlite3.Error, OSError) as e:
+                logger.error(f"Error reading IP {ip} from the geolocation cache: {str(e)}")
+
+        with self.lock:
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return False, None
+            location = json.loads(row[0])
+            self._remember(ip, row[1], location)
+            self.store_hits += 1
+            return True, location
+
+    def put(self, ip: str, location: Optional[Dict], ttl: float, persist: bool = True):
+        """Cache the location of an IP address.
+
+        Args:
+            ip: The IP address
+            location: Its location, or None to remember that it has none
+            ttl: Seconds the entry is used for
+            persist: Whether the entry is also written to the file
+        """
+        expires = time.time() + ttl
+        with self.lock:
+            self._remember(ip, expires, location)
+        if persist and self.path is not None:
+            self.put_many([(ip, location, expires)])
+
+    def put_many(self, entries: Iterable[Tuple[str, Optional[Dict], float]]):
+        """Write entries to the file in one transaction, without keeping them in memory.
+
+        Args:
+            entries: (ip, location, expires) tuples, expires in seconds since the epoch
+        """
+        rows = [(ip, json.dumps(location), expires) for ip, location, expires in entries]
+        if not rows or self.path is None:
+            return
+        try:
+            with self._store_lock:
+                connection = self._store()
+                connection.executemany(
+                    "INSERT OR REPLACE INTO locations (ip, location, expires) VALUES (?, ?, ?)", rows
+                )
+                connection.commit()
+        except (sqlite3.Error, OSError) as e:
+            logger.error(f"Error writing {len(rows)} entries to the geolocation cache: {str(e)}")
+
+    def is_empty(self) -> bool:
+        """Check whether the file holds no entries, such as on first start."""
+        if self.path is None:
+            return not self._entries
+        with self._store_lock:
+            return self._store().execute("SELECT 1 FROM locations LIMIT 1").fetchone() is None
+
+    def purge_expired(self) -> int:
+        """Delete expired entries from the file, a chunk at a time.
+
+        Returns:
+            The number of entries deleted
+        """
+        if self.path is None:
+            return 0
+        deleted = 0
+        while True:
+            try:
+                with self._store_lock:
+                    connection = self._store()
+                    count = connection.execute(
+                        "DELETE FROM locations WHERE ip IN "
+                        "(SELECT ip FROM locations WHERE expires <= ? LIMIT ?)",
+                        (time.time(), PURGE_CHUNK_SIZE)
+                    ).rowcount
+                    connection.commit()
+            except (sqlite3.Error, OSError) as e:
+                logger.error(f"Error purging the geolocation cache: {str(e)}")
+                break
+            deleted += count
+            if count < PURGE_CHUNK_SIZE:
+                break
+        if deleted:
+            with self.lock:
+                self.purged += deleted
+            logger.info(f"Purged {deleted} expired entries from the geolocation cache")
+        return deleted
+
+    def close(self):
+        """Close this process's connection to the file."""
+        with self._store_lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        """Get memory use and hit counts.
+
+        Returns:
+            Dictionary with the entries in memory, the memory limit, lookups answered
+            from memory and from the file, misses, evictions and expired entries purged
+        """
+        with self.lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'store_hits': self.store_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'purged': self.purged,
+            }
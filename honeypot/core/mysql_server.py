@@ -4,6 +4,7 @@ import struct
 import logging
 import hashlib
 import os
+import asyncio
 from honeypot.core.base_server import BaseHoneypot
 from honeypot.database.models import Protocol
 from honeypot.core.config import HOST, MYSQL_PORT
@@ -23,6 +24,8 @@ AUTH_PLUGIN_NAME = b"caching_sha2_password"  # Changed to match client's auth me
 class MySQLHoneypot(BaseHoneypot):
     """MySQL Honeypot server implementation."""
     
+    supports_async = True
+    
     def __init__(self, host: str = HOST, port: int = MYSQL_PORT):
         """Initialize the MySQL honeypot server."""
         super().__init__(host, port, Protocol.MYSQL)
@@ -63,8 +66,46 @@ class MySQLHoneypot(BaseHoneypot):
         finally:
             client_socket.close()
 
+    async def _handle_client_async(self, reader: asyncio.StreamReader,
+                                   writer: asyncio.StreamWriter, client_ip: str):
+        """Handle an individual MySQL client connection on the asyncio engine."""
+        # Send initial handshake packet
+        logger.info(f"Sending handshake to {client_ip}")
+        writer.write(self._build_handshake())
+        await writer.drain()
+        
+        # Read initial authentication packet
+        logger.info(f"Reading auth packet from {client_ip}")
+        try:
+            header = await asyncio.wait_for(reader.readexactly(4), timeout=10)
+            packet_length = struct.unpack('<I', header[:3] + b'\x00')[0]
+            auth_packet = await asyncio.wait_for(reader.readexactly(packet_length), timeout=10)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+            logger.warning(f"No auth packet received from {client_ip}")
+            return
+        if not auth_packet:
+            logger.warning(f"No auth packet received from {client_ip}")
+            return
+        
+        # Parse initial authentication data
+        logger.info(f"Parsing auth packet from {client_ip}")
+        username, password = self._parse_initial_auth_packet(auth_packet)
+        logger.info(f"Auth attempt from {client_ip}: username={username}, password={password}")
+        
+        # Log the attempt and broadcast
+        await self._log_attempt_async(username, password, client_ip)
+        
+        # Send error packet
+        logger.info(f"Sending error packet to {client_ip}")
+        writer.write(self._build_error_packet("Access denied for user"))
+        await writer.drain()
+
     def _send_handshake(self, sock: socket.socket):
         """Send MySQL handshake packet."""
+        sock.send(self._build_handshake())
+
+    def _build_handshake(self) -> bytes:
+        """Build the MySQL handshake packet."""
         # Generate random salt
         salt = b'\x0a' * 20  # Simplified salt for example
         
@@ -81,8 +122,8 @@ class MySQLHoneypot(BaseHoneypot):
         # Send packet length and data
         packet_length = len(handshake)
         header = struct.pack('<I', packet_length)[:3] + b'\x00'
-        sock.send(header + handshake)
-        logger.debug(f"Sent handshake packet: {header.hex()} {handshake.hex()}")
+        logger.debug(f"Built handshake packet: {header.hex()} {handshake.hex()}")
+        return header + handshake
 
     def _read_packet(self, sock: socket.socket) -> bytes:
         """Read a MySQL packet."""
@@ -159,6 +200,10 @@ class MySQLHoneypot(BaseHoneypot):
 
     def _send_error_packet(self, sock: socket.socket, message: str):
         """Send MySQL error packet."""
+        sock.send(self._build_error_packet(message))
+
+    def _build_error_packet(self, message: str) -> bytes:
+        """Build a MySQL error packet."""
         error_packet = bytearray()
         error_packet.append(0xFF)  # Error packet marker
         error_packet.extend(struct.pack('<H', 1045))  # ER_ACCESS_DENIED_ERROR
@@ -169,5 +214,5 @@ class MySQLHoneypot(BaseHoneypot):
         # Send packet length and data
         packet_length = len(error_packet)
         header = struct.pack('<I', packet_length)[:3] + b'\x01'
-        sock.send(header + error_packet)
-        logger.debug(f"Sent error packet: {header.hex()} {error_packet.hex()}") 
\ No newline at end of file
+        logger.debug(f"Built error packet: {header.hex()} {error_packet.hex()}")
+        return header + error_packet 
\ No newline at end of file
@@ -0,0 +1,184 @@
+"""Multi-process listener mode with worker processes sharing the honeypot ports."""
+import importlib
+import logging
+import logging.handlers
+import multiprocessing
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from honeypot.core.config import LOG_LEVEL
+from honeypot.core.geolocation import geolocation_service
+
+logger = logging.getLogger(__name__)
+
+# Modules that register the honeypot server types
+SERVER_MODULES = (
+    'honeypot.core.ssh_server',
+    'honeypot.core.telnet_server',
+    'honeypot.core.ftp_server',
+    'honeypot.core.smtp_server',
+    'honeypot.core.rdp_server',
+    'honeypot.core.sip_server',
+    'honeypot.core.mysql_server',
+)
+
+# Event types sent from workers to the main process
+CONNECT = 'connect'
+ATTEMPT = 'attempt'
+PROBE = 'probe'
+
+# Threads in the main process that store forwarded attempts
+COLLECTOR_WORKERS = 4
+
+# Seconds between checks for worker processes that have died
+SUPERVISE_INTERVAL = 5
+
+def start_log_listener(log_queue) -> logging.handlers.QueueListener:
+    """Write log records sent by child processes with this process's handlers.
+
+    Args:
+        log_queue: Queue the child processes log to
+
+    Returns:
+        The started listener
+    """
+    listener = logging.handlers.QueueListener(
+        log_queue, *logging.getLogger().handlers, respect_handler_level=True
+    )
+    listener.start()
+    return listener
+
+def configure_child_process(log_queue):
+    """Prepare a spawned child process for running honeypot code.
+
+    Logging goes to the parent, which owns the log files, and SIGINT is
+    ignored because the parent handles shutdown and terminates its children.
+
+    Args:
+        log_queue: Queue read by the parent's log listener
+    """
+    root_logger = logging.getLogger()
+    root_logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root_logger.setLevel(getattr(logging, LOG_LEVEL))
+    logging.getLogger("paramiko").setLevel(logging.WARNING)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _worker_main(index: int, events, log_queue):
+    """Entry point of a worker process.
+
+    Args:
+        index: The worker's number, used in its process name
+        events: Queue for connect events and login attempts
+        log_queue: Queue for log records
+    """
+    configure_child_process(log_queue)
+
+    from honeypot.core.base_server import BaseHoneypot, set_attempt_sink, set_probe_sink
+    from honeypot.core.server_registry import registry
+    for module in SERVER_MODULES:
+        importlib.import_module(module)
+
+    # Share the ports with the other workers and hand everything else to the main process
+    BaseHoneypot.reuse_port = True
+    set_attempt_sink(lambda protocol, username, password, client_ip:
+                     events.put((ATTEMPT, protocol.value, username, password, client_ip)))
+    set_probe_sink(lambda protocol, client_ip, kind, payload:
+                   events.put((PROBE, protocol.value, client_ip, kind, payload)))
+    geolocation_service.delegate_prefetch(lambda ip: events.put((CONNECT, ip)))
+
+    logger.info(f"Worker process {index} starting honeypot servers")
+    registry.start_servers()
+    threading.Event().wait()
+
+class PreforkSupervisor:
+    """Starts and supervises the listener worker processes."""
+
+    def __init__(self, processes: int):
+        """Initialize the supervisor.
+
+        Args:
+            processes: Number of worker processes
+        """
+        self.processes = processes
+        self.context = multiprocessing.get_context('spawn')
+        self.events = self.context.Queue()
+        self.log_queue = self.context.Queue()
+        self.workers: List[Optional[multiprocessing.Process]] = [None] * processes
+        self.executor = ThreadPoolExecutor(max_workers=COLLECTOR_WORKERS, thread_name_prefix="attempt-collector")
+        self.stop_event = threading.Event()
+        self.log_listener: Optional[logging.handlers.QueueListener] = None
+
+    def start(self):
+        """Start the worker processes and the threads that serve them.
+
+        Raises:
+            RuntimeError: If the platform does not support SO_REUSEPORT
+        """
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            raise RuntimeError("WORKER_PROCESSES requires SO_REUSEPORT, which this platform does not support")
+
+        self.log_listener = start_log_listener(self.log_queue)
+
+        for index in range(self.processes):
+            self._spawn(index)
+
+        threading.Thread(target=self._collect, name="Prefork-Collector", daemon=True).start()
+        threading.Thread(target=self._supervise, name="Prefork-Supervisor", daemon=True).start()
+        logger.info(f"Started {self.processes} honeypot worker processes")
+
+    def _spawn(self, index: int):
+        """Start worker process number index."""
+        process = self.context.Process(
+            target=_worker_main,
+            args=(index, self.events, self.log_queue),
+            name=f"honeypot-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        self.workers[index] = process
+
+    def _supervise(self):
+        """Restart worker processes that exit unexpectedly."""
+        while not self.stop_event.wait(SUPERVISE_INTERVAL):
+            for index, process in enumerate(self.workers):
+                if process is not None and not process.is_alive():
+                    logger.warning(f"Worker process {index} exited with code {process.exitcode}, restarting")
+                    self._spawn(index)
+
+    def _collect(self):
+        """Handle events forwarded by the worker processes."""
+        from honeypot.core.base_server import store_attempt, store_probe
+        from honeypot.database.models import Protocol
+
+        while not self.stop_event.is_set():
+            try:
+                event = self.events.get()
+                if event[0] == CONNECT:
+                    geolocation_service.prefetch_location(event[1])
+                elif event[0] == ATTEMPT:
+                    _, protocol, username, password, client_ip = event
+                    self.executor.submit(store_attempt, Protocol(protocol), username, password, client_ip)
+                elif event[0] == PROBE:
+                    _, protocol, client_ip, kind, payload = event
+                    self.executor.submit(store_probe, Protocol(protocol), client_ip, kind, payload)
+            except (EOFError, OSError):
+                # The queue was closed during shutdown
+                return
+            except Exception as e:
+                logger.error(f"Error handling worker event: {str(e)}")
+
+    def stop(self):
+        """Terminate the worker processes and flush pending attempts."""
+        self.stop_event.set()
+        for process in self.workers:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in self.workers:
+            if process is not None:
+                process.join(timeout=5)
+        self.executor.shutdown(wait=True)
+        if self.log_listener:
+            self.log_listener.stop()
+        logger.info("Worker processes stopped")
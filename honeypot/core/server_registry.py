@@ -5,8 +5,10 @@ allowing for dynamic server discovery and instantiation.
 """
 import logging
 import threading
-from typing import Dict, Type, List, Callable
+from typing import Dict, Type, List, Callable, Optional
 from honeypot.core.base_server import BaseHoneypot
+from honeypot.core.thread_manager import thread_manager
+from honeypot.core.config import WORKER_QUOTAS
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +20,7 @@ class ServerRegistry:
         self._server_types: Dict[str, Type[BaseHoneypot]] = {}
         self._active_servers: List[BaseHoneypot] = []
         self._server_threads: List[threading.Thread] = []
+        self._worker_quotas: Dict[str, Optional[int]] = {}
     
     def register(self, server_type: Type[BaseHoneypot]) -> None:
         """Register a honeypot server type.
@@ -38,6 +41,32 @@ class ServerRegistry:
         """
         return self._server_types.copy()
     
+    def set_worker_quota(self, server_name: str, quota: Optional[int]) -> None:
+        """Override a server type's worker quota.
+        
+        Args:
+            server_name: The registered server class name
+            quota: Workers the server may use while others are waiting, or None for no limit
+        """
+        self._worker_quotas[server_name] = quota
+    
+    def get_worker_quota(self, server_class: Type[BaseHoneypot], protocol: str) -> Optional[int]:
+        """Resolve a server's worker quota.
+        
+        The WORKER_QUOTAS setting wins over overrides set on the registry,
+        which win over the class's worker_quota attribute.
+        
+        Args:
+            server_class: The server class
+            protocol: The server's protocol name
+        
+        Returns:
+            The quota, or None for no limit
+        """
+        if protocol in WORKER_QUOTAS:
+            return WORKER_QUOTAS[protocol]
+        return self._worker_quotas.get(server_class.__name__, server_class.worker_quota)
+    
     def start_servers(self) -> None:
         """Start all registered server types in separate threads."""
         logger.info(f"Starting {len(self._server_types)} honeypot servers")
@@ -48,6 +77,10 @@ class ServerRegistry:
                 server_instance = server_class()
                 self._active_servers.append(server_instance)
                 
+                # Give the server's protocol its share of the shared workers
+                protocol = server_instance.protocol.value
+                thread_manager.set_worker_quota(protocol, self.get_worker_quota(server_class, protocol))
+                
                 # Create and start a thread for this server
                 thread = threading.Thread(
                     target=self._start_server_thread,
@@ -2,7 +2,10 @@
 import socket
 import logging
 import re
+import asyncio
+from typing import Optional
 from honeypot.core.base_server import BaseHoneypot
+from honeypot.core.async_engine import async_engine
 from honeypot.database.models import Protocol
 from honeypot.core.config import HOST, SIP_PORT
 import threading
@@ -15,6 +18,8 @@ logger = logging.getLogger(__name__)
 class SIPHoneypot(BaseHoneypot):
     """SIP Honeypot server implementation."""
     
+    supports_async = True
+    
     def __init__(self, host: str = HOST, port: int = SIP_PORT):
         """Initialize the SIP honeypot server."""
         super().__init__(host, port, Protocol.SIP)
@@ -42,7 +47,7 @@ class SIPHoneypot(BaseHoneypot):
             logger.debug(f"New TCP connection from {client_ip}")
             
             # Read the entire SIP message
-            message = self._read_sip_message(client_socket)
+            message = self._read_sip_message(client_socket, client_ip)
             if not message:
                 logger.debug(f"No data received from {client_ip}")
                 return
@@ -59,11 +64,40 @@ class SIPHoneypot(BaseHoneypot):
             client_socket.close()
             logger.debug(f"Closed TCP connection from {client_ip}")
 
+    async def _handle_client_async(self, reader: asyncio.StreamReader,
+                                   writer: asyncio.StreamWriter, client_ip: str):
+        """Handle an individual TCP client connection on the asyncio engine."""
+        logger.debug(f"New TCP connection from {client_ip}")
+        
+        # Like _read_sip_message, a timeout or oversized line ends the message
+        # and whatever arrived before it is still processed
+        lines = []
+        while True:
+            line = await self._read_line_async(reader)
+            if not line:
+                break
+            lines.append(line)
+        
+        if not lines:
+            logger.debug(f"No data received from {client_ip}")
+            return
+        
+        message = b'\r\n'.join(lines) + b'\r\n\r\n'
+        logger.debug(f"Received SIP message from {client_ip}:\n{message.decode('utf-8', errors='ignore')}")
+        # Parsing logs the attempt, which blocks, so run it off the event loop
+        response = await async_engine.run_blocking(self._handle_sip_message, message, client_ip)
+        if response:
+            writer.write(response)
+            await writer.drain()
+            logger.debug("Sent TCP response")
+
     def start(self):
         """Start the SIP honeypot server on both TCP and UDP."""
         try:
             # Start UDP server before TCP server
             self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            if self.reuse_port:
+                self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
             self.udp_socket.bind((self.host, self.port))
             
             # Start UDP handler in a separate thread
@@ -99,7 +133,8 @@ class SIPHoneypot(BaseHoneypot):
                     self._handle_udp_message_with_thread_manager, 
                     client_ip, 
                     data, 
-                    client_ip
+                    client_ip,
+                    pool=self.protocol.value
                 ):
                     logger.warning(f"Rejected UDP message from {client_ip}: too many connections")
                     
@@ -115,49 +150,28 @@ class SIPHoneypot(BaseHoneypot):
         # Update activity to prevent timeout
         self.thread_manager.update_activity(client_ip)
 
-    def _read_sip_message(self, sock: socket.socket) -> bytes:
+    def _read_sip_message(self, sock: socket.socket, client_ip: str) -> Optional[bytes]:
         """Read an entire SIP message from the socket.
         
         Args:
             sock: The socket to read from
+            client_ip: The client's IP address
             
         Returns:
             The complete SIP message as bytes
         """
-        buffer = bytearray()
-        empty_line_count = 0
-        last_char = None
+        reader = self._line_reader(sock, client_ip)
+        lines = []
         
         while True:
             try:
-                data = sock.recv(1)
-                if not data:
-                    logger.debug("No more data to read")
+                line = reader.readline()
+                if not line:
+                    # Empty line ends the message headers, or the peer closed
+                    if reader.eof:
+                        logger.debug("No more data to read")
                     break
-                    
-                # Update activity timestamp to prevent timeout
-                client_ip = sock.getpeername()[0]
-                self.thread_manager.update_activity(client_ip)
-                
-                # Handle different line endings
-                if data == b'\r':
-                    buffer.extend(data)
-                    last_char = data
-                elif data == b'\n':
-                    if last_char == b'\r':
-                        # We already added the \r, just add the \n
-                        buffer.extend(data)
-                    else:
-                        # Single \n, add it
-                        buffer.extend(data)
-                    last_char = data
-                    empty_line_count += 1
-                    if empty_line_count == 2:  # Found empty line
-                        return bytes(buffer)
-                else:
-                    buffer.extend(data)
-                    last_char = data
-                    empty_line_count = 0
+                lines.append(line)
                     
             except socket.timeout:
                 logger.debug("Socket timeout while reading")
@@ -166,7 +180,7 @@ class SIPHoneypot(BaseHoneypot):
                 logger.error(f"Error reading from socket: {str(e)}", exc_info=True)
                 break
                 
-        return bytes(buffer) if buffer else None
+        return b'\r\n'.join(lines) + b'\r\n\r\n' if lines else None
 
     def _handle_udp_message(self, data: bytes, client_ip: str):
         """Handle a UDP message."""
@@ -192,6 +206,32 @@ class SIPHoneypot(BaseHoneypot):
             client_ip: The client's IP address
             response_socket: Either a socket object (for TCP) or a tuple of (socket, client_address) for UDP
         """
+        try:
+            response_bytes = self._handle_sip_message(data, client_ip)
+            if response_bytes:
+                # Handle different types of response sockets
+                if isinstance(response_socket, socket.socket):
+                    # TCP socket
+                    response_socket.send(response_bytes)
+                    logger.debug("Sent TCP response")
+                elif isinstance(response_socket, tuple) and len(response_socket) == 2:
+                    # UDP socket and address
+                    sock, address = response_socket
+                    sock.sendto(response_bytes, (address, self.port))
+                    logger.debug(f"Sent UDP response to {address}:{self.port}")
+        except Exception as e:
+            logger.error(f"Error sending SIP response: {str(e)}", exc_info=True)
+
+    def _handle_sip_message(self, data: bytes, client_ip: str) -> Optional[bytes]:
+        """Parse a SIP message, log any credentials and build the response.
+        
+        Args:
+            data: The SIP message data
+            client_ip: The client's IP address
+            
+        Returns:
+            The encoded SIP response, or None if no response should be sent
+        """
         try:
             # Decode the message
             message = data.decode('utf-8', errors='ignore')
@@ -242,22 +282,13 @@ class SIPHoneypot(BaseHoneypot):
                 logger.debug(f"Handling SIP method: {method}")
                 response = self.sip_methods[method](message, client_ip)
                 if response:
-                    response_bytes = response.encode()
-                    # Handle different types of response sockets
-                    if isinstance(response_socket, socket.socket):
-                        # TCP socket
-                        response_socket.send(response_bytes)
-                        logger.debug("Sent TCP response")
-                    elif isinstance(response_socket, tuple) and len(response_socket) == 2:
-                        # UDP socket and address
-                        sock, address = response_socket
-                        sock.sendto(response_bytes, (address, self.port))
-                        logger.debug(f"Sent UDP response to {address}:{self.port}")
+                    return response.encode()
             else:
                 logger.debug(f"Unsupported SIP method: {method}")
         
         except Exception as e:
             logger.error(f"Error processing SIP message: {str(e)}", exc_info=True)
+        return None
 
     def _handle_register(self, message: str, client_ip: str) -> str:
         """Handle SIP REGISTER requests."""
@@ -3,6 +3,8 @@ import socket
 import logging
 import base64
 import re
+import asyncio
+from typing import Dict, Optional, Tuple
 from honeypot.core.base_server import BaseHoneypot
 from honeypot.database.models import Protocol
 from honeypot.core.config import HOST, SMTP_PORT
@@ -10,10 +12,23 @@ from honeypot.core.server_registry import register_server
 
 logger = logging.getLogger(__name__)
 
+WELCOME_MESSAGE = b'220 smtp.gmail.com ESMTP ready\r\n'
+
+EHLO_RESPONSE = (
+    b'250-smtp.gmail.com\r\n'
+    b'250-PIPELINING\r\n'
+    b'250-SIZE 35882577\r\n'
+    b'250-STARTTLS\r\n'
+    b'250-AUTH LOGIN PLAIN\r\n'
+    b'250 8BITMIME\r\n'
+)
+
 @register_server
 class SMTPHoneypot(BaseHoneypot):
     """SMTP Honeypot server implementation."""
     
+    supports_async = True
+    
     def __init__(self, host: str = HOST, port: int = SMTP_PORT):
         """Initialize the SMTP honeypot server."""
         super().__init__(host, port, Protocol.SMTP)
@@ -22,88 +37,120 @@ class SMTPHoneypot(BaseHoneypot):
         """Handle an individual SMTP client connection."""
         try:
             # Send welcome message
-            client_socket.send(b'220 smtp.gmail.com ESMTP ready\r\n')
+            client_socket.send(WELCOME_MESSAGE)
             
             # Initialize state
-            username = None
-            password = None
-            in_auth = False
+            state = {'mode': None, 'username': None}
+            reader = self._line_reader(client_socket, client_ip)
             
             while True:
                 # Read command
-                command = self._read_line(client_socket).decode('ascii', errors='ignore').strip()
+                command = self._read_line(reader).decode('ascii', errors='ignore').strip()
                 if not command:
                     break
-                    
-                # Parse command and arguments
-                parts = command.split(' ')
-                cmd = parts[0].upper()
-                args = parts[1:] if len(parts) > 1 else []
                 
-                # Handle different commands
-                if cmd == 'EHLO' or cmd == 'HELO':
-                    client_socket.send(b'250-smtp.gmail.com\r\n')
-                    client_socket.send(b'250-PIPELINING\r\n')
-                    client_socket.send(b'250-SIZE 35882577\r\n')
-                    client_socket.send(b'250-STARTTLS\r\n')
-                    client_socket.send(b'250-AUTH LOGIN PLAIN\r\n')
-                    client_socket.send(b'250 8BITMIME\r\n')
-                elif cmd == 'AUTH':
-                    if len(args) >= 2 and args[0].upper() == 'PLAIN':
-                        # Handle inline AUTH PLAIN
-                        try:
-                            auth_data = base64.b64decode(args[1]).decode('utf-8')
-                            # AUTH PLAIN format is: \x00username\x00password
-                            _, username, password = auth_data.split('\x00')
-                            # Log the attempt and broadcast
-                            self._log_attempt(username, password, client_ip)
-                            # Send error message
-                            client_socket.send(b'535 Authentication failed\r\n')
-                            break
-                        except Exception as e:
-                            logger.error(f"Error decoding AUTH PLAIN from {client_ip}: {str(e)}")
-                            client_socket.send(b'501 Authentication failed\r\n')
-                            break
-                    elif len(args) == 1 and args[0].upper() == 'PLAIN':
-                        # Handle multi-step AUTH PLAIN
-                        client_socket.send(b'334 \r\n')
-                        in_auth = True
-                    elif len(args) == 1 and args[0].upper() == 'LOGIN':
-                        # Handle AUTH LOGIN
-                        client_socket.send(b'334 VXNlcm5hbWU6\r\n')  # Base64 encoded "Username:"
-                        username = base64.b64decode(self._read_line(client_socket).strip()).decode('utf-8')
-                        client_socket.send(b'334 UGFzc3dvcmQ6\r\n')  # Base64 encoded "Password:"
-                        password = base64.b64decode(self._read_line(client_socket).strip()).decode('utf-8')
-                        # Log the attempt and broadcast
-                        self._log_attempt(username, password, client_ip)
-                        # Send error message
-                        client_socket.send(b'535 Authentication failed\r\n')
-                        break
-                    else:
-                        client_socket.send(b'504 Authentication mechanism not supported\r\n')
-                elif in_auth:
-                    # Handle AUTH PLAIN continuation
-                    try:
-                        auth_data = base64.b64decode(command).decode('utf-8')
-                        # AUTH PLAIN format is: \x00username\x00password
-                        _, username, password = auth_data.split('\x00')
-                        # Log the attempt and broadcast
-                        self._log_attempt(username, password, client_ip)
-                        # Send error message
-                        client_socket.send(b'535 Authentication failed\r\n')
-                        break
-                    except Exception as e:
-                        logger.error(f"Error decoding AUTH PLAIN continuation from {client_ip}: {str(e)}")
-                        client_socket.send(b'501 Authentication failed\r\n')
-                        break
-                elif cmd == 'QUIT':
-                    client_socket.send(b'221 Goodbye\r\n')
+                response, close, credentials = self._handle_command(command, state, client_ip)
+                if credentials:
+                    # Log the attempt and broadcast
+                    self._log_attempt(*credentials, client_ip)
+                client_socket.send(response)
+                if close:
                     break
-                else:
-                    # Unknown or unhandled command
-                    client_socket.send(b'500 Error: command not recognized\r\n')
             
         except Exception as e:
             logger.error(f"Error handling client {client_ip}: {str(e)}")
         finally:
-            client_socket.close() 
\ No newline at end of file
+            client_socket.close()
+
+    async def _handle_client_async(self, reader: asyncio.StreamReader,
+                                   writer: asyncio.StreamWriter, client_ip: str):
+        """Handle an individual SMTP client connection on the asyncio engine."""
+        writer.write(WELCOME_MESSAGE)
+        await writer.drain()
+        
+        state = {'mode': None, 'username': None}
+        
+        while True:
+            command = (await self._read_line_async(reader)).decode('ascii', errors='ignore').strip()
+            if not command:
+                break
+            
+            response, close, credentials = self._handle_command(command, state, client_ip)
+            if credentials:
+                await self._log_attempt_async(*credentials, client_ip)
+            writer.write(response)
+            await writer.drain()
+            if close:
+                break
+
+    def _handle_command(self, command: str, state: Dict,
+                        client_ip: str) -> Tuple[bytes, bool, Optional[Tuple[str, str]]]:
+        """Process a single SMTP command or AUTH continuation line.
+        
+        Args:
+            command: The line received from the client
+            state: Per-connection state, updated in place
+            client_ip: The client's IP address (used for logging)
+            
+        Returns:
+            Tuple of (response, whether to close the connection, captured
+            (username, password) credentials or None)
+        """
+        mode = state['mode']
+        
+        if mode == 'auth_plain':
+            # Handle AUTH PLAIN continuation
+            try:
+                return b'535 Authentication failed\r\n', True, self._decode_auth_plain(command)
+            except Exception as e:
+                logger.error(f"Error decoding AUTH PLAIN continuation from {client_ip}: {str(e)}")
+                return b'501 Authentication failed\r\n', True, None
+        elif mode in ('auth_login_user', 'auth_login_pass'):
+            # Handle AUTH LOGIN continuation
+            try:
+                value = base64.b64decode(command).decode('utf-8')
+            except Exception as e:
+                logger.error(f"Error decoding AUTH LOGIN from {client_ip}: {str(e)}")
+                return b'501 Authentication failed\r\n', True, None
+            if mode == 'auth_login_user':
+                state['username'] = value
+                state['mode'] = 'auth_login_pass'
+                return b'334 UGFzc3dvcmQ6\r\n', False, None  # Base64 encoded "Password:"
+            return b'535 Authentication failed\r\n', True, (state['username'], value)
+        
+        # Parse command and arguments
+        parts = command.split(' ')
+        cmd = parts[0].upper()
+        args = parts[1:] if len(parts) > 1 else []
+        
+        # Handle different commands
+        if cmd == 'EHLO' or cmd == 'HELO':
+            return EHLO_RESPONSE, False, None
+        elif cmd == 'AUTH':
+            if len(args) >= 2 and args[0].upper() == 'PLAIN':
+                # Handle inline AUTH PLAIN
+                try:
+                    return b'535 Authentication failed\r\n', True, self._decode_auth_plain(args[1])
+                except Exception as e:
+                    logger.error(f"Error decoding AUTH PLAIN from {client_ip}: {str(e)}")
+                    return b'501 Authentication failed\r\n', True, None
+            elif len(args) == 1 and args[0].upper() == 'PLAIN':
+                # Handle multi-step AUTH PLAIN
+                state['mode'] = 'auth_plain'
+                return b'334 \r\n', False, None
+            elif len(args) == 1 and args[0].upper() == 'LOGIN':
+                # Handle AUTH LOGIN
+                state['mode'] = 'auth_login_user'
+                return b'334 VXNlcm5hbWU6\r\n', False, None  # Base64 encoded "Username:"
+            return b'504 Authentication mechanism not supported\r\n', False, None
+        elif cmd == 'QUIT':
+            return b'221 Goodbye\r\n', True, None
+        # Unknown or unhandled command
+        return b'500 Error: command not recognized\r\n', False, None
+
+    def _decode_auth_plain(self, data: str) -> Tuple[str, str]:
+        """Decode an AUTH PLAIN payload into (username, password)."""
+        auth_data = base64.b64decode(data).decode('utf-8')
+        # AUTH PLAIN format is: \x00username\x00password
+        _, username, password = auth_data.split('\x00')
+        return username, password
@@ -0,0 +1,89 @@
+"""Persistent SSH host keys."""
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+import paramiko
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+logger = logging.getLogger(__name__)
+
+# Modulus size for generated RSA host keys, the ssh-keygen default
+RSA_KEY_BITS = 3072
+
+def _generate_ed25519():
+    return ed25519.Ed25519PrivateKey.generate()
+
+def _generate_ecdsa(curve) -> Callable:
+    return lambda: ec.generate_private_key(curve())
+
+def _generate_rsa():
+    return rsa.generate_private_key(public_exponent=65537, key_size=RSA_KEY_BITS)
+
+# Key type -> (file name, generator, paramiko key class)
+KEY_TYPES: Dict[str, Tuple[str, Callable, type]] = {
+    'ed25519': ('ssh_host_ed25519_key', _generate_ed25519, paramiko.Ed25519Key),
+    'ecdsa-256': ('ssh_host_ecdsa_key', _generate_ecdsa(ec.SECP256R1), paramiko.ECDSAKey),
+    'ecdsa-384': ('ssh_host_ecdsa384_key', _generate_ecdsa(ec.SECP384R1), paramiko.ECDSAKey),
+    'ecdsa-521': ('ssh_host_ecdsa521_key', _generate_ecdsa(ec.SECP521R1), paramiko.ECDSAKey),
+    'rsa': ('ssh_host_rsa_key', _generate_rsa, paramiko.RSAKey),
+}
+
+def _write_key(path: Path, generate: Callable):
+    """Generate a key and write it to path unless another process got there first.
+
+    The key is written to a temporary file and hard-linked into place, so
+    concurrent workers never see a partial file and all end up loading the
+    same key.
+    """
+    private_key = generate()
+    data = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.OpenSSH,
+        serialization.NoEncryption()
+    )
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.link(temp_path, path)
+        logger.info(f"Generated SSH host key {path}")
+    except FileExistsError:
+        pass
+    finally:
+        os.unlink(temp_path)
+
+def load_host_keys(key_dir: str, key_types: List[str]) -> List[paramiko.PKey]:
+    """Load the configured SSH host keys, generating any that are missing.
+
+    Args:
+        key_dir: Directory holding the key files
+        key_types: Key types to load, in order of preference
+
+    Returns:
+        The host keys, one per key type
+
+    Raises:
+        ValueError: If a key type is not supported or no key type is given
+    """
+    unknown = [key_type for key_type in key_types if key_type not in KEY_TYPES]
+    if unknown:
+        raise ValueError(f"Unsupported SSH host key type(s): {', '.join(unknown)}. "
+                         f"Supported: {', '.join(KEY_TYPES)}")
+    if not key_types:
+        raise ValueError("At least one SSH host key type is required")
+
+    directory = Path(key_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    keys = []
+    for key_type in key_types:
+        file_name, generate, key_class = KEY_TYPES[key_type]
+        path = directory / file_name
+        if not path.exists():
+            _write_key(path, generate)
+        key = key_class.from_private_key_file(str(path))
+        logger.debug(f"Loaded {key_type} SSH host key: {key.fingerprint}")
+        keys.append(key)
+    return keys
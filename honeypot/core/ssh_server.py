@@ -2,13 +2,38 @@
 import paramiko
 import socket
 import logging
-from honeypot.core.base_server import BaseHoneypot
+import time
+import multiprocessing
+from typing import List, Optional
+from honeypot.core.base_server import BaseHoneypot, record_probe
 from honeypot.database.models import Protocol
-from honeypot.core.config import HOST, SSH_PORT
+from honeypot.core.config import (
+    HOST, SSH_PORT, CONNECTION_TIMEOUT, SSH_BANNER_TIMEOUT, SSH_HANDSHAKE_WORKERS, SSH_HOST_KEY_DIR, SSH_HOST_KEY_TYPES
+)
 from honeypot.core.server_registry import register_server
+from honeypot.core.ssh_keys import load_host_keys
+from honeypot.core.ssh_workers import SSHHandshakePool
 
 logger = logging.getLogger(__name__)
 
+# Identification string sent to clients, mimicking a real server
+SERVER_VERSION = "SSH-2.0-OpenSSH_8.2p1 Ubuntu-4ubuntu0.5"
+
+# Every SSH client starts its identification string with this
+SSH_IDENTIFICATION_PREFIX = b"SSH-"
+
+# Seconds between peeks while a client has sent only part of the identification prefix
+IDENTIFICATION_POLL_INTERVAL = 0.05
+
+# Bytes of a non-SSH payload kept with the probe
+PROBE_PAYLOAD_BYTES = 256
+
+# Probe kinds: closed without sending anything, sent nothing before the
+# banner deadline, or sent something that is not SSH
+PROBE_EMPTY = 'empty'
+PROBE_SILENT = 'silent'
+PROBE_NON_SSH = 'non-ssh'
+
 # Configure Paramiko logger to be less verbose
 paramiko_logger = logging.getLogger("paramiko")
 paramiko_logger.setLevel(logging.ERROR)  # Set to ERROR instead of WARNING
@@ -38,6 +63,34 @@ class ParamikoFilter(logging.Filter):
 paramiko_logger.addFilter(ParamikoFilter())
 transport_logger.addFilter(ParamikoFilter())
 
+class BannerSentSocket:
+    """Socket proxy for a connection whose server banner was already sent.
+    
+    Paramiko always writes its identification string when a Transport
+    starts. The honeypot sends it before classifying the client, so the
+    proxy drops paramiko's copy and passes everything else through.
+    """
+    
+    def __init__(self, sock: socket.socket, banner: bytes):
+        """Initialize the proxy.
+        
+        Args:
+            sock: The client socket
+            banner: The identification line that was already sent
+        """
+        self._sock = sock
+        self._banner = banner
+    
+    def send(self, data: bytes) -> int:
+        """Send data, swallowing the banner paramiko re-sends when its Transport starts."""
+        if self._banner is not None and data == self._banner:
+            self._banner = None
+            return len(data)
+        return self._sock.send(data)
+    
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
 class HoneypotServerInterface(paramiko.ServerInterface):
     """SSH server interface implementation."""
     
@@ -87,20 +140,113 @@ class HoneypotServerInterface(paramiko.ServerInterface):
 class SSHHoneypot(BaseHoneypot):
     """SSH Honeypot server implementation."""
     
-    def __init__(self, host: str = HOST, port: int = SSH_PORT):
-        """Initialize the SSH honeypot server."""
+    # Handshakes are slow and CPU heavy, so SSH floods must leave workers for the rest
+    worker_quota = 20
+    
+    def __init__(self, host: str = HOST, port: int = SSH_PORT, host_keys: Optional[List[paramiko.PKey]] = None):
+        """Initialize the SSH honeypot server.
+        
+        Args:
+            host: The host address to bind to
+            port: The port to listen on
+            host_keys: Host keys to offer instead of the configured ones
+        """
         super().__init__(host, port, Protocol.SSH)
-        # Generate ECDSA key
-        self.host_key = paramiko.ECDSAKey.generate(bits=521)
-        logger.info(f"Generated ECDSA host key: {self.host_key.get_fingerprint().hex()}")
-
+        self.handshake_pool = None
+        if host_keys is None:
+            host_keys = load_host_keys(SSH_HOST_KEY_DIR, SSH_HOST_KEY_TYPES)
+        self.host_keys = host_keys
+        logger.info(f"SSH host keys: {', '.join(f'{key.get_name()} {key.fingerprint}' for key in host_keys)}")
+    
+    def start(self):
+        """Start the SSH honeypot, with handshake worker processes if configured."""
+        if SSH_HANDSHAKE_WORKERS > 0:
+            if multiprocessing.current_process().daemon:
+                # Prefork listener processes already spread handshakes across cores
+                # and, being daemonic, cannot start processes of their own
+                logger.warning("SSH_HANDSHAKE_WORKERS is ignored in WORKER_PROCESSES mode")
+            else:
+                self.handshake_pool = SSHHandshakePool(SSH_HANDSHAKE_WORKERS)
+                self.handshake_pool.start()
+        super().start()
+    
+    def _classify_client(self, client_socket: socket.socket):
+        """Send the server banner and peek at the client's first bytes.
+        
+        Args:
+            client_socket: The client's socket connection
+        
+        Returns:
+            Tuple of (probe kind, payload), with a kind of None for SSH clients
+        """
+        client_socket.sendall(f"{SERVER_VERSION}\r\n".encode())
+        deadline = time.monotonic() + SSH_BANNER_TIMEOUT
+        data = b''
+        while True:
+            remaining = deadline - time.monotonic()
+            client_socket.settimeout(max(remaining, 0))
+            try:
+                peeked = client_socket.recv(len(SSH_IDENTIFICATION_PREFIX), socket.MSG_PEEK)
+            except (socket.timeout, BlockingIOError):
+                break
+            if not peeked:
+                return PROBE_EMPTY, b''
+            data = peeked
+            if data == SSH_IDENTIFICATION_PREFIX or not SSH_IDENTIFICATION_PREFIX.startswith(data) or remaining <= 0:
+                break
+            # Peeked bytes stay readable, so wait for the rest of the prefix instead of polling the socket
+            time.sleep(min(IDENTIFICATION_POLL_INTERVAL, remaining))
+        
+        if not data:
+            return PROBE_SILENT, b''
+        if SSH_IDENTIFICATION_PREFIX.startswith(data):
+            # Includes a slow SSH client that has sent only part of the prefix by the deadline
+            return None, b''
+        return PROBE_NON_SSH, client_socket.recv(PROBE_PAYLOAD_BYTES)
+    
     def _handle_client(self, client_socket: socket.socket, client_ip: str):
         """Handle an individual SSH client connection."""
+        try:
+            kind, payload = self._classify_client(client_socket)
+        except OSError as e:
+            logger.debug(f"Connection from {client_ip} failed before the SSH banner: {str(e)}")
+            client_socket.close()
+            return
+        
+        if kind is not None:
+            # Scanners and non-SSH probes never get a paramiko Transport
+            logger.debug(f"SSH probe from {client_ip}: {kind}")
+            record_probe(self.protocol, client_ip, kind, payload.decode('utf-8', errors='backslashreplace'))
+            client_socket.close()
+            return
+        
+        client_socket.settimeout(CONNECTION_TIMEOUT)
+        if self.handshake_pool is None:
+            self._run_transport(client_socket, client_ip)
+            return
+        
+        try:
+            if not self.handshake_pool.handshake(client_socket, client_ip):
+                # No worker available, handle the connection in this process
+                self._run_transport(client_socket, client_ip)
+        finally:
+            client_socket.close()
+    
+    def _run_transport(self, client_socket: socket.socket, client_ip: str):
+        """Run the SSH handshake and authentication for a client, then close it.
+        
+        The server banner must already have been sent by _classify_client.
+        
+        Args:
+            client_socket: The client's socket connection
+            client_ip: The client's IP address
+        """
         transport = None
         try:
-            transport = paramiko.Transport(client_socket)
-            transport.add_server_key(self.host_key)
-            transport.local_version = "SSH-2.0-OpenSSH_8.2p1 Ubuntu-4ubuntu0.5"  # Mimic a real server
+            transport = paramiko.Transport(BannerSentSocket(client_socket, f"{SERVER_VERSION}\r\n".encode()))
+            for host_key in self.host_keys:
+                transport.add_server_key(host_key)
+            transport.local_version = SERVER_VERSION  # Mimic a real server
             
             server = HoneypotServerInterface(self, client_ip)
             try:
@@ -0,0 +1,219 @@
+"""SSH handshake worker processes fed client sockets by the main process."""
+import atexit
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from honeypot.core.config import CONNECTION_TIMEOUT
+from honeypot.core.prefork import configure_child_process, start_log_listener
+
+logger = logging.getLogger(__name__)
+
+# Largest message exchanged with a worker process
+MESSAGE_SIZE = 65536
+
+# Upper bound on waiting for a worker; connection deadlines normally end handshakes much sooner
+HANDSHAKE_WAIT_TIMEOUT = 600
+
+# Threads in the main process that store attempts reported by the workers
+RECORD_WORKERS = 2
+
+# Message types sent from workers to the main process
+ATTEMPT = 'attempt'
+DONE = 'done'
+
+def _handshake_worker_main(index: int, channel: socket.socket, log_queue):
+    """Entry point of an SSH handshake worker process.
+
+    Args:
+        index: The worker's number, used in log messages
+        channel: This worker's end of the Unix socket to the main process
+        log_queue: Queue for log records
+    """
+    configure_child_process(log_queue)
+
+    from honeypot.core.base_server import set_attempt_sink
+    from honeypot.core.geolocation import geolocation_service
+    from honeypot.core.ssh_server import SSHHoneypot
+
+    send_lock = threading.Lock()
+
+    def send(message: dict):
+        with send_lock:
+            channel.send(json.dumps(message).encode())
+
+    # The main process owns the database and the geolocation cache
+    geolocation_service.persist_cache = False
+    set_attempt_sink(lambda protocol, username, password, client_ip: send(
+        {'type': ATTEMPT, 'username': username, 'password': password, 'client_ip': client_ip}
+    ))
+    # The main process has already created the host keys, so this only loads them
+    honeypot = SSHHoneypot()
+
+    def run(request: dict, fd: int):
+        try:
+            client_socket = socket.socket(fileno=fd)
+            client_socket.settimeout(CONNECTION_TIMEOUT)
+            honeypot._run_transport(client_socket, request['client_ip'])
+        finally:
+            send({'type': DONE, 'id': request['id']})
+
+    logger.info(f"SSH handshake worker {index} ready")
+    while True:
+        message, fds, _, _ = socket.recv_fds(channel, MESSAGE_SIZE, 1)
+        if not message:
+            # The main process closed its end
+            return
+        request = json.loads(message)
+        threading.Thread(target=run, args=(request, fds[0]), daemon=True).start()
+
+class _Worker:
+    """A handshake worker process and the main process's end of its channel."""
+
+    def __init__(self, process: multiprocessing.Process, channel: socket.socket):
+        self.process = process
+        self.channel = channel
+        self.send_lock = threading.Lock()
+        # Handshake id -> event set when the worker is done with the connection
+        self.pending: Dict[int, threading.Event] = {}
+
+class SSHHandshakePool:
+    """Runs SSH handshakes in worker processes."""
+
+    def __init__(self, processes: int):
+        """Initialize the pool.
+
+        Args:
+            processes: Number of worker processes
+        """
+        self.processes = processes
+        self.context = multiprocessing.get_context('spawn')
+        self.log_queue = self.context.Queue()
+        self.log_listener: Optional[logging.handlers.QueueListener] = None
+        self.workers: List[Optional[_Worker]] = [None] * processes
+        self.executor = ThreadPoolExecutor(max_workers=RECORD_WORKERS, thread_name_prefix="ssh-attempts")
+        self.lock = threading.Lock()
+        self.next_id = 0
+        self.stopped = False
+
+    def start(self):
+        """Start the worker processes."""
+        self.log_listener = start_log_listener(self.log_queue)
+        for index in range(self.processes):
+            self._spawn(index)
+        # Stop before multiprocessing terminates the workers at exit, so they are not restarted
+        atexit.register(self.stop)
+        logger.info(f"Started {self.processes} SSH handshake worker processes")
+
+    def _spawn(self, index: int):
+        """Start worker process number index and the thread reading its messages."""
+        parent_end, child_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        process = self.context.Process(
+            target=_handshake_worker_main,
+            args=(index, child_end, self.log_queue),
+            name=f"ssh-handshake-{index}",
+            daemon=True
+        )
+        process.start()
+        child_end.close()
+        worker = _Worker(process, parent_end)
+        self.workers[index] = worker
+        threading.Thread(
+            target=self._read_worker, args=(index, worker), name=f"SSH-Handshake-Reader-{index}", daemon=True
+        ).start()
+
+    def _read_worker(self, index: int, worker: _Worker):
+        """Handle messages from one worker until it exits, then replace it."""
+        from honeypot.core.base_server import record_attempt
+        from honeypot.core.thread_manager import thread_manager
+        from honeypot.database.models import Protocol
+
+        while True:
+            try:
+                message = worker.channel.recv(MESSAGE_SIZE)
+            except OSError:
+                message = b''
+            if not message:
+                break
+            try:
+                event = json.loads(message)
+                if event['type'] == ATTEMPT:
+                    # The handshake is making progress, so keep its connection alive
+                    thread_manager.update_activity(event['client_ip'])
+                    self.executor.submit(
+                        record_attempt, Protocol.SSH, event['username'], event['password'], event['client_ip']
+                    )
+                elif event['type'] == DONE:
+                    with self.lock:
+                        finished = worker.pending.pop(event['id'], None)
+                    if finished:
+                        finished.set()
+            except Exception as e:
+                logger.error(f"Error handling SSH handshake worker message: {str(e)}")
+
+        # The worker is gone: release everyone waiting on it
+        with self.lock:
+            pending = list(worker.pending.values())
+            worker.pending.clear()
+        for finished in pending:
+            finished.set()
+        worker.channel.close()
+        worker.process.join(timeout=5)
+        if not self.stopped:
+            logger.warning(f"SSH handshake worker {index} exited with code {worker.process.exitcode}, restarting")
+            self._spawn(index)
+
+    def handshake(self, client_socket: socket.socket, client_ip: str) -> bool:
+        """Run the SSH handshake for a client in a worker process and wait for it.
+
+        The caller keeps ownership of client_socket and closes it afterwards.
+
+        Args:
+            client_socket: The accepted client socket
+            client_ip: The client's IP address
+
+        Returns:
+            True if a worker handled the connection, False if none was available
+        """
+        finished = threading.Event()
+        with self.lock:
+            workers = [worker for worker in self.workers if worker is not None]
+            if self.stopped or not workers:
+                return False
+            worker = min(workers, key=lambda w: len(w.pending))
+            handshake_id = self.next_id
+            self.next_id += 1
+            worker.pending[handshake_id] = finished
+
+        request = json.dumps({'id': handshake_id, 'client_ip': client_ip}).encode()
+        try:
+            with worker.send_lock:
+                socket.send_fds(worker.channel, [request], [client_socket.fileno()])
+        except OSError as e:
+            logger.error(f"Failed to pass SSH connection from {client_ip} to a worker: {str(e)}")
+            with self.lock:
+                worker.pending.pop(handshake_id, None)
+            return False
+
+        if not finished.wait(HANDSHAKE_WAIT_TIMEOUT):
+            with self.lock:
+                worker.pending.pop(handshake_id, None)
+            logger.warning(f"SSH handshake worker did not finish the connection from {client_ip}")
+        return True
+
+    def stop(self):
+        """Terminate the worker processes."""
+        if self.stopped:
+            return
+        self.stopped = True
+        for worker in self.workers:
+            if worker is not None and worker.process.is_alive():
+                worker.process.terminate()
+        self.executor.shutdown(wait=True)
+        if self.log_listener:
+            self.log_listener.stop()
+        logger.info("SSH handshake workers stopped")
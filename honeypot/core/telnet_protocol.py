@@ -0,0 +1,225 @@
+"""Incremental Telnet protocol parser.
+
+The parser is fed raw chunks from the network and turns them into clean
+line events and a batch of negotiation replies. It does no I/O itself, so
+the threaded and asyncio Telnet handlers share it.
+"""
+import re
+import logging
+from typing import Iterable, List, Optional
+from honeypot.core.config import MAX_LINE_LENGTH
+from honeypot.core.line_reader import LineTooLongError
+
+logger = logging.getLogger(__name__)
+
+# Telnet protocol constants (RFC 854)
+IAC = 255  # Interpret As Command
+DONT = 254
+DO = 253
+WONT = 252
+WILL = 251
+SB = 250  # Subnegotiation Begin
+SE = 240  # Subnegotiation End
+ECHO = 1
+SUPPRESS_GO_AHEAD = 3
+LINEMODE = 34
+
+CR = 0x0D
+LF = 0x0A
+NUL = 0x00
+
+# Longest subnegotiation accepted before the client is dropped
+MAX_SUBNEGOTIATION_LENGTH = 512
+
+# Parser states
+_DATA = 0
+_CR = 1
+_IAC = 2
+_OPTION = 3
+_SB = 4
+_SB_IAC = 5
+
+# Bytes that end a run of plain data
+_SPECIAL = re.compile(b'[\xff\r\n]')
+
+class TelnetProtocolError(ValueError):
+    """Raised when a client violates the Telnet protocol limits."""
+
+def command(cmd: int, option: int) -> bytes:
+    """Encode an IAC option command such as IAC WILL ECHO."""
+    return bytes((IAC, cmd, option))
+
+class TelnetParser:
+    """Incremental Telnet parser producing lines and negotiation replies."""
+    
+    def __init__(
+        self,
+        offered: Iterable[int] = (),
+        requested: Iterable[int] = (),
+        max_line_length: int = MAX_LINE_LENGTH,
+        max_subnegotiation_length: int = MAX_SUBNEGOTIATION_LENGTH
+    ):
+        """Initialize the parser.
+        
+        Args:
+            offered: Options the server sent WILL for; a client DO is accepted silently
+            requested: Options the server sent DO for; a client WILL is accepted silently
+            max_line_length: Maximum line length in bytes
+            max_subnegotiation_length: Maximum subnegotiation payload in bytes
+        """
+        self.offered = set(offered)
+        self.requested = set(requested)
+        self.max_line_length = max_line_length
+        self.max_subnegotiation_length = max_subnegotiation_length
+        self._state = _DATA
+        self._command = 0
+        self._sb_length = 0
+        self._line = bytearray()
+        self._lines: List[bytes] = []
+        # Option commands already answered, so each is replied to only once
+        self._answered = set()
+    
+    def feed(self, data: bytes) -> bytes:
+        """Parse a chunk of data received from the client.
+        
+        Completed lines are queued for next_line().
+        
+        Args:
+            data: The raw bytes received
+        
+        Returns:
+            Negotiation replies to send, batched into one write (may be empty)
+        
+        Raises:
+            LineTooLongError: If a line exceeds max_line_length
+            TelnetProtocolError: If a subnegotiation exceeds its length limit
+        """
+        replies = bytearray()
+        i = 0
+        n = len(data)
+        while i < n:
+            state = self._state
+            
+            if state == _DATA:
+                # Copy plain data up to the next IAC or line ending in one step
+                match = _SPECIAL.search(data, i)
+                end = match.start() if match else n
+                if end > i:
+                    self._append(data[i:end])
+                if not match:
+                    break
+                i = end + 1
+                byte = data[end]
+                if byte == IAC:
+                    self._state = _IAC
+                elif byte == CR:
+                    self._state = _CR
+                else:
+                    self._end_line()
+                continue
+            
+            if state == _SB:
+                # Skip subnegotiation payload up to the next IAC
+                end = data.find(b'\xff', i)
+                skipped = (end if end >= 0 else n) - i
+                self._sb_length += skipped
+                if self._sb_length > self.max_subnegotiation_length:
+                    raise TelnetProtocolError(
+                        f"Subnegotiation exceeds {self.max_subnegotiation_length} bytes")
+                if end < 0:
+                    break
+                i = end + 1
+                self._state = _SB_IAC
+                continue
+            
+            byte = data[i]
+            i += 1
+            
+            if state == _CR:
+                if byte == LF or byte == NUL:
+                    # CR LF and CR NUL both end a line
+                    self._end_line()
+                    self._state = _DATA
+                elif byte == CR:
+                    self._append(b'\r')
+                elif byte == IAC:
+                    self._append(b'\r')
+                    self._state = _IAC
+                else:
+                    self._append(bytes((CR, byte)))
+                    self._state = _DATA
+            elif state == _IAC:
+                if byte == IAC:
+                    # Escaped 0xFF data byte
+                    self._append(b'\xff')
+                    self._state = _DATA
+                elif byte in (DO, DONT, WILL, WONT):
+                    self._command = byte
+                    self._state = _OPTION
+                elif byte == SB:
+                    self._sb_length = 0
+                    self._state = _SB
+                else:
+                    # NOP, GA, AYT and friends carry no payload
+                    self._state = _DATA
+            elif state == _OPTION:
+                reply = self._negotiate(self._command, byte)
+                if reply:
+                    replies += reply
+                self._state = _DATA
+            elif state == _SB_IAC:
+                if byte == SE:
+                    self._state = _DATA
+                else:
+                    # IAC IAC inside a subnegotiation is an escaped data byte
+                    self._sb_length += 1
+                    self._state = _SB
+        
+        return bytes(replies)
+    
+    def next_line(self) -> Optional[bytes]:
+        """Pop the next completed line, or None if no line is complete."""
+        if self._lines:
+            return self._lines.pop(0)
+        return None
+    
+    def pending(self) -> bytes:
+        """Return and clear the data of the current, unterminated line."""
+        line = bytes(self._line)
+        self._line.clear()
+        return line
+    
+    def _append(self, data: bytes):
+        """Add data to the current line, enforcing the line length limit."""
+        if len(self._line) + len(data) > self.max_line_length:
+            raise LineTooLongError(f"Line exceeds {self.max_line_length} bytes")
+        self._line += data
+    
+    def _end_line(self):
+        """Complete the current line and queue it."""
+        self._lines.append(bytes(self._line))
+        self._line.clear()
+    
+    def _negotiate(self, cmd: int, option: int) -> Optional[bytes]:
+        """Work out the reply to a client option command.
+        
+        Options the server offered or requested are acknowledged without a
+        reply. Everything else is refused once; repeats and DONT/WONT are
+        never answered, which prevents negotiation loops.
+        """
+        if cmd == DO:
+            if option in self.offered:
+                return None
+            reply = command(WONT, option)
+        elif cmd == WILL:
+            if option in self.requested:
+                return None
+            reply = command(DONT, option)
+        else:
+            return None
+        
+        key = (cmd, option)
+        if key in self._answered:
+            return None
+        self._answered.add(key)
+        return reply
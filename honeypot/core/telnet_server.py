@@ -1,120 +1,150 @@
 """Telnet Honeypot server implementation."""
 import socket
 import logging
-import threading
+import asyncio
 from honeypot.core.base_server import BaseHoneypot
+from honeypot.core.line_reader import LineReader, LineTooLongError
+from honeypot.core.telnet_protocol import (
+    TelnetParser, TelnetProtocolError, command,
+    DO, WILL, ECHO, SUPPRESS_GO_AHEAD
+)
 from honeypot.database.models import Protocol
-from honeypot.core.config import HOST, TELNET_PORT
+from honeypot.core.config import HOST, TELNET_PORT, CONNECTION_TIMEOUT
 from honeypot.core.server_registry import register_server
 
 logger = logging.getLogger(__name__)
 
-# Telnet protocol constants
-IAC = bytes([255])  # Interpret As Command
-DONT = bytes([254])
-DO = bytes([253])
-WONT = bytes([252])
-WILL = bytes([251])
-SB = bytes([250])  # Subnegotiation Begin
-SE = bytes([240])  # Subnegotiation End
-ECHO = bytes([1])
-SUPPRESS_GO_AHEAD = bytes([3])
-LINEMODE = bytes([34])
+# Options the server asks the client to enable and offers to enable itself
+REQUESTED_OPTIONS = (ECHO, SUPPRESS_GO_AHEAD)
+OFFERED_OPTIONS = (ECHO, SUPPRESS_GO_AHEAD)
+
+# Initial telnet negotiation, sent as a single write
+INITIAL_NEGOTIATION = (
+    b''.join(command(DO, option) for option in REQUESTED_OPTIONS) +
+    b''.join(command(WILL, option) for option in OFFERED_OPTIONS)
+)
 
 @register_server
 class TelnetHoneypot(BaseHoneypot):
     """Telnet Honeypot server implementation."""
     
+    supports_async = True
+    
     def __init__(self, host: str = HOST, port: int = TELNET_PORT):
         """Initialize the Telnet honeypot server."""
         super().__init__(host, port, Protocol.TELNET)
-
+    
+    def _new_parser(self) -> TelnetParser:
+        """Create a Telnet parser matching the initial negotiation."""
+        return TelnetParser(offered=OFFERED_OPTIONS, requested=REQUESTED_OPTIONS)
+    
     def _handle_client(self, client_socket: socket.socket, client_ip: str):
         """Handle an individual Telnet client connection."""
         try:
-            # Initial telnet negotiation
-            client_socket.send(IAC + DO + ECHO)
-            client_socket.send(IAC + DO + SUPPRESS_GO_AHEAD)
-            client_socket.send(IAC + WILL + ECHO)
-            client_socket.send(IAC + WILL + SUPPRESS_GO_AHEAD)
+            reader = self._line_reader(client_socket, client_ip)
+            parser = self._new_parser()
             
-            # Send login prompt
-            client_socket.send(b'login: ')
+            # Initial telnet negotiation and login prompt in one write
+            client_socket.sendall(INITIAL_NEGOTIATION + b'login: ')
             
             # Read username
-            username = self._read_line(client_socket).decode('ascii', errors='ignore').strip()
+            username = self._read_telnet_line(reader, parser).decode('ascii', errors='ignore').strip()
             
             # Send password prompt
-            client_socket.send(b'Password: ')
+            client_socket.sendall(b'Password: ')
             
             # Read password
-            password = self._read_line(client_socket).decode('ascii', errors='ignore').strip()
+            password = self._read_telnet_line(reader, parser).decode('ascii', errors='ignore').strip()
             
             # Log the attempt and broadcast
             self._log_attempt(username, password, client_ip)
             
             # Send login failure message
-            client_socket.send(b'Login incorrect\r\n')
-            
+            client_socket.sendall(b'Login incorrect\r\n')
+        
+        except (LineTooLongError, TelnetProtocolError) as e:
+            logger.warning(f"Dropping Telnet client {client_ip}: {str(e)}")
         except Exception as e:
             logger.error(f"Error handling client {client_ip}: {str(e)}")
         finally:
             client_socket.close()
-
-    def _read_line(self, sock: socket.socket) -> bytes:
-        """Read a line from the socket, handling telnet protocol negotiations.
+    
+    async def _handle_client_async(self, reader: asyncio.StreamReader,
+                                   writer: asyncio.StreamWriter, client_ip: str):
+        """Handle an individual Telnet client connection on the asyncio engine."""
+        parser = self._new_parser()
+        try:
+            # Initial telnet negotiation and login prompt in one write
+            writer.write(INITIAL_NEGOTIATION + b'login: ')
+            await writer.drain()
+            username = (await self._read_telnet_line_async(reader, writer, parser)).decode('ascii', errors='ignore').strip()
+            
+            # Send password prompt and read password
+            writer.write(b'Password: ')
+            await writer.drain()
+            password = (await self._read_telnet_line_async(reader, writer, parser)).decode('ascii', errors='ignore').strip()
+        except (LineTooLongError, TelnetProtocolError) as e:
+            logger.warning(f"Dropping Telnet client {client_ip}: {str(e)}")
+            return
+        
+        # Log the attempt and broadcast
+        await self._log_attempt_async(username, password, client_ip)
         
-        This overrides the base class implementation to handle telnet-specific
-        protocol negotiations.
+        # Send login failure message
+        writer.write(b'Login incorrect\r\n')
+        await writer.drain()
+    
+    def _read_telnet_line(self, reader: LineReader, parser: TelnetParser) -> bytes:
+        """Read the next line from the connection through the Telnet parser.
+        
+        Negotiation replies produced by a chunk are sent in a single write.
         
         Args:
-            sock: The socket to read from
-            
+            reader: The connection's buffered reader
+            parser: The connection's Telnet parser
+        
         Returns:
-            The line read from the socket as bytes
+            The next line as bytes, or any partial line on EOF or timeout
         """
-        buffer = bytearray()
         while True:
-            data = sock.recv(1)
+            line = parser.next_line()
+            if line is not None:
+                return line
+            try:
+                data = reader.read_chunk()
+            except socket.timeout:
+                logger.debug("Socket timeout while reading Telnet line")
+                data = b''
             if not data:
-                break
-                
-            # Handle telnet protocol negotiations
-            if data == IAC:
-                cmd = sock.recv(1)
-                if cmd == DO or cmd == DONT:
-                    opt = sock.recv(1)
-                    if cmd == DO:
-                        # Respond with WONT for most options
-                        sock.send(IAC + WONT + opt)
-                    continue
-                elif cmd == WILL or cmd == WONT:
-                    opt = sock.recv(1)
-                    if cmd == WILL:
-                        # Respond with DONT for most options
-                        sock.send(IAC + DONT + opt)
-                    continue
-                elif cmd == SB:
-                    # Skip subnegotiation
-                    while True:
-                        subopt = sock.recv(1)
-                        if subopt == IAC:
-                            if sock.recv(1) == SE:
-                                break
-                    continue
-            
-            # Handle line endings
-            if data == b'\r':
-                next_char = sock.recv(1)
-                if next_char == b'\n':
-                    return bytes(buffer)
-                else:
-                    buffer.extend(data)
-                    if next_char:
-                        buffer.extend(next_char)
-            elif data == b'\n':
-                return bytes(buffer)
-            else:
-                buffer.extend(data)
-                
-        return bytes(buffer) 
\ No newline at end of file
+                return parser.pending()
+            replies = parser.feed(data)
+            if replies:
+                reader.sock.sendall(replies)
+    
+    async def _read_telnet_line_async(self, reader: asyncio.StreamReader,
+                                      writer: asyncio.StreamWriter,
+                                      parser: TelnetParser) -> bytes:
+        """Read the next line from an asyncio stream through the Telnet parser.
+        
+        Args:
+            reader: The stream reader to read from
+            writer: The stream writer used for negotiation replies
+            parser: The connection's Telnet parser
+        
+        Returns:
+            The next line as bytes, or any partial line on EOF or timeout
+        """
+        while True:
+            line = parser.next_line()
+            if line is not None:
+                return line
+            try:
+                data = await asyncio.wait_for(reader.read(4096), timeout=CONNECTION_TIMEOUT)
+            except asyncio.TimeoutError:
+                data = b''
+            if not data:
+                return parser.pending()
+            self.thread_manager.touch()
+            replies = parser.feed(data)
+            if replies:
+                writer.write(replies)
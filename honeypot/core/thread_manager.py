@@ -1,28 +1,496 @@
 """Thread management for honeypot servers."""
+import socket
 import threading
 import logging
-import queue
 import time
-from concurrent.futures import ThreadPoolExecutor
-from typing import Callable, Dict, Any, Optional
+import itertools
+import functools
+import contextvars
+from collections import deque, OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Any, Optional, List, Tuple
+from honeypot.core.config import (
+    MAX_THREADS, MAX_CONNECTIONS_PER_IP, CONNECTION_TIMEOUT, MAX_QUEUED_CONNECTIONS,
+    CONNECTION_MAX_LIFETIME, ADMISSION_POLICY, WORKER_QUOTAS
+)
 
 logger = logging.getLogger(__name__)
 
+# Admission policies applied when the queue of waiting connections is full
+DROP_NEWEST = 'drop-newest'
+DROP_OLDEST = 'drop-oldest'
+PREFER_NEW_IPS = 'prefer-new-ips'
+ADMISSION_POLICIES = (DROP_NEWEST, DROP_OLDEST, PREFER_NEW_IPS)
+
+# Number of client IPs remembered by the prefer-new-ips policy
+SEEN_IPS_SIZE = 65536
+
+# Worker pool used for connections submitted without one
+DEFAULT_POOL = 'default'
+
+# The connection handled by the current worker thread or asyncio task
+_current_connection: contextvars.ContextVar = contextvars.ContextVar('current_connection', default=None)
+
+class ConnectionHandle:
+    """A single tracked client connection.
+    
+    Handles are created by ConnectionRegistry.register() and stay valid until
+    they are unregistered. Touching a handle is a single attribute write.
+    """
+    
+    __slots__ = ('id', 'client_ip', 'start_time', 'last_activity', 'future', 'closer', 'timer_tick')
+    
+    def __init__(self, connection_id: int, client_ip: str):
+        """Initialize the handle.
+        
+        Args:
+            connection_id: Unique ID of the connection
+            client_ip: The client IP address
+        """
+        now = time.time()
+        self.id = connection_id
+        self.client_ip = client_ip
+        self.start_time = now
+        self.last_activity = now
+        self.future: Optional[Future] = None
+        # Called from the scheduler thread to force the connection closed
+        self.closer: Optional[Callable[[], None]] = None
+        # Wheel tick the handle is scheduled for, None when not scheduled
+        self.timer_tick: Optional[int] = None
+    
+    def touch(self):
+        """Record activity on the connection to prevent it timing out."""
+        self.last_activity = time.time()
+    
+    def deadline(self, idle_timeout: float, max_lifetime: float) -> float:
+        """Get the time at which the connection expires.
+        
+        Args:
+            idle_timeout: Seconds of inactivity allowed
+            max_lifetime: Maximum connection lifetime in seconds, 0 for no limit
+        
+        Returns:
+            The earlier of the idle and absolute deadlines as a timestamp
+        """
+        deadline = self.last_activity + idle_timeout
+        if max_lifetime > 0:
+            deadline = min(deadline, self.start_time + max_lifetime)
+        return deadline
+
+def socket_closer(sock: socket.socket) -> Callable[[], None]:
+    """Build a closer that shuts a socket down from another thread.
+    
+    shutdown() wakes a handler blocked in recv() or send() on the socket,
+    which then returns and frees its worker. The handler still owns close().
+    
+    Args:
+        sock: The client socket
+    
+    Returns:
+        A function that shuts the socket down
+    """
+    def close():
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    return close
+
+class TimerWheel:
+    """Hashed timer wheel of connection deadlines.
+    
+    Deadlines are rounded up to whole ticks and hashed into a fixed ring of
+    slots, so scheduling and cancelling are O(1) and a tick only visits the
+    handles scheduled for its slot. Deadlines further away than one turn of
+    the wheel stay in their slot and are skipped until their turn comes.
+    
+    Activity does not reschedule a handle; the owner re-checks the real
+    deadline when the timer fires and schedules it again if it moved.
+    """
+    
+    def __init__(self, tick: float = 1.0, slots: int = 512):
+        """Initialize the wheel.
+        
+        Args:
+            tick: Resolution of the wheel in seconds
+            slots: Number of slots in the ring
+        """
+        self.tick = tick
+        self._slots: List[Dict[int, ConnectionHandle]] = [{} for _ in range(slots)]
+        self._lock = threading.Lock()
+        # Last tick that has been processed
+        self._current = int(time.time() / tick)
+    
+    def schedule(self, handle: ConnectionHandle, deadline: float):
+        """Schedule a handle to fire at a deadline, replacing any earlier schedule.
+        
+        Args:
+            handle: The connection handle
+            deadline: Expiry time as a timestamp
+        """
+        with self._lock:
+            self._remove(handle)
+            tick = max(-int(-deadline // self.tick), self._current + 1)
+            handle.timer_tick = tick
+            self._slots[tick % len(self._slots)][handle.id] = handle
+    
+    def cancel(self, handle: ConnectionHandle):
+        """Remove a handle from the wheel if it is scheduled."""
+        with self._lock:
+            self._remove(handle)
+    
+    def _remove(self, handle: ConnectionHandle):
+        """Remove a handle from its slot. Caller must hold the lock."""
+        if handle.timer_tick is not None:
+            self._slots[handle.timer_tick % len(self._slots)].pop(handle.id, None)
+            handle.timer_tick = None
+    
+    def advance(self, now: float) -> List[ConnectionHandle]:
+        """Process every tick up to now and collect the handles that fired.
+        
+        Args:
+            now: The current time as a timestamp
+        
+        Returns:
+            Handles whose scheduled tick has passed
+        """
+        target = int(now / self.tick)
+        fired = []
+        with self._lock:
+            # After a long stall one full turn visits every slot
+            self._current = max(self._current, target - len(self._slots))
+            while self._current < target:
+                self._current += 1
+                slot = self._slots[self._current % len(self._slots)]
+                if not slot:
+                    continue
+                for handle in list(slot.values()):
+                    if handle.timer_tick <= self._current:
+                        del slot[handle.id]
+                        handle.timer_tick = None
+                        fired.append(handle)
+        return fired
+    
+    def __len__(self) -> int:
+        """Get the number of scheduled handles."""
+        with self._lock:
+            return sum(len(slot) for slot in self._slots)
+
+class AdmissionQueue:
+    """Bounded queue of accepted connections waiting for a worker thread.
+    
+    Connections are tagged with a worker pool, normally their protocol. A
+    pool with a quota may only run that many workers while other pools have
+    connections waiting; when nothing else is waiting it borrows the idle
+    workers. A worker that finishes always picks the oldest connection of a
+    pool that is under its quota first, so a busy pool gives workers back as
+    soon as other pools need them.
+    
+    When the queue is full the configured policy decides which connection
+    is shed:
+    
+    - drop-newest: the arriving connection is rejected
+    - drop-oldest: the connection that has waited longest is dropped
+    - prefer-new-ips: the oldest waiting connection from an IP seen before
+      is dropped to make room for an IP that has not been seen, otherwise
+      the arriving connection is rejected
+    
+    Operations are O(number of pools) apart from discard(), which is only
+    used for connections that expire while still queued.
+    """
+    
+    def __init__(self, maxsize: int, policy: str = DROP_NEWEST, seen_ips_size: int = SEEN_IPS_SIZE):
+        """Initialize the queue.
+        
+        Args:
+            maxsize: Maximum number of waiting connections
+            policy: One of ADMISSION_POLICIES
+            seen_ips_size: Number of client IPs remembered by prefer-new-ips
+        """
+        if policy not in ADMISSION_POLICIES:
+            logger.warning(f"Unknown admission policy '{policy}', using {DROP_NEWEST}")
+            policy = DROP_NEWEST
+        self.maxsize = maxsize
+        self.policy = policy
+        self.seen_ips_size = seen_ips_size
+        self.quotas: Dict[str, int] = {}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        # Per pool, entries are (sequence, handle, job, pool); first-time IPs
+        # are kept apart so prefer-new-ips can shed returning IPs first
+        self._first_time: Dict[str, deque] = {}
+        self._returning: Dict[str, deque] = {}
+        self._running: Dict[str, int] = {}
+        self._size = 0
+        self._seen_ips: OrderedDict = OrderedDict()
+        self._closed = False
+        self.shed_counts = {DROP_NEWEST: 0, DROP_OLDEST: 0}
+    
+    def __len__(self) -> int:
+        """Get the number of waiting connections."""
+        return self._size
+    
+    def set_quota(self, pool: str, quota: Optional[int]):
+        """Set the number of workers a pool may use while others are waiting.
+        
+        Args:
+            pool: The pool name
+            quota: Number of workers, or None to remove the quota
+        """
+        with self._cond:
+            if quota is None:
+                self.quotas.pop(pool, None)
+            else:
+                self.quotas[pool] = max(1, quota)
+    
+    def _is_first_time(self, client_ip: str) -> bool:
+        """Record a client IP and report whether it had not been seen before."""
+        if client_ip in self._seen_ips:
+            self._seen_ips.move_to_end(client_ip)
+            return False
+        self._seen_ips[client_ip] = True
+        if len(self._seen_ips) > self.seen_ips_size:
+            self._seen_ips.popitem(last=False)
+        return True
+    
+    def put(self, handle: ConnectionHandle, job: Callable[[], Any], pool: str = DEFAULT_POOL) -> Optional[ConnectionHandle]:
+        """Queue a connection, shedding one if the queue is full.
+        
+        Args:
+            handle: The connection handle
+            job: The function a worker runs for the connection
+            pool: The worker pool the connection belongs to
+        
+        Returns:
+            The handle that was shed, which may be the one passed in, or None
+        
+        Raises:
+            RuntimeError: If the queue has been closed
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Admission queue is closed")
+            
+            first_time = self.policy == PREFER_NEW_IPS and self._is_first_time(handle.client_ip)
+            shed = None
+            if self._size >= self.maxsize:
+                if self.policy == DROP_OLDEST:
+                    shed = self._pop_oldest((self._first_time, self._returning))[1]
+                elif first_time and any(self._returning.values()):
+                    shed = self._pop_oldest((self._returning,))[1]
+                else:
+                    self.shed_counts[DROP_NEWEST] += 1
+                    return handle
+                self.shed_counts[DROP_OLDEST] += 1
+            
+            entries = self._first_time if first_time else self._returning
+            if pool not in entries:
+                entries[pool] = deque()
+            entries[pool].append((next(self._seq), handle, job, pool))
+            self._size += 1
+            self._cond.notify()
+            return shed
+    
+    def _pop_oldest(self, groups: Tuple[Dict[str, deque], ...],
+                    eligible: Optional[Callable[[str], bool]] = None) -> Optional[Tuple]:
+        """Remove the entry that has waited longest. Caller must hold the lock.
+        
+        Args:
+            groups: Per-pool deques to take from
+            eligible: Optional filter on the pool name
+        
+        Returns:
+            The removed entry, or None if no eligible entry is waiting
+        """
+        oldest = None
+        for group in groups:
+            for pool, entries in group.items():
+                if entries and (eligible is None or eligible(pool)):
+                    if oldest is None or entries[0][0] < oldest[0][0]:
+                        oldest = entries
+        if oldest is None:
+            return None
+        self._size -= 1
+        return oldest.popleft()
+    
+    def _under_quota(self, pool: str) -> bool:
+        """Whether a pool runs fewer workers than its quota."""
+        quota = self.quotas.get(pool)
+        return quota is None or self._running.get(pool, 0) < quota
+    
+    def get(self) -> Optional[Tuple[ConnectionHandle, Callable[[], Any], str]]:
+        """Wait for the next connection.
+        
+        The caller must call task_done() with the pool once the job is done.
+        
+        Returns:
+            The (handle, job, pool) tuple, or None once the queue is closed and empty
+        """
+        with self._cond:
+            while not self._size:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            groups = (self._first_time, self._returning)
+            # Borrow beyond the quota only when no pool under quota is waiting
+            entry = self._pop_oldest(groups, self._under_quota) or self._pop_oldest(groups)
+            _, handle, job, pool = entry
+            self._running[pool] = self._running.get(pool, 0) + 1
+            return handle, job, pool
+    
+    def task_done(self, pool: str):
+        """Record that a worker finished a job taken from a pool."""
+        with self._cond:
+            self._running[pool] -= 1
+    
+    def discard(self, handle: ConnectionHandle) -> bool:
+        """Remove a waiting connection from the queue.
+        
+        Returns:
+            True if the connection was waiting and has been removed
+        """
+        with self._cond:
+            for group in (self._first_time, self._returning):
+                for entries in group.values():
+                    for entry in entries:
+                        if entry[1] is handle:
+                            entries.remove(entry)
+                            self._size -= 1
+                            return True
+            return False
+    
+    def pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get running and waiting connection counts per pool.
+        
+        Returns:
+            Dictionary mapping pool names to their running, queued and quota values
+        """
+        with self._cond:
+            pools = set(self._running) | set(self.quotas)
+            pools.update(pool for group in (self._first_time, self._returning)
+                         for pool, entries in group.items() if entries)
+            return {
+                pool: {
+                    'running': self._running.get(pool, 0),
+                    'queued': len(self._first_time.get(pool, ())) + len(self._returning.get(pool, ())),
+                    'quota': self.quotas.get(pool),
+                }
+                for pool in sorted(pools)
+            }
+    
+    def close(self):
+        """Stop accepting connections and wake every waiting worker."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+class ConnectionRegistry:
+    """Registry of live connections indexed by ID and by client IP.
+    
+    Registering, unregistering and per-IP limit checks are O(1).
+    """
+    
+    def __init__(self, max_connections_per_ip: int):
+        """Initialize the registry.
+        
+        Args:
+            max_connections_per_ip: Maximum live connections allowed from a single IP
+        """
+        self.max_connections_per_ip = max_connections_per_ip
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._handles: Dict[int, ConnectionHandle] = {}
+        self._by_ip: Dict[str, Dict[int, ConnectionHandle]] = {}
+    
+    def register(self, client_ip: str) -> Optional[ConnectionHandle]:
+        """Register a new connection if the IP is below its limit.
+        
+        Args:
+            client_ip: The client IP address
+        
+        Returns:
+            The new connection handle, or None if the IP is at its limit
+        """
+        with self._lock:
+            ip_handles = self._by_ip.get(client_ip)
+            if ip_handles is not None and len(ip_handles) >= self.max_connections_per_ip:
+                return None
+            handle = ConnectionHandle(next(self._ids), client_ip)
+            self._handles[handle.id] = handle
+            if ip_handles is None:
+                ip_handles = self._by_ip[client_ip] = {}
+            ip_handles[handle.id] = handle
+            return handle
+    
+    def unregister(self, handle: ConnectionHandle) -> bool:
+        """Remove a connection. Safe to call more than once.
+        
+        Args:
+            handle: The connection handle to remove
+        
+        Returns:
+            True if the handle was registered, False if it was already removed
+        """
+        with self._lock:
+            if self._handles.pop(handle.id, None) is None:
+                return False
+            ip_handles = self._by_ip.get(handle.client_ip)
+            if ip_handles is not None:
+                ip_handles.pop(handle.id, None)
+                if not ip_handles:
+                    del self._by_ip[handle.client_ip]
+            return True
+    
+    def touch_ip(self, client_ip: str):
+        """Touch every connection from an IP (bounded by the per-IP limit).
+        
+        Args:
+            client_ip: The client IP address
+        """
+        with self._lock:
+            handles = list(self._by_ip.get(client_ip, {}).values())
+        for handle in handles:
+            handle.touch()
+    
+    def count(self, client_ip: Optional[str] = None) -> int:
+        """Get the number of live connections, optionally for one IP."""
+        if client_ip is None:
+            return len(self._handles)
+        return len(self._by_ip.get(client_ip, ()))
+    
+    def unique_ips(self) -> int:
+        """Get the number of distinct IPs with live connections."""
+        return len(self._by_ip)
+    
+    def connections_by_ip(self) -> Dict[str, int]:
+        """Get a snapshot of live connection counts per IP."""
+        with self._lock:
+            return {ip: len(handles) for ip, handles in self._by_ip.items()}
+    
+    def snapshot(self) -> List[ConnectionHandle]:
+        """Get a snapshot list of all live connection handles."""
+        with self._lock:
+            return list(self._handles.values())
+
 class ThreadManager:
     """Manages threads and connections for honeypot servers.
     
     This class provides:
-    - Thread pool management with max worker limits
+    - Worker threads fed from a bounded admission queue with load shedding
     - Connection tracking and limiting
-    - Client timeouts for inactive connections
+    - Idle and maximum lifetime deadlines that close stuck sockets
     """
     
     def __init__(
-        self, 
+        self,
         max_workers: int = 50,
         max_connections_per_ip: int = 5,
         connection_timeout: int = 60,
-        max_queued_connections: int = 100
+        max_queued_connections: int = 100,
+        connection_max_lifetime: int = 0,
+        tick_interval: float = 1.0,
+        admission_policy: str = DROP_NEWEST,
+        worker_quotas: Optional[Dict[str, int]] = None
     ):
         """Initialize the thread manager.
         
@@ -30,23 +498,33 @@ class ThreadManager:
             max_workers: Maximum number of worker threads
             max_connections_per_ip: Maximum connections allowed from a single IP
             connection_timeout: Timeout in seconds for inactive connections
-            max_queued_connections: Maximum number of queued connections
+            max_queued_connections: Maximum number of connections waiting for a worker
+            connection_max_lifetime: Maximum lifetime of a connection in seconds, 0 for no limit
+            tick_interval: Resolution of the deadline scheduler in seconds
+            admission_policy: Which connection to shed when the queue is full
+            worker_quotas: Workers each pool may use while other pools are waiting
         """
-        self.thread_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="honeypot")
+        self.max_workers = max_workers
         self.max_connections_per_ip = max_connections_per_ip
         self.connection_timeout = connection_timeout
         self.max_queued_connections = max_queued_connections
+        self.connection_max_lifetime = connection_max_lifetime
         
-        # Track active connections by IP
-        self.connections: Dict[str, int] = {}
-        self.connections_lock = threading.Lock()
+        # Track live connections, indexed by handle ID and by client IP
+        self.registry = ConnectionRegistry(max_connections_per_ip)
         
-        # Track active client handlers to support timeouts
-        self.active_handlers: Dict[str, Dict[str, Any]] = {}
-        self.active_handlers_lock = threading.Lock()
+        # Connections waiting for a worker; workers are started on demand
+        self.admission = AdmissionQueue(max_queued_connections, admission_policy)
+        for pool, quota in (worker_quotas or {}).items():
+            self.admission.set_quota(pool, quota)
+        self._workers: List[threading.Thread] = []
+        self._workers_lock = threading.Lock()
+        self._idle_workers = threading.Semaphore(0)
+        self._busy_workers = 0
         
-        # Connection queue for when thread pool is full
-        self.connection_queue = queue.Queue(maxsize=max_queued_connections)
+        # Connection deadlines, driven by the timeout monitor thread
+        self.timers = TimerWheel(tick=tick_interval)
+        self.expired_connections = 0
         
         # Start the connection timeout monitor
         self.stop_event = threading.Event()
@@ -59,132 +537,293 @@ class ThreadManager:
         
         logger.info(f"Thread manager initialized with max_workers={max_workers}, "
                    f"max_connections_per_ip={max_connections_per_ip}, "
-                   f"connection_timeout={connection_timeout}s")
+                   f"connection_timeout={connection_timeout}s, "
+                   f"connection_max_lifetime={connection_max_lifetime or 'unlimited'}s, "
+                   f"max_queued_connections={max_queued_connections} ({self.admission.policy})")
     
-    def submit_connection(self, client_handler: Callable, client_ip: str, *args, **kwargs) -> bool:
+    def submit_connection(self, client_handler: Callable, client_ip: str, *args,
+                          client_socket: Optional[socket.socket] = None,
+                          pool: str = DEFAULT_POOL, **kwargs) -> bool:
         """Submit a connection for handling.
         
         Args:
             client_handler: The function to handle the client connection
             client_ip: The client IP address
             *args: Additional arguments to pass to the client handler
+            client_socket: The client socket, shut down when the connection's deadline expires
+            pool: The worker pool to run the connection in, normally the protocol name
             **kwargs: Additional keyword arguments to pass to the client handler
-            
+        
+        Rejections are decided here, on the accepting thread, without
+        touching the database.
+        
         Returns:
             True if the connection was accepted, False if rejected
         """
         # Check if this IP has too many connections
-        with self.connections_lock:
-            current_connections = self.connections.get(client_ip, 0)
-            if current_connections >= self.max_connections_per_ip:
-                logger.warning(f"Rejecting connection from {client_ip}: Too many connections "
-                              f"({current_connections}/{self.max_connections_per_ip})")
-                return False
-            
-            # Increment connection count for this IP
-            self.connections[client_ip] = current_connections + 1
+        closer = socket_closer(client_socket) if client_socket is not None else None
+        handle = self.acquire_connection(client_ip, closer)
+        if handle is None:
+            return False
         
         try:
-            # Submit the task to the thread pool with a wrapper that tracks activity
-            future = self.thread_pool.submit(
-                self._connection_wrapper, client_handler, client_ip, *args, **kwargs
+            # Queue the task with a wrapper that tracks activity
+            handle.future = Future()
+            shed = self.admission.put(
+                handle, functools.partial(self._connection_wrapper, handle, client_handler, *args, **kwargs),
+                pool
             )
-            
-            # Register the connection for timeout monitoring
-            handler_id = f"{client_ip}:{id(future)}"
-            with self.active_handlers_lock:
-                self.active_handlers[handler_id] = {
-                    "client_ip": client_ip,
-                    "start_time": time.time(),
-                    "last_activity": time.time(),
-                    "future": future
-                }
-            
+            if shed is handle:
+                logger.debug(f"Shedding connection from {client_ip}: admission queue full")
+                self.release_connection(handle)
+                return False
+            if shed is not None:
+                logger.debug(f"Shedding queued connection from {shed.client_ip} for {client_ip}")
+                self._shed_connection(shed)
+            self._adjust_workers()
             return True
-            
+        
         except Exception as e:
-            # Decrement the connection count on failure
-            with self.connections_lock:
-                self.connections[client_ip] = max(0, self.connections.get(client_ip, 1) - 1)
+            # Release the connection slot on failure
+            self.release_connection(handle)
             logger.error(f"Failed to submit connection from {client_ip}: {str(e)}")
             return False
     
-    def _connection_wrapper(self, client_handler: Callable, client_ip: str, *args, **kwargs):
+    def _adjust_workers(self):
+        """Start another worker thread unless one is idle or the limit is reached."""
+        if self._idle_workers.acquire(timeout=0):
+            return
+        with self._workers_lock:
+            if len(self._workers) < self.max_workers:
+                worker = threading.Thread(
+                    target=self._worker,
+                    name=f"honeypot_{len(self._workers)}",
+                    daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+    
+    def _worker(self):
+        """Run queued connections until the admission queue is closed."""
+        while True:
+            item = self.admission.get()
+            if item is None:
+                return
+            handle, job, pool = item
+            if handle.future.set_running_or_notify_cancel():
+                with self._workers_lock:
+                    self._busy_workers += 1
+                try:
+                    handle.future.set_result(job())
+                except BaseException as e:
+                    handle.future.set_exception(e)
+                finally:
+                    with self._workers_lock:
+                        self._busy_workers -= 1
+            self.admission.task_done(pool)
+            del item, handle, job
+            self._idle_workers.release()
+    
+    def set_worker_quota(self, pool: str, quota: Optional[int]):
+        """Set the number of workers a pool may use while other pools are waiting.
+        
+        A pool may still borrow idle workers beyond its quota when no other
+        pool has connections waiting.
+        
+        Args:
+            pool: The pool name, normally the protocol name
+            quota: Number of workers, or None to remove the quota
+        """
+        self.admission.set_quota(pool, min(quota, self.max_workers) if quota is not None else None)
+        if quota is not None:
+            logger.info(f"Worker quota for {pool}: {quota}")
+    
+    def get_pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get per-pool worker usage.
+        
+        Returns:
+            Dictionary mapping pool names to running, queued, quota and utilisation values
+        """
+        stats = self.admission.pool_stats()
+        for pool_stats in stats.values():
+            capacity = pool_stats['quota'] or self.max_workers
+            pool_stats['utilization'] = round(pool_stats['running'] / capacity * 100, 1)
+        return stats
+    
+    def _shed_connection(self, handle: ConnectionHandle):
+        """Drop a queued connection before a worker has started on it.
+        
+        Args:
+            handle: The connection handle
+        """
+        handle.future.cancel()
+        if handle.closer is not None:
+            handle.closer()
+        self.release_connection(handle)
+    
+    def acquire_connection(self, client_ip: str,
+                           closer: Optional[Callable[[], None]] = None) -> Optional[ConnectionHandle]:
+        """Register a connection for a client IP, enforcing the per-IP limit.
+        
+        Used directly by the asyncio engine, which does not run handlers in
+        the thread pool but shares the same per-IP limits and deadlines.
+        
+        Args:
+            client_ip: The client IP address
+            closer: Function that forces the connection closed when its deadline expires
+        
+        Returns:
+            The connection handle, or None if the IP is at its limit
+        """
+        handle = self.registry.register(client_ip)
+        if handle is None:
+            logger.warning(f"Rejecting connection from {client_ip}: Too many connections "
+                          f"({self.registry.count(client_ip)}/{self.max_connections_per_ip})")
+            return None
+        handle.closer = closer
+        self.timers.schedule(handle, handle.deadline(self.connection_timeout, self.connection_max_lifetime))
+        return handle
+    
+    def release_connection(self, handle: ConnectionHandle):
+        """Release a connection registered with acquire_connection.
+        
+        Args:
+            handle: The connection handle
+        """
+        self.timers.cancel(handle)
+        self.registry.unregister(handle)
+    
+    def bind_connection(self, handle: ConnectionHandle) -> contextvars.Token:
+        """Make a handle the current connection of this thread or asyncio task.
+        
+        Args:
+            handle: The connection handle
+        
+        Returns:
+            A token to pass to unbind_connection
+        """
+        return _current_connection.set(handle)
+    
+    def unbind_connection(self, token: contextvars.Token):
+        """Restore the current connection saved by bind_connection."""
+        _current_connection.reset(token)
+    
+    def current_connection(self) -> Optional[ConnectionHandle]:
+        """Get the connection handled by the current thread or asyncio task."""
+        return _current_connection.get()
+    
+    def _connection_wrapper(self, handle: ConnectionHandle, client_handler: Callable, *args, **kwargs):
         """Wrapper for client handlers to track connections and handle cleanup.
         
         Args:
+            handle: The connection handle
             client_handler: The function to handle the client connection
-            client_ip: The client IP address
             *args: Additional arguments to pass to the client handler
             **kwargs: Additional keyword arguments to pass to the client handler
         """
-        handler_id = f"{client_ip}:{id(threading.current_thread())}"
-        
+        token = self.bind_connection(handle)
         try:
             # Call the actual client handler
             result = client_handler(*args, **kwargs)
             return result
         except Exception as e:
-            logger.error(f"Error in client handler for {client_ip}: {str(e)}")
+            logger.error(f"Error in client handler for {handle.client_ip}: {str(e)}")
             raise
         finally:
-            # Cleanup: Remove from active handlers and decrement connection count
-            with self.active_handlers_lock:
-                if handler_id in self.active_handlers:
-                    del self.active_handlers[handler_id]
-            
-            with self.connections_lock:
-                self.connections[client_ip] = max(0, self.connections.get(client_ip, 1) - 1)
-                if self.connections[client_ip] == 0:
-                    del self.connections[client_ip]
+            # Cleanup: Remove the connection from the registry
+            self.unbind_connection(token)
+            self.release_connection(handle)
+    
+    def touch(self):
+        """Record activity on the current thread's or task's connection."""
+        handle = _current_connection.get()
+        if handle is not None:
+            handle.touch()
     
     def update_activity(self, client_ip: str):
         """Update the last activity timestamp for a client.
         
         Call this method whenever there is activity from a client to
-        prevent timeout.
+        prevent timeout. Inside a connection handler this touches only the
+        current connection; elsewhere it touches the IP's connections.
         
         Args:
             client_ip: The client IP address
         """
-        with self.active_handlers_lock:
-            # Find handlers for this IP and update their activity timestamp
-            for handler_id, handler_info in list(self.active_handlers.items()):
-                if handler_info["client_ip"] == client_ip:
-                    handler_info["last_activity"] = time.time()
+        handle = _current_connection.get()
+        if handle is not None and handle.client_ip == client_ip:
+            handle.touch()
+        else:
+            self.registry.touch_ip(client_ip)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get live connection statistics.
+        
+        Returns:
+            Dictionary with connection, worker and admission queue counters
+        """
+        shed_counts = self.admission.shed_counts
+        return {
+            'active_connections': self.registry.count(),
+            'unique_ips': self.registry.unique_ips(),
+            'max_workers': self.max_workers,
+            'workers': len(self._workers),
+            'busy_workers': self._busy_workers,
+            'max_connections_per_ip': self.max_connections_per_ip,
+            'expired_connections': self.expired_connections,
+            'queue_depth': len(self.admission),
+            'queue_capacity': self.admission.maxsize,
+            'admission_policy': self.admission.policy,
+            'shed_newest': shed_counts[DROP_NEWEST],
+            'shed_oldest': shed_counts[DROP_OLDEST],
+            'shed_total': shed_counts[DROP_NEWEST] + shed_counts[DROP_OLDEST],
+            'pools': self.get_pool_stats(),
+        }
     
     def _monitor_connection_timeouts(self):
-        """Monitor for inactive connections and terminate them."""
-        while not self.stop_event.is_set():
+        """Fire connection deadlines as the timer wheel advances.
+        
+        Each tick only looks at the handles scheduled for it. A handle that
+        saw activity since it was scheduled is moved to its new deadline;
+        the rest are expired.
+        """
+        while not self.stop_event.wait(self.timers.tick):
             try:
-                current_time = time.time()
-                with self.active_handlers_lock:
-                    for handler_id, handler_info in list(self.active_handlers.items()):
-                        # Check if the connection has timed out
-                        idle_time = current_time - handler_info["last_activity"]
-                        if idle_time > self.connection_timeout:
-                            logger.info(f"Terminating inactive connection from {handler_info['client_ip']} "
-                                       f"(idle for {idle_time:.1f}s)")
-                            
-                            # Cancel the future if possible
-                            future = handler_info.get("future")
-                            if future and not future.done():
-                                future.cancel()
-                            
-                            # Remove from active handlers
-                            del self.active_handlers[handler_id]
-                            
-                            # Update connection count
-                            with self.connections_lock:
-                                client_ip = handler_info["client_ip"]
-                                self.connections[client_ip] = max(0, self.connections.get(client_ip, 1) - 1)
-                                if self.connections[client_ip] == 0:
-                                    del self.connections[client_ip]
+                now = time.time()
+                for handle in self.timers.advance(now):
+                    deadline = handle.deadline(self.connection_timeout, self.connection_max_lifetime)
+                    if deadline > now:
+                        self.timers.schedule(handle, deadline)
+                    else:
+                        self._expire_connection(handle, now)
             except Exception as e:
                 logger.error(f"Error monitoring connection timeouts: {str(e)}")
-                
-            # Sleep briefly to avoid excessive CPU usage
-            time.sleep(1)
+    
+    def _expire_connection(self, handle: ConnectionHandle, now: float):
+        """Force an expired connection closed.
+        
+        Args:
+            handle: The expired connection handle
+            now: The current time as a timestamp
+        """
+        idle_time = now - handle.last_activity
+        if idle_time >= self.connection_timeout:
+            logger.info(f"Terminating inactive connection from {handle.client_ip} "
+                       f"(idle for {idle_time:.1f}s)")
+        else:
+            logger.info(f"Terminating connection from {handle.client_ip} "
+                       f"(open for {now - handle.start_time:.1f}s)")
+        self.expired_connections += 1
+        
+        # A handler that has not started yet will never release its slot
+        cancelled = handle.future is not None and handle.future.cancel()
+        if cancelled:
+            self.admission.discard(handle)
+        if handle.closer is not None:
+            # Unblocks the handler, which then releases the connection itself
+            handle.closer()
+        if cancelled or handle.closer is None:
+            self.release_connection(handle)
     
     def shutdown(self):
         """Shutdown the thread manager and cleanup resources."""
@@ -192,5 +831,21 @@ class ThreadManager:
         self.stop_event.set()
         if self.timeout_thread.is_alive():
             self.timeout_thread.join(timeout=5)
-        self.thread_pool.shutdown(wait=True)
-        logger.info("Thread manager shutdown complete") 
\ No newline at end of file
+        # Workers finish the connections already queued, then exit
+        self.admission.close()
+        with self._workers_lock:
+            workers = list(self._workers)
+        for worker in workers:
+            worker.join()
+        logger.info("Thread manager shutdown complete")
+
+# Create a singleton instance shared by every honeypot server
+thread_manager = ThreadManager(
+    max_workers=MAX_THREADS,
+    max_connections_per_ip=MAX_CONNECTIONS_PER_IP,
+    connection_timeout=CONNECTION_TIMEOUT,
+    max_queued_connections=MAX_QUEUED_CONNECTIONS,
+    connection_max_lifetime=CONNECTION_MAX_LIFETIME,
+    admission_policy=ADMISSION_POLICY,
+    worker_quotas=WORKER_QUOTAS
+)
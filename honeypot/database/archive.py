@@ -0,0 +1,350 @@
+"""Archival of old login attempts into compressed monthly files.
+
+Run an archival pass by hand with:
+
+    python -m honeypot.database.archive --run
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from zoneinfo import ZoneInfo
+from sqlalchemy import func
+from sqlalchemy.orm import Session, sessionmaker
+from honeypot.core.config import ARCHIVE_AFTER_DAYS, ARCHIVE_DIR, ARCHIVE_INTERVAL, ARCHIVE_RETENTION_DAYS
+from honeypot.database.models import ArchivedChunk, LoginAttempt, Protocol, engine
+
+logger = logging.getLogger(__name__)
+
+# Attempts moved per chunk file and transaction
+ARCHIVE_CHUNK_SIZE = 5000
+
+# Ids per DELETE statement, under SQLite's bound parameter limit
+DELETE_CHUNK_SIZE = 500
+
+# Seconds a file missing from archived_chunks is left alone, in case another
+# archiver process is about to record it
+ORPHAN_AGE = 3600
+
+MONTH_FORMAT = '%Y-%m'
+CHUNK_SUFFIX = '.jsonl.gz'
+
+def _write_chunk(path: Path, records: Iterable[Dict]):
+    """Write records to a compressed file, replacing it atomically once synced."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + '.tmp')
+    with open(partial, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as compressed:
+            for record in records:
+                compressed.write(json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(partial, path)
+
+def _read_chunk(path: Path) -> Iterator[Dict]:
+    with gzip.open(path, 'rt', encoding='utf-8') as lines:
+        for line in lines:
+            yield json.loads(line)
+
+def attempt_from_record(record: Dict) -> LoginAttempt:
+    """Turn an archived attempt back into an unsaved LoginAttempt, such as for counting it into the rollups."""
+    return LoginAttempt(
+        protocol=Protocol(record['protocol']),
+        username=record['username'],
+        password=record['password'],
+        client_ip=record['client_ip'],
+        country=record['country'],
+        timestamp=datetime.fromisoformat(record['timestamp']),
+        last_seen=datetime.fromisoformat(record['last_seen']) if record.get('last_seen') else None,
+        hits=record.get('hits', 1)
+    )
+
+class AttemptArchiver:
+    """Moves old login attempts to monthly archive files and expires old months."""
+
+    def __init__(
+        self,
+        session_factory,
+        directory: str,
+        archive_after_days: int,
+        retention_days: int,
+        chunk_size: int = ARCHIVE_CHUNK_SIZE
+    ):
+        """Initialize the archiver.
+
+        Args:
+            session_factory: Callable returning a session on the writer engine, not expiring on commit
+            directory: Directory holding the archive files
+            archive_after_days: Days attempts stay in the database, 0 to never archive them
+            retention_days: Days archived months are kept, 0 to keep them forever
+            chunk_size: Attempts per chunk file and transaction
+        """
+        self.session_factory = session_factory
+        self.directory = Path(directory)
+        self.archive_after_days = archive_after_days
+        self.retention_days = retention_days
+        self.chunk_size = chunk_size
+        self.lock = threading.Lock()
+        self.rows_archived = 0
+        self.chunks_written = 0
+        self.months_compacted = 0
+        self.months_expired = 0
+        self.last_run: Optional[datetime] = None
+        self.listeners: List[Callable[[], None]] = []
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.archive_after_days > 0 or self.retention_days > 0
+
+    def add_listener(self, listener: Callable[[], None]):
+        """Register a function called after a run has moved attempts out of the database.
+
+        Args:
+            listener: Function called without arguments on the archiving thread
+        """
+        self.listeners.append(listener)
+
+    def start(self, interval: float = ARCHIVE_INTERVAL):
+        """Run the archiver every interval seconds on a background thread.
+
+        Args:
+            interval: Seconds between runs
+        """
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run_periodically, args=(interval,),
+                                        name="DB-Archiver", daemon=True)
+        self._thread.start()
+        logger.info(f"Archiver started: attempts archived after {self.archive_after_days or 'never'} days, "
+                    f"archives kept {self.retention_days or 'forever'} days, in {self.directory}")
+
+    def stop(self):
+        """Stop the background thread after its current run."""
+        self._stopping.set()
+
+    def _run_periodically(self, interval: float):
+        while not self._stopping.is_set():
+            try:
+                self.run()
+            except Exception as e:
+                logger.error(f"Error archiving login attempts: {str(e)}")
+            self._stopping.wait(interval)
+
+    def run(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Archive old attempts, compact complete months and delete expired ones.
+
+        Args:
+            now: The current UTC time, for tests
+
+        Returns:
+            Dictionary with the attempts archived and months compacted and expired
+        """
+        now = now or datetime.now(ZoneInfo("UTC"))
+        result = {'archived': 0, 'compacted': 0, 'expired': 0}
+        with self.lock:
+            session = self.session_factory()
+            try:
+                self._remove_orphans(session)
+                if self.archive_after_days > 0:
+                    cutoff = now - timedelta(days=self.archive_after_days)
+                    result['archived'] = self._archive(session, cutoff)
+                    # Attempts of the cutoff's month may still be archived later
+                    result['compacted'] = self._compact(session, cutoff.strftime(MONTH_FORMAT))
+                if self.retention_days > 0:
+                    result['expired'] = self._expire(session, (now - timedelta(days=self.retention_days))
+                                                     .strftime(MONTH_FORMAT))
+            finally:
+                session.close()
+            self.rows_archived += result['archived']
+            self.months_compacted += result['compacted']
+            self.months_expired += result['expired']
+            self.last_run = now
+        if result['archived']:
+            for listener in self.listeners:
+                try:
+                    listener()
+                except Exception as e:
+                    logger.error(f"Error in archiver listener: {str(e)}")
+        if any(result.values()):
+            logger.info(f"Archived {result['archived']} login attempts, compacted {result['compacted']} months, "
+                        f"deleted {result['expired']} expired months")
+        return result
+
+    def _remove_orphans(self, session: Session):
+        """Delete files from interrupted runs, which archived_chunks does not list."""
+        known = {path for path, in session.query(ArchivedChunk.path)}
+        session.commit()
+        if not self.directory.is_dir():
+            return
+        stale = time.time() - ORPHAN_AGE
+        for path in self.directory.glob('*/*'):
+            if not (path.name.endswith(CHUNK_SUFFIX) or path.name.endswith('.tmp')):
+                continue
+            if path.relative_to(self.directory).as_posix() in known or path.stat().st_mtime > stale:
+                continue
+            logger.warning(f"Removing archive file {path} left by an interrupted run")
+            path.unlink(missing_ok=True)
+
+    def _archive(self, session: Session, cutoff: datetime) -> int:
+        """Move attempts older than cutoff into chunk files, one transaction per chunk."""
+        archived = 0
+        while not self._stopping.is_set():
+            rows = (session.query(LoginAttempt)
+                    .filter(LoginAttempt.timestamp < cutoff)
+                    .order_by(LoginAttempt.id)
+                    .limit(self.chunk_size)
+                    .all())
+            # Release the writer connection while the files are written
+            session.commit()
+            if not rows:
+                break
+
+            months: Dict[str, List[Dict]] = {}
+            for row in rows:
+                months.setdefault(row.timestamp.strftime(MONTH_FORMAT), []).append(row.to_dict())
+            chunks = []
+            for month, records in months.items():
+                path = f"{month}/attempts-{records[0]['id']}-{records[-1]['id']}{CHUNK_SUFFIX}"
+                _write_chunk(self.directory / path, records)
+                chunks.append(ArchivedChunk(
+                    month=month, path=path, first_id=records[0]['id'], last_id=records[-1]['id'],
+                    rows=len(records), hits=sum(record['hits'] for record in records)
+                ))
+
+            # The files are synced before the rows are deleted, so a crash in between leaves
+            # the attempts in the database and stray files that _remove_orphans() deletes
+            ids = [row.id for row in rows]
+            for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+                (session.query(LoginAttempt)
+                 .filter(LoginAttempt.id.in_(ids[start:start + DELETE_CHUNK_SIZE]))
+                 .delete(synchronize_session=False))
+            session.add_all(chunks)
+            session.commit()
+            session.expunge_all()
+            archived += len(rows)
+            self.chunks_written += len(chunks)
+        return archived
+
+    def _compact(self, session: Session, before_month: str) -> int:
+        """Merge the chunk files of each complete month into one file."""
+        months = [month for month, in (session.query(ArchivedChunk.month)
+                                       .filter(ArchivedChunk.month < before_month)
+                                       .group_by(ArchivedChunk.month)
+                                       .having(func.count(ArchivedChunk.id) > 1))]
+        session.commit()
+        for month in months:
+            chunks = (session.query(ArchivedChunk)
+                      .filter(ArchivedChunk.month == month)
+                      .order_by(ArchivedChunk.first_id)
+                      .all())
+            session.commit()
+            first_id = chunks[0].first_id
+            last_id = max(chunk.last_id for chunk in chunks)
+            path = f"{month}/attempts-{first_id}-{last_id}{CHUNK_SUFFIX}"
+            _write_chunk(self.directory / path,
+                         (record for chunk in chunks for record in _read_chunk(self.directory / chunk.path)))
+
+            (session.query(ArchivedChunk)
+             .filter(ArchivedChunk.id.in_([chunk.id for chunk in chunks]))
+             .delete(synchronize_session=False))
+            session.add(ArchivedChunk(
+                month=month, path=path, first_id=first_id, last_id=last_id,
+                rows=sum(chunk.rows for chunk in chunks), hits=sum(chunk.hits for chunk in chunks)
+            ))
+            session.commit()
+            for chunk in chunks:
+                (self.directory / chunk.path).unlink(missing_ok=True)
+        return len(months)
+
+    def _expire(self, session: Session, before_month: str) -> int:
+        """Delete the archive files of months before before_month."""
+        chunks = session.query(ArchivedChunk).filter(ArchivedChunk.month < before_month).all()
+        if not chunks:
+            session.commit()
+            return 0
+        session.query(ArchivedChunk).filter(ArchivedChunk.month < before_month).delete(synchronize_session=False)
+        session.commit()
+        months = {chunk.month for chunk in chunks}
+        for chunk in chunks:
+            (self.directory / chunk.path).unlink(missing_ok=True)
+        for month in months:
+            try:
+                (self.directory / month).rmdir()
+            except OSError:
+                pass
+        return len(months)
+
+    def iter_attempts(self, session: Session) -> Iterator[Dict]:
+        """Read the archived attempts, oldest month first.
+
+        The files are listed right away, so the session can be closed
+        before the attempts are read.
+
+        Args:
+            session: A database session, used to list the archive files
+
+        Returns:
+            Iterator of attempts in the LoginAttempt.to_dict() form
+        """
+        paths = [path for path, in (session.query(ArchivedChunk.path)
+                                    .order_by(ArchivedChunk.month, ArchivedChunk.first_id))]
+        return self._read_files(paths)
+
+    def _read_files(self, paths: List[str]) -> Iterator[Dict]:
+        for path in paths:
+            try:
+                yield from _read_chunk(self.directory / path)
+            except FileNotFoundError:
+                # Compacted or expired since it was listed
+                logger.warning(f"Archive file {path} disappeared while it was being read")
+
+    def get_stats(self) -> Dict:
+        """Get archival settings and counts since startup.
+
+        Returns:
+            Dictionary with the archival settings, attempts archived, months compacted and expired, and the last run
+        """
+        return {
+            'archive_after_days': self.archive_after_days,
+            'retention_days': self.retention_days,
+            'rows_archived': self.rows_archived,
+            'chunks_written': self.chunks_written,
+            'months_compacted': self.months_compacted,
+            'months_expired': self.months_expired,
+            'last_run': self.last_run.isoformat() if self.last_run else None,
+        }
+
+# Rows keep their column values after commit, for writing them to the archive
+ArchiveSession = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+# Global archiver instance, started by main.py when archival or retention is configured
+attempt_archiver = AttemptArchiver(ArchiveSession, ARCHIVE_DIR, ARCHIVE_AFTER_DAYS, ARCHIVE_RETENTION_DAYS)
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old login attempts and delete expired archives")
+    parser.add_argument('--run', action='store_true', help='Run one archival pass with the configured settings')
+    args = parser.parse_args()
+    if not args.run:
+        parser.print_help()
+        return
+
+    from honeypot.database.models import init_db
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    init_db()
+    if not attempt_archiver.enabled:
+        logger.info("Set ARCHIVE_AFTER_DAYS or ARCHIVE_RETENTION_DAYS to archive attempts")
+        return
+    start = time.time()
+    result = attempt_archiver.run()
+    logger.info(f"Archival pass finished in {time.time() - start:.1f}s: {result}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""In-memory sorted set of attacking addresses for the blocklist exports."""
+import bisect
+import ipaddress
+import logging
+import os
+import threading
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+from honeypot.database.archive import attempt_archiver
+from honeypot.database.models import LoginAttempt, ReadSessionLocal, pack_ip, snapshot_client_ips
+from honeypot.database.writer import attempt_writer
+
+logger = logging.getLogger(__name__)
+
+def _sort_key(value: str) -> Tuple[bytes, str]:
+    # The order of ix_client_ips_packed, with values that are not IP addresses first
+    return pack_ip(value) or b'', value
+
+# IPv4 addresses are packed as ::ffff:a.b.c.d, so these values are IPv4
+IPV4_MAPPED_RANGE = (0xffff << 32, (0xffff << 32) | 0xffffffff)
+
+def _is_ipv4(value: int) -> bool:
+    return IPV4_MAPPED_RANGE[0] <= value <= IPV4_MAPPED_RANGE[1]
+
+def _range_networks(first: int, last: int) -> List[str]:
+    """Cover the packed address range first..last with networks, single addresses without a prefix length."""
+    if _is_ipv4(first):
+        first, last = ipaddress.IPv4Address(first & 0xffffffff), ipaddress.IPv4Address(last & 0xffffffff)
+    else:
+        first, last = ipaddress.IPv6Address(first), ipaddress.IPv6Address(last)
+    if first == last:
+        return [str(first)]
+    return [str(network.network_address) if network.num_addresses == 1 else str(network)
+            for network in ipaddress.summarize_address_range(first, last)]
+
+def collapse_packed(packed: Iterable[bytes]) -> List[str]:
+    """Merge sorted packed addresses into the fewest covering networks.
+
+    Works like ipaddress.collapse_addresses() on addresses that are already
+    in order, without building an address object for each of them: runs of
+    consecutive addresses are found on integers, and only runs longer than
+    one address are summarized into networks.
+
+    Args:
+        packed: 16-byte packed addresses (see pack_ip) in ascending order, duplicates allowed
+
+    Returns:
+        IPv4 then IPv6 networks in numeric order
+    """
+    networks = []
+    first = last = None
+    for key in packed:
+        value = int.from_bytes(key, 'big')
+        if last is not None and value <= last + 1 and _is_ipv4(value) == _is_ipv4(last):
+            last = max(last, value)
+            continue
+        if last is not None:
+            networks.extend(_range_networks(first, last))
+        first = last = value
+    if last is not None:
+        networks.extend(_range_networks(first, last))
+
+    # IPv4 sorts among IPv6 addresses in packed form
+    ipv4 = [network for network in networks if ':' not in network]
+    return ipv4 + [network for network in networks if ':' in network]
+
+def collapse_networks(values: Iterable[str]) -> List[str]:
+    """Merge addresses into the fewest covering networks.
+
+    IPv4-mapped IPv6 addresses count as IPv4, and values that are not IP
+    addresses are left out.
+
+    Args:
+        values: IP address strings
+
+    Returns:
+        IPv4 then IPv6 networks in numeric order, single addresses without a prefix length
+    """
+    return collapse_packed(sorted(filter(None, map(pack_ip, values))))
+
+class IPBlocklist:
+    """Sorted client addresses with a version number and cached renderings."""
+
+    def __init__(self, session_factory: Callable):
+        """Initialize an empty blocklist, loaded from the database on first use.
+
+        Args:
+            session_factory: Callable returning a new read session
+        """
+        self.session_factory = session_factory
+        self.lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._values: Set[str] = set()
+        # Sort keys of _values, None until loaded
+        self._sorted: Optional[List[Tuple[bytes, str]]] = None
+        self._invalidations = 0
+        # Part of every ETag, so versions of an earlier process never match
+        self._instance = os.urandom(4).hex()
+        self.version = 0
+        self._rendered: Dict[Hashable, Tuple[int, str, str]] = {}
+        # Networks of the last aggregated rendering, shared by the formats
+        self._collapsed: Tuple[int, Optional[List[str]]] = (-1, None)
+        self.loads = 0
+        self.renders = 0
+        self.cache_hits = 0
+
+    def add(self, values: Iterable[str]):
+        """Add client addresses, keeping the list sorted.
+
+        Args:
+            values: Client IP address strings
+        """
+        with self.lock:
+            for value in values:
+                if value is None or value in self._values:
+                    continue
+                self._values.add(value)
+                if self._sorted is not None:
+                    bisect.insort(self._sorted, _sort_key(value))
+                self.version += 1
+
+    def add_rows(self, rows: list):
+        """Add the addresses of a committed writer batch, as an AttemptWriter listener."""
+        self.add(row.client_ip for row in rows if isinstance(row, LoginAttempt))
+
+    def invalidate(self):
+        """Reload the addresses on next use, after attempts were removed from the database."""
+        with self.lock:
+            self._values = set()
+            self._sorted = None
+            self._invalidations += 1
+
+    def _ensure_loaded(self):
+        """Load the addresses that have attempts in the database, if not loaded yet.
+
+        Addresses committed while the database is read are added by add_rows,
+        and adding twice is harmless. A load overtaken by invalidate() is
+        repeated, since it may have read attempts archived meanwhile.
+        """
+        with self._load_lock:
+            while True:
+                with self.lock:
+                    if self._sorted is not None:
+                        return
+                    invalidations = self._invalidations
+                _, addresses = snapshot_client_ips(self.session_factory)
+                stored = list(addresses)
+                with self.lock:
+                    if invalidations != self._invalidations:
+                        continue
+                    self._values.update(stored)
+                    self._sorted = sorted(_sort_key(value) for value in self._values)
+                    self.version += 1
+                    self.loads += 1
+                logger.info(f"Loaded {len(stored)} addresses into the blocklist")
+
+    def render(self, key: Hashable, formatter: Callable[[List[str], int], str], aggregate: bool = False
+               ) -> Tuple[str, str]:
+        """Render the list, reusing the last rendering under key while the list is unchanged.
+
+        Args:
+            key: Identifies the formatter and its options
+            formatter: Function building the text from the entries and the number of addresses
+            aggregate: Whether entries are collapsed into covering networks
+
+        Returns:
+            Tuple of (ETag, text)
+        """
+        while True:
+            self._ensure_loaded()
+            with self.lock:
+                if self._sorted is None:
+                    # Invalidated again since it was loaded
+                    continue
+                cached = self._rendered.get((key, aggregate))
+                if cached is not None and cached[0] == self.version:
+                    self.cache_hits += 1
+                    return cached[1], cached[2]
+                version = self.version
+                keys = list(self._sorted)
+                break
+
+        values = [value for _, value in keys]
+        entries = values
+        if aggregate:
+            entries = self._collapsed[1] if self._collapsed[0] == version else None
+            if entries is None:
+                entries = collapse_packed(packed for packed, _ in keys if packed)
+                self._collapsed = (version, entries)
+        etag = f'"{self._instance}-{version}"'
+        text = formatter(entries, len(values))
+        with self.lock:
+            self._rendered[(key, aggregate)] = (version, etag, text)
+            self.renders += 1
+        return etag, text
+
+    def get_stats(self) -> Dict:
+        """Get the list size and how often renderings were reused.
+
+        Returns:
+            Dictionary with the addresses, version, loads, renders and cache hits
+        """
+        with self.lock:
+            return {
+                'addresses': len(self._values),
+                'version': self.version,
+                'loads': self.loads,
+                'renders': self.renders,
+                'cache_hits': self.cache_hits,
+            }
+
+# Global blocklist, following the writer's commits and reloaded after archival runs
+ip_blocklist = IPBlocklist(ReadSessionLocal.session_factory)
+attempt_writer.add_listener(ip_blocklist.add_rows)
+attempt_archiver.add_listener(ip_blocklist.invalidate)
@@ -0,0 +1,231 @@
+"""Counting of repeated identical login attempts on their first stored row."""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from sqlalchemy import bindparam, event
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from honeypot.database.models import LoginAttempt, Protocol
+from honeypot.database.rollups import update_rollups
+
+logger = logging.getLogger(__name__)
+
+# Seconds past the end of its window that an attempt whose row never
+# reached the database (dropped by the writer) is kept before its repeats are given up
+ORPHAN_GRACE = 300
+
+# Seconds between sweeps for closed windows
+SWEEP_INTERVAL = 5.0
+
+# session.info key for the repeats written in the session's open transaction
+PENDING_KEY = 'attempt_hits'
+
+AttemptKey = Tuple[str, Protocol, str, str]
+
+class _Window:
+    """An attempt stored in the database and the repeats counted on it."""
+    __slots__ = ('key', 'first_seen', 'closes', 'row', 'hits', 'pending', 'last_seen')
+
+    def __init__(self, key: AttemptKey, first_seen: datetime, closes: float):
+        self.key = key
+        self.first_seen = first_seen
+        self.closes = closes
+        self.row: Optional[LoginAttempt] = None
+        self.hits = 1  # Attempts committed to the row
+        self.pending = 0  # Repeats counted but not yet committed
+        self.last_seen = first_seen
+
+class AttemptDeduplicator:
+    """Collapses identical login attempts within a time window into one counted row."""
+
+    def __init__(self, window: float, request_batch: Callable[[], None]):
+        """Initialize the deduplicator.
+
+        Args:
+            window: Seconds after an attempt in which identical attempts are counted on it, 0 to disable
+            request_batch: Function asking the database writer for a batch, such as AttemptWriter.request_batch
+        """
+        self.window = window
+        self.request_batch = request_batch
+        self.lock = threading.Lock()
+        self._open: Dict[AttemptKey, _Window] = {}
+        self._awaiting_row: Dict[Tuple[AttemptKey, datetime], _Window] = {}
+        self._dirty: Set[_Window] = set()
+        self._batch_requested = False
+        self._next_sweep = 0.0
+        self.listeners: List[Callable[[List[Dict]], None]] = []
+        self.repeats = 0
+        self.repeats_lost = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def add_listener(self, listener: Callable[[List[Dict]], None]):
+        """Register a function called with the new totals after repeats are committed.
+
+        Listeners run on the writer thread and must hand slow work elsewhere.
+
+        Args:
+            listener: Function called with a list of {'id', 'hits', 'last_seen'} dicts
+        """
+        self.listeners.append(listener)
+
+    def admit(self, protocol: Protocol, username: str, password: str, client_ip: str, timestamp: datetime) -> bool:
+        """Decide whether an attempt is stored as a row or counted as a repeat.
+
+        Args:
+            protocol: The protocol the attempt was made over
+            username: The attempted username
+            password: The attempted password
+            client_ip: The client's IP address
+            timestamp: When the attempt was made; stored on the row if admitted
+
+        Returns:
+            True if the attempt should be stored, False if it was counted on an earlier one
+        """
+        if not self.enabled:
+            return True
+        key = (client_ip, protocol, username, password)
+        now = time.monotonic()
+        with self.lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            window = self._open.get(key)
+            if window is not None and now < window.closes:
+                window.pending += 1
+                window.last_seen = max(window.last_seen, timestamp)
+                self._dirty.add(window)
+                self.repeats += 1
+                request = not self._batch_requested
+                self._batch_requested = True
+            else:
+                window = _Window(key, timestamp, now + self.window)
+                self._open[key] = window
+                self._awaiting_row[(key, timestamp)] = window
+                return True
+        if request:
+            self.request_batch()
+        return False
+
+    def _sweep(self, now: float):
+        """Forget closed windows with nothing left to write. Called with the lock held."""
+        self._next_sweep = now + SWEEP_INTERVAL
+        for key, window in list(self._open.items()):
+            if window.closes <= now and window not in self._dirty and window.row is not None:
+                del self._open[key]
+        for row_key, window in list(self._awaiting_row.items()):
+            if window.closes + ORPHAN_GRACE <= now:
+                # The row was dropped by the writer, so there is nothing to count the repeats on
+                del self._awaiting_row[row_key]
+                self._dirty.discard(window)
+                if self._open.get(window.key) is window:
+                    del self._open[window.key]
+                if window.pending:
+                    self.repeats_lost += window.pending
+                    logger.warning(f"Dropping {window.pending} repeated attempts from {window.key[0]}, "
+                                   f"their first attempt was never stored")
+
+    def apply(self, session: Session, rows: list):
+        """Transaction hook: add the counted repeats to their stored attempts.
+
+        Args:
+            session: The writer's session
+            rows: The rows inserted in this transaction
+        """
+        with self.lock:
+            self._batch_requested = False
+            stored = {}
+            for row in rows:
+                if isinstance(row, LoginAttempt):
+                    window = self._awaiting_row.get(
+                        ((row.client_ip, row.protocol, row.username, row.password), row.timestamp)
+                    )
+                    if window is not None:
+                        stored[window] = row
+            updates = [(window, window.row or stored.get(window), window.pending, window.last_seen)
+                       for window in self._dirty if window.row is not None or window in stored]
+        if stored or updates:
+            # Windows are only changed once committed, since a failed batch is retried with new rows
+            session.info[PENDING_KEY] = (self, stored, updates)
+        if not updates:
+            return
+
+        session.execute(
+            LoginAttempt.__table__.update()
+            .where(LoginAttempt.id == bindparam('row_id'))
+            .values(hits=LoginAttempt.hits + bindparam('repeats'), last_seen=bindparam('seen')),
+            [{'row_id': row.id, 'repeats': repeats, 'seen': last_seen} for _, row, repeats, last_seen in updates]
+        )
+        update_rollups(session, [
+            LoginAttempt(
+                protocol=row.protocol, username=row.username, password=row.password, client_ip=row.client_ip,
+                country=row.country, timestamp=row.timestamp, last_seen=last_seen, hits=repeats
+            )
+            for _, row, repeats, last_seen in updates
+        ])
+
+    def _committed(self, stored: dict, updates: list):
+        """Record committed rows and repeats, then notify the listeners."""
+        totals = []
+        with self.lock:
+            for window, row in stored.items():
+                window.row = row
+                self._awaiting_row.pop((window.key, window.first_seen), None)
+            for window, row, repeats, last_seen in updates:
+                window.pending -= repeats
+                window.hits += repeats
+                if window.pending == 0:
+                    self._dirty.discard(window)
+                totals.append({'id': row.id, 'hits': window.hits, 'last_seen': last_seen.isoformat()})
+        if not totals:
+            return
+        for listener in self.listeners:
+            try:
+                listener(totals)
+            except Exception as e:
+                logger.error(f"Error in deduplicator listener: {str(e)}")
+
+    def relocate(self, enriched: List[Dict]):
+        """Give stored attempts the locations filled in after they were written, as an AttemptEnricher listener.
+
+        Repeats are counted into the rollups under their attempt's country,
+        so the attempts kept in the windows need the new location too.
+
+        Args:
+            enriched: List of {'id', 'latitude', 'longitude', 'country', 'city', 'region'} dicts
+        """
+        locations = {attempt['id']: attempt for attempt in enriched}
+        with self.lock:
+            for window in self._open.values():
+                location = locations.get(window.row.id) if window.row is not None else None
+                if location is not None:
+                    for attribute in ('latitude', 'longitude', 'country', 'city', 'region'):
+                        set_committed_value(window.row, attribute, location[attribute])
+
+    def get_stats(self) -> Dict:
+        """Get window and repeat counts.
+
+        Returns:
+            Dictionary with the window length, open windows, repeats counted and repeats lost
+        """
+        with self.lock:
+            return {
+                'window': self.window,
+                'open_windows': len(self._open),
+                'repeats': self.repeats,
+                'repeats_lost': self.repeats_lost,
+            }
+
+@event.listens_for(Session, 'after_commit')
+def _take_committed_hits(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending:
+        deduplicator, stored, updates = pending
+        deduplicator._committed(stored, updates)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_hits(session):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,132 @@
+"""Interning of repeated values into dimension tables."""
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Values per select when looking up ids, under SQLite's bound parameter limit
+LOOKUP_CHUNK_SIZE = 300
+
+# session.info key for ids resolved in the session's open transaction
+PENDING_KEY = 'dimension_ids'
+
+def dialect_insert(session: Session, model):
+    """Return an INSERT construct with ON CONFLICT support for the session's database."""
+    if session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+class DimensionCache:
+    """Bounded in-process map from dimension values to row ids.
+
+    Dimension models name their key columns in a dimension_columns class
+    attribute and need a unique constraint over them. Ids are cached per
+    engine. Ids found or created inside a transaction are only cached once
+    it commits, so a rolled back batch cannot leave ids of rows that were
+    never written in the cache.
+    """
+
+    def __init__(self, max_entries: int):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum values cached per dimension table
+        """
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._ids: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, session: Session, model, keys: Iterable[Tuple]) -> Dict[Tuple, int]:
+        """Get the ids for dimension values, inserting the missing ones.
+
+        Args:
+            session: The session whose transaction writes the referencing rows
+            model: The dimension model
+            keys: Tuples of key column values, in dimension_columns order
+
+        Returns:
+            Dictionary mapping each key to its id
+        """
+        engine = session.get_bind().engine
+        pending = session.info.setdefault(PENDING_KEY, {}).setdefault((engine, model), {})
+        ids = {}
+        missing = []
+        with self.lock:
+            cached = self._ids.setdefault(engine, {}).setdefault(model, OrderedDict())
+            for key in set(keys):
+                if key in cached:
+                    cached.move_to_end(key)
+                    ids[key] = cached[key]
+                elif key in pending:
+                    ids[key] = pending[key]
+                else:
+                    missing.append(key)
+            self.hits += len(ids)
+            self.misses += len(missing)
+
+        if missing:
+            columns = model.dimension_columns
+            session.execute(
+                dialect_insert(session, model).on_conflict_do_nothing(index_elements=list(columns)),
+                [dict(zip(columns, key)) for key in missing]
+            )
+            key_columns = [getattr(model, column) for column in columns]
+            for start in range(0, len(missing), LOOKUP_CHUNK_SIZE):
+                chunk = missing[start:start + LOOKUP_CHUNK_SIZE]
+                if len(key_columns) == 1:
+                    condition = key_columns[0].in_([key[0] for key in chunk])
+                else:
+                    condition = tuple_(*key_columns).in_(chunk)
+                rows = session.query(model.id, *key_columns).filter(condition)
+                for row in rows:
+                    key = tuple(row[1:])
+                    pending[key] = ids[key] = row[0]
+        return ids
+
+    def commit(self, session: Session):
+        """Cache the ids resolved in a transaction that has committed."""
+        pending = session.info.pop(PENDING_KEY, None)
+        if not pending:
+            return
+        with self.lock:
+            for (engine, model), resolved in pending.items():
+                cached = self._ids.setdefault(engine, {}).setdefault(model, OrderedDict())
+                cached.update(resolved)
+                while len(cached) > self.max_entries:
+                    cached.popitem(last=False)
+
+    def discard(self, session: Session):
+        """Forget the ids resolved in a transaction that was rolled back."""
+        session.info.pop(PENDING_KEY, None)
+
+    def clear(self):
+        """Forget every cached id."""
+        with self.lock:
+            self._ids.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache size and hit statistics.
+
+        Returns:
+            Dictionary with cached values per table and the overall hit rate
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            entries: Dict[str, int] = {}
+            for tables in self._ids.values():
+                for model, cached in tables.items():
+                    entries[model.__tablename__] = entries.get(model.__tablename__, 0) + len(cached)
+            return {
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0,
+            }
@@ -0,0 +1,185 @@
+"""Filling in the geolocation of login attempts stored before their address was located."""
+import logging
+import threading
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import bindparam, event
+from sqlalchemy.orm import Session
+from honeypot.database.models import ClientIP, LoginAttempt, Location, dimension_cache
+from honeypot.database.rollups import DAY_FORMAT, move_country_counts
+
+logger = logging.getLogger(__name__)
+
+# session.info key for the locations written in the session's open transaction
+PENDING_KEY = 'attempt_locations'
+
+class AttemptEnricher:
+    """Writes finished geolocation lookups onto attempts stored without a location."""
+
+    def __init__(self, request_batch: Callable[[], None]):
+        """Initialize the enricher.
+
+        Args:
+            request_batch: Function making the writer run a batch, so located addresses are written promptly
+        """
+        self.request_batch = request_batch
+        self.lock = threading.Lock()
+        # Locations looked up but not yet written, by client IP
+        self._located: Dict[str, Dict] = {}
+        self._batch_requested = False
+        self.listeners: List[Callable[[List[Dict]], None]] = []
+        self.lookups_pending = 0
+        self.lookups_failed = 0
+        self.attempts_enriched = 0
+
+    def add_listener(self, listener: Callable[[List[Dict]], None]):
+        """Register a function called with the attempts of each committed batch of locations.
+
+        Listeners run on the writer thread and must hand slow work elsewhere.
+
+        Args:
+            listener: Function called with a list of {'id', 'client_ip', 'latitude', 'longitude',
+                'country', 'city', 'region'} dicts
+        """
+        self.listeners.append(listener)
+
+    def expect(self, client_ip: str) -> Callable[[Optional[Dict]], None]:
+        """Note that an attempt was stored before its address was located.
+
+        Args:
+            client_ip: The client's IP address
+
+        Returns:
+            Callback for the geolocation lookup, taking its result
+        """
+        with self.lock:
+            self.lookups_pending += 1
+        return lambda location: self.located(client_ip, location)
+
+    def located(self, client_ip: str, location: Optional[Dict]):
+        """Queue the result of a lookup to be written onto the address's attempts.
+
+        Args:
+            client_ip: The client's IP address
+            location: The lookup result, None if the address could not be located
+        """
+        with self.lock:
+            self.lookups_pending -= 1
+            if not location:
+                # The attempts keep no location, and a later lookup of the address fills them in
+                self.lookups_failed += 1
+                return
+            self._located[client_ip] = location
+            request = not self._batch_requested
+            self._batch_requested = True
+        if request:
+            self.request_batch()
+
+    def apply(self, session: Session, rows: list):
+        """Transaction hook: fill in the locations looked up since the last batch.
+
+        Runs after the hooks counting the batch's new rows, so attempts
+        inserted in this batch are counted under no country before they
+        are moved.
+
+        Args:
+            session: The writer's session
+            rows: The rows inserted in this transaction
+        """
+        with self.lock:
+            self._batch_requested = False
+            located = dict(self._located)
+        if not located:
+            return
+        # Entries are only dropped once committed, since a failed batch is retried
+        session.info[PENDING_KEY] = (self, located, [])
+
+        attempts = session.query(
+            LoginAttempt.id, LoginAttempt.timestamp, LoginAttempt.hits, ClientIP.value
+        ).join(ClientIP, ClientIP.id == LoginAttempt.client_ip_id).filter(
+            ClientIP.value.in_(located),
+            LoginAttempt.location_id.is_(None),
+            LoginAttempt.latitude.is_(None)
+        ).all()
+        if not attempts:
+            return
+
+        keys = {}
+        for ip in {attempt.value for attempt in attempts}:
+            key = tuple(located[ip].get(column) or '' for column in Location.dimension_columns)
+            if any(key):
+                keys[ip] = key
+        location_ids = dimension_cache.resolve(session, Location, keys.values()) if keys else {}
+
+        updates = []
+        moves: Counter = Counter()
+        for attempt in attempts:
+            location = located[attempt.value]
+            updates.append({
+                'row_id': attempt.id,
+                'latitude': location.get('latitude'),
+                'longitude': location.get('longitude'),
+                'location': location_ids.get(keys.get(attempt.value)),
+            })
+            moves[(attempt.timestamp.strftime(DAY_FORMAT), location.get('country') or '')] += attempt.hits or 1
+        session.execute(
+            LoginAttempt.__table__.update()
+            .where(LoginAttempt.id == bindparam('row_id'))
+            .values(latitude=bindparam('latitude'), longitude=bindparam('longitude'),
+                    location_id=bindparam('location')),
+            updates
+        )
+        move_country_counts(session, moves)
+        session.info[PENDING_KEY] = (self, located, [
+            {
+                'id': attempt.id,
+                'client_ip': attempt.value,
+                'latitude': located[attempt.value].get('latitude'),
+                'longitude': located[attempt.value].get('longitude'),
+                'country': located[attempt.value].get('country'),
+                'city': located[attempt.value].get('city'),
+                'region': located[attempt.value].get('region'),
+            }
+            for attempt in attempts
+        ])
+
+    def _committed(self, located: Dict[str, Dict], enriched: List[Dict]):
+        """Forget the written locations, then notify the listeners."""
+        with self.lock:
+            for ip, location in located.items():
+                if self._located.get(ip) is location:
+                    del self._located[ip]
+            self.attempts_enriched += len(enriched)
+        if not enriched:
+            return
+        for listener in self.listeners:
+            try:
+                listener(enriched)
+            except Exception as e:
+                logger.error(f"Error in enricher listener: {str(e)}")
+
+    def get_stats(self) -> Dict:
+        """Get lookup and enrichment counts.
+
+        Returns:
+            Dictionary with the lookups pending, failed lookups, located addresses
+            waiting to be written and attempts enriched
+        """
+        with self.lock:
+            return {
+                'lookups_pending': self.lookups_pending,
+                'lookups_failed': self.lookups_failed,
+                'addresses_waiting': len(self._located),
+                'attempts_enriched': self.attempts_enriched,
+            }
+
+@event.listens_for(Session, 'after_commit')
+def _take_committed_locations(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending:
+        enricher, located, enriched = pending
+        enricher._committed(located, enriched)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_locations(session):
+    session.info.pop(PENDING_KEY, None)
@@ -1,12 +1,23 @@
 """Database models for the SSH Honeypot."""
 from datetime import datetime
 from zoneinfo import ZoneInfo  # Built-in module, no installation needed
-from sqlalchemy import Column, Integer, String, DateTime, Float, create_engine, Enum
+from sqlalchemy import (
+    Column, Integer, String, DateTime, Float, ForeignKey, Index, LargeBinary, UniqueConstraint, create_engine, Enum,
+    bindparam, event, exists, func, inspect, select, text
+)
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.orm import Session, column_property, sessionmaker, scoped_session
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.pool import QueuePool
-from honeypot.core.config import DATABASE_URL
+from typing import Callable, Iterator, List, Optional, Tuple
+from honeypot.core.config import (
+    DATABASE_URL, SQLITE_READ_POOL_SIZE, SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE_KB, SQLITE_BUSY_TIMEOUT_MS,
+    DIMENSION_CACHE_SIZE
+)
+from honeypot.database.dimensions import DimensionCache
 import enum
+import ipaddress
 import logging
 import threading
 import time
@@ -32,25 +43,123 @@ class Protocol(enum.Enum):
     SIP = "sip"
     MYSQL = "mysql"
 
+# Dimension tables: each distinct username, password, client IP and
+# location is stored once and login attempts refer to it by id
+
+class Username(Base):
+    """Distinct usernames tried by clients."""
+    __tablename__ = 'usernames'
+    dimension_columns = ('value',)
+    
+    id = Column(Integer, primary_key=True)
+    value = Column(String, nullable=False, unique=True)
+
+class Password(Base):
+    """Distinct passwords tried by clients."""
+    __tablename__ = 'passwords'
+    dimension_columns = ('value',)
+    
+    id = Column(Integer, primary_key=True)
+    value = Column(String, nullable=False, unique=True)
+
+# IPv4 addresses are packed as IPv4-mapped IPv6 addresses (::ffff:a.b.c.d)
+IPV4_MAPPED_PREFIX = bytes(10) + b'\xff\xff'
+
+def pack_ip(address: str) -> Optional[bytes]:
+    """Pack an IP address into 16 bytes that sort in address order.
+    
+    Args:
+        address: An IPv4 or IPv6 address
+    
+    Returns:
+        The packed address, or None if address is not an IP address
+    """
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return None
+    return IPV4_MAPPED_PREFIX + ip.packed if ip.version == 4 else ip.packed
+
+def network_bounds(network: str) -> Tuple[bytes, bytes]:
+    """Get the first and last packed address of a network.
+    
+    Args:
+        network: CIDR notation such as "45.148.10.0/24" or "2001:db8::/32"; host bits are ignored
+    
+    Returns:
+        Tuple of (first, last) packed addresses
+    
+    Raises:
+        ValueError: If network is not a valid network
+    """
+    net = ipaddress.ip_network(network.strip(), strict=False)
+    prefix = IPV4_MAPPED_PREFIX if net.version == 4 else b''
+    return prefix + net.network_address.packed, prefix + net.broadcast_address.packed
+
+class ClientIP(Base):
+    """Distinct client IP addresses."""
+    __tablename__ = 'client_ips'
+    dimension_columns = ('value',)
+    
+    id = Column(Integer, primary_key=True)
+    value = Column(String, nullable=False, unique=True)
+    # pack_ip(value), for numeric ordering and subnet range scans
+    packed = Column(LargeBinary(16), nullable=True,
+                    default=lambda context: pack_ip(context.get_current_parameters()['value']))
+    
+    __table_args__ = (
+        Index('ix_client_ips_packed', 'packed'),
+    )
+
+class Location(Base):
+    """Distinct geolocation results; missing parts are stored as empty strings."""
+    __tablename__ = 'locations'
+    dimension_columns = ('country', 'city', 'region')
+    
+    id = Column(Integer, primary_key=True)
+    country = Column(String, nullable=False, default='')
+    city = Column(String, nullable=False, default='')
+    region = Column(String, nullable=False, default='')
+    
+    __table_args__ = (
+        UniqueConstraint('country', 'city', 'region', name='uq_locations'),
+    )
+
 class LoginAttempt(Base):
-    """Model for storing SSH login attempts."""
+    """Model for storing SSH login attempts.
+    
+    username, password, client_ip, country, city and region read through
+    to the dimension tables. They can be set on new attempts, and the ids
+    are filled in when the session flushes.
+    """
     __tablename__ = 'login_attempts'
 
     id = Column(Integer, primary_key=True)
     protocol = Column(Enum(Protocol), nullable=False)
-    username = Column(String, nullable=False)
-    password = Column(String, nullable=False)
-    client_ip = Column(String, nullable=False)
+    username_id = Column(Integer, ForeignKey('usernames.id'), nullable=False)
+    password_id = Column(Integer, ForeignKey('passwords.id'), nullable=False)
+    client_ip_id = Column(Integer, ForeignKey('client_ips.id'), nullable=False)
     timestamp = Column(DateTime(timezone=True), 
                       default=lambda: datetime.now(ZoneInfo("UTC")))
     
     # Geolocation fields
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
-    country = Column(String, nullable=True)
-    city = Column(String, nullable=True)
-    region = Column(String, nullable=True)
-
+    location_id = Column(Integer, ForeignKey('locations.id'), nullable=True)
+    
+    # Identical attempts repeated within DEDUP_WINDOW are counted here instead
+    # of stored as rows; last_seen is the latest repeat, None for single attempts
+    hits = Column(Integer, nullable=False, default=1, server_default='1')
+    last_seen = Column(DateTime(timezone=True), nullable=True)
+    
+    # Newest-first listings, distinct IP exports, per-protocol views and username lookups
+    __table_args__ = (
+        Index('ix_login_attempts_timestamp', 'timestamp'),
+        Index('ix_login_attempts_client_ip_id', 'client_ip_id'),
+        Index('ix_login_attempts_protocol_timestamp', 'protocol', 'timestamp'),
+        Index('ix_login_attempts_username_id', 'username_id'),
+    )
+    
     def to_dict(self):
         """Convert the model instance to a dictionary."""
         return {
@@ -64,9 +173,304 @@ class LoginAttempt(Base):
             'longitude': self.longitude,
             'country': self.country,
             'city': self.city,
-            'region': self.region
+            'region': self.region,
+            'hits': self.hits or 1,
+            'last_seen': self.last_seen.isoformat() if self.last_seen else None
         }
 
+def _dimension_value(column, foreign_key, empty_as_null: bool = False):
+    """Map a dimension column onto LoginAttempt as a correlated lookup by id.
+    
+    The value set on a new attempt is kept after the flush, so committed
+    rows still carry it for the writer's listeners.
+    """
+    value = func.nullif(column, '') if empty_as_null else column
+    return column_property(
+        select(value).where(column.table.c.id == foreign_key).correlate_except(column.table).scalar_subquery(),
+        expire_on_flush=False
+    )
+
+LoginAttempt.username = _dimension_value(Username.value, LoginAttempt.username_id)
+LoginAttempt.password = _dimension_value(Password.value, LoginAttempt.password_id)
+LoginAttempt.client_ip = _dimension_value(ClientIP.value, LoginAttempt.client_ip_id)
+LoginAttempt.country = _dimension_value(Location.country, LoginAttempt.location_id, empty_as_null=True)
+LoginAttempt.city = _dimension_value(Location.city, LoginAttempt.location_id, empty_as_null=True)
+LoginAttempt.region = _dimension_value(Location.region, LoginAttempt.location_id, empty_as_null=True)
+
+# Dimension model, LoginAttempt foreign key and the attributes forming the key
+ATTEMPT_DIMENSIONS = (
+    (Username, 'username_id', ('username',)),
+    (Password, 'password_id', ('password',)),
+    (ClientIP, 'client_ip_id', ('client_ip',)),
+    (Location, 'location_id', ('country', 'city', 'region')),
+)
+
+# Global intern cache for the dimension ids
+dimension_cache = DimensionCache(DIMENSION_CACHE_SIZE)
+
+def assign_dimension_ids(session: Session, attempts: List[LoginAttempt]):
+    """Fill in the dimension ids of new login attempts from their values.
+    
+    Args:
+        session: The session that will insert the attempts
+        attempts: New attempts with their username, password, client_ip and location set
+    """
+    for model, foreign_key, attributes in ATTEMPT_DIMENSIONS:
+        keys = {}
+        for attempt in attempts:
+            # Read the instance dict; unset attributes of pending rows are simply absent
+            state = vars(attempt)
+            if state.get(foreign_key) is not None:
+                continue
+            values = tuple(state.get(attribute) for attribute in attributes)
+            if model is Location:
+                if not any(values):
+                    continue  # No location, the foreign key stays empty
+                values = tuple(value or '' for value in values)
+            elif None in values:
+                # A missing credential, such as FTP PASS without an argument, is stored as empty
+                for attribute, value in zip(attributes, values):
+                    if value is None:
+                        set_committed_value(attempt, attribute, '')
+                values = tuple('' if value is None else value for value in values)
+            keys[attempt] = values
+        if not keys:
+            continue
+        ids = dimension_cache.resolve(session, model, keys.values())
+        # Pending rows are inserted from their instance state, so the ids
+        # can skip the attribute events, which cost more than the interning
+        for attempt, key in keys.items():
+            set_committed_value(attempt, foreign_key, ids[key])
+
+@event.listens_for(Session, 'before_flush')
+def _intern_attempt_dimensions(session, flush_context, instances):
+    attempts = [instance for instance in session.new if isinstance(instance, LoginAttempt)]
+    if attempts:
+        assign_dimension_ids(session, attempts)
+
+@event.listens_for(Session, 'after_commit')
+def _cache_dimension_ids(session):
+    dimension_cache.commit(session)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_dimension_ids(session):
+    dimension_cache.discard(session)
+
+def query_client_ips(session: Session, network: Optional[str] = None):
+    """Query the distinct client IPs that have login attempts, in address order.
+    
+    Reads the client_ips table instead of scanning every attempt, and a
+    network limits the scan to a range of ix_client_ips_packed.
+    
+    Args:
+        session: A database session
+        network: Only return addresses in this CIDR network
+    
+    Returns:
+        Query yielding one (ip,) row per address
+    
+    Raises:
+        ValueError: If network is not a valid network
+    """
+    query = session.query(ClientIP.value).filter(exists().where(LoginAttempt.client_ip_id == ClientIP.id))
+    if network is not None:
+        query = query.filter(ClientIP.packed.between(*network_bounds(network)))
+    return query.order_by(ClientIP.packed)
+
+def query_attempts_in_network(session: Session, network: str):
+    """Query the login attempts from a CIDR network, newest first.
+    
+    Args:
+        session: A database session
+        network: CIDR notation such as "45.148.10.0/24"
+    
+    Returns:
+        Query yielding LoginAttempt rows
+    
+    Raises:
+        ValueError: If network is not a valid network
+    """
+    first, last = network_bounds(network)
+    addresses = select(ClientIP.id).where(ClientIP.packed.between(first, last))
+    return (session.query(LoginAttempt)
+            .filter(LoginAttempt.client_ip_id.in_(addresses))
+            .order_by(LoginAttempt.timestamp.desc()))
+
+# Rows read per transaction when streaming a whole table
+STREAM_PAGE_SIZE = 5000
+
+def iter_attempt_records(session_factory: Callable, page_size: int = STREAM_PAGE_SIZE) -> Iterator[dict]:
+    """Read every login attempt in id order, one short transaction per page.
+    
+    Pages continue after the last id read instead of using an offset, so
+    each page is an index range scan and attempts inserted meanwhile cannot
+    shift rows between pages. Only attempts committed before the first page
+    are read. Columns are read without building model instances.
+    
+    Args:
+        session_factory: Callable returning a new database session
+        page_size: Attempts per page
+    
+    Returns:
+        Iterator of attempts in the LoginAttempt.to_dict() form
+    """
+    with session_factory() as session:
+        last_id = session.query(func.max(LoginAttempt.id)).scalar() or 0
+    after = 0
+    while after < last_id:
+        with session_factory() as session:
+            page = (session.query(
+                        LoginAttempt.id, LoginAttempt.protocol, LoginAttempt.username, LoginAttempt.password,
+                        LoginAttempt.client_ip, LoginAttempt.timestamp, LoginAttempt.latitude,
+                        LoginAttempt.longitude, LoginAttempt.country, LoginAttempt.city, LoginAttempt.region,
+                        LoginAttempt.hits, LoginAttempt.last_seen
+                    )
+                    .filter(LoginAttempt.id > after, LoginAttempt.id <= last_id)
+                    .order_by(LoginAttempt.id)
+                    .limit(page_size)
+                    .all())
+        if not page:
+            return
+        for row in page:
+            yield {
+                'id': row.id,
+                'protocol': row.protocol.value,
+                'username': row.username,
+                'password': row.password,
+                'client_ip': row.client_ip,
+                'timestamp': row.timestamp.isoformat(),
+                'latitude': row.latitude,
+                'longitude': row.longitude,
+                'country': row.country,
+                'city': row.city,
+                'region': row.region,
+                'hits': row.hits or 1,
+                'last_seen': row.last_seen.isoformat() if row.last_seen else None
+            }
+        after = page[-1].id
+
+def snapshot_client_ips(session_factory: Callable, page_size: int = STREAM_PAGE_SIZE) -> Tuple[int, Iterator[str]]:
+    """Count the client IPs that have login attempts and read them in address order.
+    
+    Addresses are read a page per transaction, continuing after the last
+    packed address read, and only addresses stored before the count are
+    read, so the count matches.
+    
+    Args:
+        session_factory: Callable returning a new database session
+        page_size: Addresses per page
+    
+    Returns:
+        Tuple of (count, iterator of the counted addresses)
+    """
+    with session_factory() as session:
+        last_id = session.query(func.max(ClientIP.id)).scalar() or 0
+        count = query_client_ips(session).filter(ClientIP.id <= last_id).count()
+    
+    def addresses():
+        # Values that are not IP addresses have no packed form and come first
+        with session_factory() as session:
+            unpacked = [value for value, in query_client_ips(session)
+                        .filter(ClientIP.id <= last_id, ClientIP.packed.is_(None))]
+        yield from unpacked
+        after = b''
+        while True:
+            with session_factory() as session:
+                page = (query_client_ips(session)
+                        .add_columns(ClientIP.packed)
+                        .filter(ClientIP.id <= last_id, ClientIP.packed > after)
+                        .limit(page_size)
+                        .all())
+            if not page:
+                return
+            for value, _ in page:
+                yield value
+            after = page[-1][1]
+    
+    return count, addresses()
+
+class ScanProbe(Base):
+    """Model for connections that ended before reaching the protocol handshake."""
+    __tablename__ = 'scan_probes'
+    
+    id = Column(Integer, primary_key=True)
+    protocol = Column(Enum(Protocol), nullable=False)
+    client_ip = Column(String, nullable=False)
+    kind = Column(String, nullable=False)  # empty, silent or non-ssh
+    payload = Column(String, nullable=True)  # First bytes the client sent, escaped
+    timestamp = Column(DateTime(timezone=True),
+                      default=lambda: datetime.now(ZoneInfo("UTC")))
+    
+    def to_dict(self):
+        """Convert the model instance to a dictionary."""
+        return {
+            'id': self.id,
+            'protocol': self.protocol.value,
+            'client_ip': self.client_ip,
+            'kind': self.kind,
+            'payload': self.payload,
+            'timestamp': self.timestamp.isoformat()
+        }
+
+# Rollup tables, kept up to date by the database writer in the same
+# transaction as the attempts they count (see honeypot.database.rollups)
+
+class MinuteRollup(Base):
+    """Login attempts per protocol per UTC minute."""
+    __tablename__ = 'rollup_minute_protocol'
+    
+    minute = Column(String, primary_key=True)  # YYYY-MM-DDTHH:MM
+    protocol = Column(Enum(Protocol), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class CountryDayRollup(Base):
+    """Login attempts per country per UTC day."""
+    __tablename__ = 'rollup_day_country'
+    
+    day = Column(String, primary_key=True)  # YYYY-MM-DD
+    country = Column(String, primary_key=True)  # Empty for unknown locations
+    count = Column(Integer, nullable=False, default=0)
+
+class UsernameRollup(Base):
+    """Login attempts per username and protocol."""
+    __tablename__ = 'rollup_username'
+    
+    username = Column(String, primary_key=True)
+    protocol = Column(Enum(Protocol), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class PasswordRollup(Base):
+    """Login attempts per password."""
+    __tablename__ = 'rollup_password'
+    
+    password = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class IPRollup(Base):
+    """Login attempts per client IP, with first and last sighting."""
+    __tablename__ = 'rollup_ip'
+    
+    client_ip = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    first_seen = Column(DateTime(timezone=True), nullable=False)
+    last_seen = Column(DateTime(timezone=True), nullable=False)
+
+class ArchivedChunk(Base):
+    """A compressed file of login attempts moved out of the database (see honeypot.database.archive)."""
+    __tablename__ = 'archived_chunks'
+    
+    id = Column(Integer, primary_key=True)
+    month = Column(String(7), nullable=False)  # YYYY-MM of the attempts' timestamps
+    path = Column(String, nullable=False, unique=True)  # Relative to ARCHIVE_DIR
+    first_id = Column(Integer, nullable=False)
+    last_id = Column(Integer, nullable=False)
+    rows = Column(Integer, nullable=False)
+    hits = Column(Integer, nullable=False)  # Attempts including counted repeats
+    
+    __table_args__ = (
+        Index('ix_archived_chunks_month', 'month'),
+    )
+
 # Listener functions for the connection pool events
 def connection_checkout(dbapi_connection, connection_record, connection_proxy):
     """Track when a connection is checked out from the pool."""
@@ -94,32 +498,251 @@ def connection_checkin(dbapi_connection, connection_record):
                 del connection_timestamps[connection_id]
             logger.debug(f"Connection checked in: {connection_id}, held for {duration:.2f}s, remaining: {len(active_connections)}")
 
-# Create database engine with thread-safe connection pool and monitoring
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},  # Allow cross-thread usage
-    poolclass=QueuePool,  # Use QueuePool for connection pooling
-    pool_size=20,  # Increase from default of 5
-    max_overflow=30,  # Increase from default of 10
-    pool_timeout=60,  # Increase timeout to 60 seconds
-    pool_pre_ping=True,  # Enable connection health checks
-    pool_recycle=3600,  # Recycle connections after 1 hour
-    echo_pool=False  # Set to True for detailed connection pool logging
-)
+def configure_sqlite_connection(dbapi_connection, read_only: bool = False):
+    """Apply the SQLite connection profile to a new connection.
+    
+    WAL lets readers run alongside the single writer instead of failing
+    with "database is locked", and synchronous=NORMAL syncs at checkpoints
+    rather than on every commit, which is safe in WAL mode.
+    
+    Args:
+        dbapi_connection: The new sqlite3 connection
+        read_only: Whether to refuse writes on this connection
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    if not read_only:
+        cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
 
-# Create thread-safe session factory
+def create_sqlite_engines(url: str, read_pool_size: int = SQLITE_READ_POOL_SIZE) -> Tuple[Engine, Engine]:
+    """Create the writer and reader engines for a SQLite database.
+    
+    SQLite allows one writer at a time, so the writer engine holds a single
+    connection and writes queue for it in the pool instead of contending
+    for the file lock. The web interface reads through a small pool of
+    read-only connections.
+    
+    Args:
+        url: SQLite database URL
+        read_pool_size: Number of read-only connections
+    
+    Returns:
+        Tuple of (writer engine, reader engine)
+    """
+    connect_args = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    writer = create_engine(
+        url,
+        connect_args=connect_args,
+        poolclass=QueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=60,
+        pool_pre_ping=True
+    )
+    event.listen(writer, 'connect', lambda conn, record: configure_sqlite_connection(conn))
+    
+    # Each connection to an in-memory database is a separate database
+    if ':memory:' in url or url.rstrip('/') == 'sqlite:':
+        return writer, writer
+    
+    reader = create_engine(
+        url,
+        connect_args=connect_args,
+        poolclass=QueuePool,
+        pool_size=read_pool_size,
+        max_overflow=0,
+        pool_timeout=60,
+        pool_pre_ping=True,
+        pool_recycle=3600
+    )
+    event.listen(reader, 'connect', lambda conn, record: configure_sqlite_connection(conn, read_only=True))
+    # Nothing connects at import; the writer creates the database and switches
+    # it to WAL when init_db() runs, or before the first reader connects
+    event.listen(reader, 'first_connect', lambda conn, record: writer.connect().close())
+    return writer, reader
+
+if DATABASE_URL.startswith('sqlite'):
+    engine, read_engine = create_sqlite_engines(DATABASE_URL)
+else:
+    # Create database engine with thread-safe connection pool and monitoring
+    engine = create_engine(
+        DATABASE_URL,
+        poolclass=QueuePool,  # Use QueuePool for connection pooling
+        pool_size=20,  # Increase from default of 5
+        max_overflow=30,  # Increase from default of 10
+        pool_timeout=60,  # Increase timeout to 60 seconds
+        pool_pre_ping=True,  # Enable connection health checks
+        pool_recycle=3600,  # Recycle connections after 1 hour
+        echo_pool=False  # Set to True for detailed connection pool logging
+    )
+    read_engine = engine
+
+# Create thread-safe session factories
 SessionLocal = scoped_session(
     sessionmaker(autocommit=False, autoflush=False, bind=engine)
 )
+ReadSessionLocal = scoped_session(
+    sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+)
 
 # Register event listeners for connection monitoring
-from sqlalchemy import event
-event.listen(engine, 'checkout', connection_checkout)
-event.listen(engine, 'checkin', connection_checkin)
+for monitored_engine in {engine, read_engine}:
+    event.listen(monitored_engine, 'checkout', connection_checkout)
+    event.listen(monitored_engine, 'checkin', connection_checkin)
+
+# Statements that move attempts from the text-column table into the dimension tables
+LEGACY_DIMENSION_COPIES = (
+    "INSERT INTO usernames (value) SELECT DISTINCT username FROM login_attempts_legacy",
+    "INSERT INTO passwords (value) SELECT DISTINCT password FROM login_attempts_legacy",
+    "INSERT INTO client_ips (value) SELECT DISTINCT client_ip FROM login_attempts_legacy",
+    "INSERT INTO locations (country, city, region) "
+    "SELECT DISTINCT COALESCE(country, ''), COALESCE(city, ''), COALESCE(region, '') FROM login_attempts_legacy "
+    "WHERE COALESCE(country, '') <> '' OR COALESCE(city, '') <> '' OR COALESCE(region, '') <> ''",
+    "INSERT INTO login_attempts "
+    "(id, protocol, username_id, password_id, client_ip_id, timestamp, latitude, longitude, location_id) "
+    "SELECT a.id, a.protocol, u.id, p.id, c.id, a.timestamp, a.latitude, a.longitude, l.id "
+    "FROM login_attempts_legacy a "
+    "JOIN usernames u ON u.value = a.username "
+    "JOIN passwords p ON p.value = a.password "
+    "JOIN client_ips c ON c.value = a.client_ip "
+    "LEFT JOIN locations l ON l.country = COALESCE(a.country, '') AND l.city = COALESCE(a.city, '') "
+    "AND l.region = COALESCE(a.region, '')",
+)
+
+def migrate_dimensions(bind: Engine):
+    """Convert a login_attempts table with text columns to dimension ids.
+    
+    Older versions stored username, password, client_ip and the location
+    as text on every row. The table is rebuilt in one transaction, which
+    takes a while on large databases, and SQLite files are vacuumed
+    afterwards to give the space back.
+    
+    Args:
+        bind: The engine to migrate
+    """
+    inspector = inspect(bind)
+    if 'login_attempts' not in inspector.get_table_names():
+        return
+    if 'username' not in {column['name'] for column in inspector.get_columns('login_attempts')}:
+        return
+    
+    logger.info("Moving login attempt usernames, passwords, IPs and locations into dimension tables, "
+                "this can take a while on large databases")
+    start = time.time()
+    # The new table reuses the index names
+    legacy_indexes = [index['name'] for index in inspector.get_indexes('login_attempts')]
+    with bind.begin() as connection:
+        for name in legacy_indexes:
+            connection.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+        connection.execute(text("ALTER TABLE login_attempts RENAME TO login_attempts_legacy"))
+        Base.metadata.create_all(bind=connection)
+        for statement in LEGACY_DIMENSION_COPIES:
+            connection.execute(text(statement))
+        connection.execute(text("DROP TABLE login_attempts_legacy"))
+        if bind.dialect.name == 'postgresql':
+            connection.execute(text(
+                "SELECT setval(pg_get_serial_sequence('login_attempts', 'id'), "
+                "COALESCE((SELECT MAX(id) FROM login_attempts), 1))"
+            ))
+    logger.info(f"Moved login attempts into dimension tables in {time.time() - start:.1f}s")
+    
+    if bind.dialect.name == 'sqlite':
+        with bind.connect() as connection:
+            connection.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+        logger.info("Vacuumed the database")
+
+# Addresses packed per transaction when filling in client_ips.packed
+PACK_CHUNK_SIZE = 10000
+
+def migrate_packed_ips(bind: Engine):
+    """Add and fill client_ips.packed on databases created without it.
+    
+    Also packs addresses inserted with plain SQL, such as by
+    migrate_dimensions(). Values that are not IP addresses stay NULL.
+    
+    Args:
+        bind: The engine to migrate
+    """
+    columns = {column['name'] for column in inspect(bind).get_columns('client_ips')}
+    if 'packed' not in columns:
+        column_type = ClientIP.__table__.c.packed.type.compile(dialect=bind.dialect)
+        with bind.begin() as connection:
+            connection.execute(text(f"ALTER TABLE client_ips ADD COLUMN packed {column_type}"))
+    
+    last_id = 0
+    packed = 0
+    while True:
+        with bind.begin() as connection:
+            rows = connection.execute(
+                select(ClientIP.id, ClientIP.value)
+                .where(ClientIP.packed.is_(None), ClientIP.id > last_id)
+                .order_by(ClientIP.id)
+                .limit(PACK_CHUNK_SIZE)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            values = [{'row_id': row.id, 'packed': pack_ip(row.value)} for row in rows]
+            values = [value for value in values if value['packed'] is not None]
+            if values:
+                connection.execute(
+                    ClientIP.__table__.update().where(ClientIP.id == bindparam('row_id')),
+                    values
+                )
+            packed += len(values)
+    if packed:
+        logger.info(f"Packed {packed} client IP addresses")
+
+def migrate_attempt_counters(bind: Engine):
+    """Add login_attempts.hits and last_seen to databases created without them.
+    
+    Existing rows each count as one attempt.
+    
+    Args:
+        bind: The engine to migrate
+    """
+    columns = {column['name'] for column in inspect(bind).get_columns('login_attempts')}
+    with bind.begin() as connection:
+        if 'hits' not in columns:
+            connection.execute(text("ALTER TABLE login_attempts ADD COLUMN hits INTEGER DEFAULT 1 NOT NULL"))
+            logger.info("Added hit counter to login attempts")
+        if 'last_seen' not in columns:
+            column_type = LoginAttempt.__table__.c.last_seen.type.compile(dialect=bind.dialect)
+            connection.execute(text(f"ALTER TABLE login_attempts ADD COLUMN last_seen {column_type}"))
+
+def migrate_indexes(bind: Engine):
+    """Create the model indexes missing from existing tables.
+    
+    create_all only adds indexes together with new tables, so databases
+    created by older versions are brought up to date here, in place.
+    
+    Args:
+        bind: The engine to migrate
+    """
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            logger.info(f"Creating index {index.name}, this can take a while on large databases")
+            start = time.time()
+            index.create(bind=bind, checkfirst=True)
+            logger.info(f"Created index {index.name} in {time.time() - start:.1f}s")
 
 def init_db():
-    """Initialize the database by creating all tables."""
+    """Initialize the database by creating all tables and indexes."""
     Base.metadata.create_all(bind=engine)
+    migrate_dimensions(engine)
+    migrate_attempt_counters(engine)
+    migrate_packed_ips(engine)
+    migrate_indexes(engine)
 
 def get_db():
     """Get a database session."""
@@ -130,6 +753,15 @@ def get_db():
         db.close()
         SessionLocal.remove()
 
+def get_read_db():
+    """Get a read-only database session for queries from the web interface."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        ReadSessionLocal.remove()
+
 def get_connection_stats():
     """Get statistics about the database connection pool."""
     stats = {
@@ -138,6 +770,7 @@ def get_connection_stats():
         'pool_overflow': engine.pool.overflow(),
         'pool_checked_out': engine.pool.checkedout(),
         'pool_checkedin': engine.pool.checkedin(),
+        'read_pool_checked_out': read_engine.pool.checkedout(),
     }
     
     # Find connections that may be leaking
@@ -0,0 +1,285 @@
+"""Pre-aggregated counts for the dashboard.
+
+Rebuild them from login_attempts with:
+
+    python -m honeypot.database.rollups --rebuild
+"""
+import argparse
+import logging
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from honeypot.database.dimensions import dialect_insert
+from honeypot.database.models import (
+    LoginAttempt, MinuteRollup, CountryDayRollup, UsernameRollup, PasswordRollup, IPRollup
+)
+
+logger = logging.getLogger(__name__)
+
+# Rollup tables, in the order they are cleared and rebuilt
+ROLLUP_MODELS = (MinuteRollup, CountryDayRollup, UsernameRollup, PasswordRollup, IPRollup)
+
+# Attempts read per chunk when rebuilding
+REBUILD_CHUNK_SIZE = 10000
+
+# Bucket formats; the strings sort chronologically
+MINUTE_FORMAT = '%Y-%m-%dT%H:%M'
+DAY_FORMAT = '%Y-%m-%d'
+
+def _is_postgresql(session: Session) -> bool:
+    return session.get_bind().dialect.name == 'postgresql'
+
+def _add_counts(session: Session, model, keys: List[str], counts: Counter):
+    """Add counts to a rollup table, creating missing rows."""
+    if not counts:
+        return
+    rows = [dict(zip(keys, key if isinstance(key, tuple) else (key,)), count=count)
+            for key, count in counts.items()]
+    statement = dialect_insert(session, model)
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=keys, set_={'count': model.count + statement.excluded.count}
+        ),
+        rows
+    )
+
+def _update_ip_rollup(session: Session, sightings: Dict[str, list]):
+    """Add counts to the per-IP rollup and widen its first and last seen times."""
+    if not sightings:
+        return
+    # SQLite's two-argument min()/max() are PostgreSQL's least()/greatest()
+    earliest, latest = (func.least, func.greatest) if _is_postgresql(session) else (func.min, func.max)
+    statement = dialect_insert(session, IPRollup)
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=['client_ip'],
+            set_={
+                'count': IPRollup.count + statement.excluded.count,
+                'first_seen': earliest(IPRollup.first_seen, statement.excluded.first_seen),
+                'last_seen': latest(IPRollup.last_seen, statement.excluded.last_seen),
+            }
+        ),
+        [{'client_ip': ip, 'count': count, 'first_seen': first, 'last_seen': last}
+         for ip, (count, first, last) in sightings.items()]
+    )
+
+def update_rollups(session: Session, rows: Iterable):
+    """Count a batch of new rows into the rollup tables.
+
+    Must be called in the transaction that inserts the rows. Rows other
+    than login attempts are ignored. Each attempt counts hits times, all
+    in the minute and day of its first sighting, so repeats added to an
+    existing attempt are counted by passing an unsaved LoginAttempt with
+    the same values and hits set to the number of new repeats.
+
+    Args:
+        session: The session inserting the rows
+        rows: The new model instances
+    """
+    minutes: Counter = Counter()
+    countries: Counter = Counter()
+    usernames: Counter = Counter()
+    passwords: Counter = Counter()
+    sightings: Dict[str, list] = {}
+
+    for row in rows:
+        if not isinstance(row, LoginAttempt):
+            continue
+        timestamp = row.timestamp
+        last_seen = row.last_seen or timestamp
+        hits = row.hits or 1
+        minutes[(timestamp.strftime(MINUTE_FORMAT), row.protocol)] += hits
+        countries[(timestamp.strftime(DAY_FORMAT), row.country or '')] += hits
+        usernames[(row.username, row.protocol)] += hits
+        passwords[row.password] += hits
+        seen = sightings.get(row.client_ip)
+        if seen is None:
+            sightings[row.client_ip] = [hits, timestamp, last_seen]
+        else:
+            seen[0] += hits
+            seen[1] = min(seen[1], timestamp)
+            seen[2] = max(seen[2], last_seen)
+
+    _add_counts(session, MinuteRollup, ['minute', 'protocol'], minutes)
+    _add_counts(session, CountryDayRollup, ['day', 'country'], countries)
+    _add_counts(session, UsernameRollup, ['username', 'protocol'], usernames)
+    _add_counts(session, PasswordRollup, ['password'], passwords)
+    _update_ip_rollup(session, sightings)
+
+def move_country_counts(session: Session, moves: Counter):
+    """Move attempts counted under no country to the country they were since located in.
+
+    Must be called in the transaction that fills in the attempts' locations.
+
+    Args:
+        session: The session updating the attempts
+        moves: Hits to move, by (day, country) with the day in DAY_FORMAT
+    """
+    counts: Counter = Counter()
+    for (day, country), hits in moves.items():
+        if country:
+            counts[(day, country)] += hits
+            counts[(day, '')] -= hits
+    if not counts:
+        return
+    _add_counts(session, CountryDayRollup, ['day', 'country'], counts)
+    # Days left with nothing unlocated lose their row, as if it was never counted
+    session.query(CountryDayRollup).filter(
+        CountryDayRollup.country == '',
+        CountryDayRollup.day.in_({day for day, _ in counts}),
+        CountryDayRollup.count <= 0
+    ).delete(synchronize_session=False)
+
+def rebuild_rollups(session: Session, archived: Iterable = ()) -> int:
+    """Recompute every rollup table from login_attempts.
+
+    Runs in one transaction, so the dashboard keeps seeing the old counts
+    until the rebuild commits. Stop the honeypot, or accept that attempts
+    written during the rebuild may be counted twice.
+
+    Args:
+        session: A session on the writer engine
+        archived: Unsaved LoginAttempts moved out of login_attempts, counted too
+
+    Returns:
+        The number of attempts counted
+    """
+    for model in ROLLUP_MODELS:
+        session.query(model).delete()
+
+    total = 0
+    chunk = []
+    for attempt in archived:
+        chunk.append(attempt)
+        if len(chunk) == REBUILD_CHUNK_SIZE:
+            update_rollups(session, chunk)
+            total += len(chunk)
+            chunk = []
+    update_rollups(session, chunk)
+    total += len(chunk)
+    if total:
+        logger.info(f"Counted {total} archived attempts into the rollup tables")
+
+    last_id = 0
+    while True:
+        chunk = (session.query(LoginAttempt)
+                 .filter(LoginAttempt.id > last_id)
+                 .order_by(LoginAttempt.id)
+                 .limit(REBUILD_CHUNK_SIZE)
+                 .all())
+        if not chunk:
+            break
+        update_rollups(session, chunk)
+        total += len(chunk)
+        last_id = chunk[-1].id
+        session.expunge_all()
+        logger.info(f"Counted {total} attempts into the rollup tables")
+
+    session.commit()
+    return total
+
+def _since_minute(since: Optional[datetime]) -> str:
+    return since.strftime(MINUTE_FORMAT) if since else ''
+
+def get_timeline(session: Session, since: Optional[datetime] = None, bucket: str = 'minute') -> List[Dict]:
+    """Get attempts per protocol per time bucket.
+
+    Args:
+        session: A database session
+        since: Only count attempts from this UTC time on
+        bucket: 'minute', 'hour' or 'day'
+
+    Returns:
+        List of {'bucket', 'protocol', 'count'} dicts in chronological order
+
+    Raises:
+        ValueError: If bucket is not supported
+    """
+    lengths = {'minute': 16, 'hour': 13, 'day': 10}
+    if bucket not in lengths:
+        raise ValueError(f"Unsupported bucket: {bucket}")
+    label = func.substr(MinuteRollup.minute, 1, lengths[bucket])
+    rows = (session.query(label, MinuteRollup.protocol, func.sum(MinuteRollup.count))
+            .filter(MinuteRollup.minute >= _since_minute(since))
+            .group_by(label, MinuteRollup.protocol)
+            .order_by(label)
+            .all())
+    return [{'bucket': b, 'protocol': protocol.value, 'count': count} for b, protocol, count in rows]
+
+def get_top(session: Session, dimension: str, limit: int = 10, since: Optional[datetime] = None) -> List[Dict]:
+    """Get the most frequent values of a dimension.
+
+    Usernames are broken down by protocol, like the dashboard's username
+    chart. Countries can be limited to recent days; the other dimensions
+    are all-time counts.
+
+    Args:
+        session: A database session
+        dimension: 'username', 'password', 'ip' or 'country'
+        limit: Maximum number of values
+        since: For countries, only count days from this UTC time on
+
+    Returns:
+        List of {'value', 'count'} dicts, most frequent first, with a 'protocols' breakdown for usernames
+
+    Raises:
+        ValueError: If dimension is not supported
+    """
+    if dimension == 'username':
+        total = func.sum(UsernameRollup.count).label('total')
+        top = (session.query(UsernameRollup.username, total)
+               .group_by(UsernameRollup.username)
+               .order_by(total.desc())
+               .limit(limit)
+               .all())
+        names = [username for username, _ in top]
+        breakdown: Dict[str, Dict[str, int]] = {name: {} for name in names}
+        if names:
+            for username, protocol, count in (session.query(UsernameRollup.username, UsernameRollup.protocol,
+                                                            UsernameRollup.count)
+                                              .filter(UsernameRollup.username.in_(names))):
+                breakdown[username][protocol.value] = count
+        return [{'value': name, 'count': count, 'protocols': breakdown[name]} for name, count in top]
+
+    if dimension == 'country':
+        total = func.sum(CountryDayRollup.count).label('total')
+        query = session.query(CountryDayRollup.country, total).filter(CountryDayRollup.country != '')
+        if since:
+            query = query.filter(CountryDayRollup.day >= since.strftime(DAY_FORMAT))
+        rows = query.group_by(CountryDayRollup.country).order_by(total.desc()).limit(limit).all()
+        return [{'value': country, 'count': count} for country, count in rows]
+
+    columns = {'password': (PasswordRollup.password, PasswordRollup.count),
+               'ip': (IPRollup.client_ip, IPRollup.count)}
+    if dimension not in columns:
+        raise ValueError(f"Unsupported dimension: {dimension}")
+    value, count = columns[dimension]
+    rows = session.query(value, count).order_by(count.desc()).limit(limit).all()
+    return [{'value': v, 'count': c} for v, c in rows]
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the dashboard rollup tables")
+    parser.add_argument('--rebuild', action='store_true', help='Recompute all rollups from login_attempts')
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+        return
+
+    from honeypot.database.archive import attempt_archiver, attempt_from_record
+    from honeypot.database.models import SessionLocal, init_db
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    init_db()
+    start = time.time()
+    session = SessionLocal()
+    try:
+        archived = (attempt_from_record(record) for record in attempt_archiver.iter_attempts(session))
+        total = rebuild_rollups(session, archived)
+    finally:
+        session.close()
+    logger.info(f"Rebuilt rollups from {total} attempts in {time.time() - start:.1f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+"""Write-behind queue that commits database inserts in batches on one thread."""
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+from sqlalchemy.orm import sessionmaker
+from honeypot.core.config import DEDUP_WINDOW, WRITE_BATCH_SIZE, WRITE_BATCH_WINDOW_MS, WRITE_QUEUE_SIZE
+from honeypot.database.dedup import AttemptDeduplicator
+from honeypot.database.enrichment import AttemptEnricher
+from honeypot.database.models import engine
+from honeypot.database.rollups import update_rollups
+
+logger = logging.getLogger(__name__)
+
+# Seconds a handler waits for room in a full queue before the row is dropped
+ENQUEUE_TIMEOUT = 1.0
+
+# Attempts at committing a batch before its rows are dropped
+COMMIT_ATTEMPTS = 2
+
+class AttemptWriter:
+    """Batches inserts from many threads into group commits on one thread."""
+
+    def __init__(
+        self,
+        session_factory: Callable,
+        batch_size: int = WRITE_BATCH_SIZE,
+        batch_window: float = WRITE_BATCH_WINDOW_MS / 1000,
+        max_queue: int = WRITE_QUEUE_SIZE
+    ):
+        """Initialize the writer and start its thread.
+
+        Args:
+            session_factory: Callable returning a new database session
+            batch_size: Maximum rows per commit
+            batch_window: Maximum seconds a row waits for its batch to fill
+            max_queue: Maximum rows waiting to be written
+        """
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.listeners: List[Callable[[list], None]] = []
+        self.transaction_hooks: List[Callable[[Any, list], None]] = []
+        self.stats_lock = threading.Lock()
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.batches = 0
+        self.last_commit_ms = 0.0
+        self.max_commit_ms = 0.0
+        self.total_commit_ms = 0.0
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="DB-Writer", daemon=True)
+        self._thread.start()
+        logger.info(f"Database writer started with batch_size={batch_size}, "
+                    f"batch_window={batch_window * 1000:.0f}ms, max_queue={max_queue}")
+
+    def add_listener(self, listener: Callable[[list], None]):
+        """Register a function called with each committed batch of rows.
+
+        Listeners run on the writer thread and must hand slow work elsewhere.
+
+        Args:
+            listener: Function called with the list of committed model instances
+        """
+        self.listeners.append(listener)
+
+    def add_transaction_hook(self, hook: Callable[[Any, list], None]):
+        """Register a function called with each batch before it is committed.
+
+        Hooks run inside the batch's transaction, so whatever they write is
+        committed together with the rows, and an exception in a hook rolls
+        the whole batch back.
+
+        Args:
+            hook: Function called with the session and the list of new model instances
+        """
+        self.transaction_hooks.append(hook)
+
+    def write(self, model: Type, **values: Any) -> bool:
+        """Queue a row for insertion.
+
+        Blocks for up to ENQUEUE_TIMEOUT when the queue is full, so a
+        database that falls behind slows the handlers down before rows are
+        dropped.
+
+        Args:
+            model: The model class to insert
+            **values: Column values for the new row
+
+        Returns:
+            True if the row was queued, False if it was dropped
+        """
+        if self._stopping.is_set():
+            logger.warning(f"Database writer is stopped, dropping {model.__name__} row")
+            return False
+        try:
+            self.queue.put((model, values), timeout=ENQUEUE_TIMEOUT)
+            return True
+        except queue.Full:
+            with self.stats_lock:
+                self.rows_dropped += 1
+            logger.error(f"Database write queue full, dropping {model.__name__} row")
+            return False
+
+    def request_batch(self):
+        """Make the writer run a batch, and so its transaction hooks, even if no rows are queued.
+
+        Used by hooks that have their own work to write. Does nothing when
+        the queue is full, since batches are then coming anyway.
+        """
+        try:
+            self.queue.put_nowait((None, None))
+        except queue.Full:
+            pass
+
+    def _next_batch(self) -> list:
+        """Wait for the next batch of queued rows.
+
+        Returns:
+            Up to batch_size (model, values) pairs, with (None, None) for requested
+            batches, or an empty list once stopped and drained
+        """
+        batch = []
+        while not batch:
+            try:
+                batch.append(self.queue.get(timeout=0.5))
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return []
+
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, batch: list, attempts: int = COMMIT_ATTEMPTS) -> Optional[list]:
+        """Insert a batch in one transaction.
+
+        Args:
+            batch: (model, values) pairs
+            attempts: Attempts at committing before giving up
+
+        Returns:
+            The committed model instances, or None if the batch could not be written
+        """
+        for attempt in range(1, attempts + 1):
+            session = self.session_factory()
+            try:
+                rows = [model(**values) for model, values in batch if model is not None]
+                session.add_all(rows)
+                if self.transaction_hooks:
+                    # Fill in ids and column defaults for the hooks
+                    session.flush()
+                for hook in self.transaction_hooks:
+                    hook(session, rows)
+                session.commit()
+                return rows
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Failed to commit {len(batch)} rows (attempt {attempt}/{attempts}): {str(e)}")
+            finally:
+                session.close()
+        return None
+
+    def _commit_split(self, batch: list) -> Tuple[list, int]:
+        """Insert a batch, halving it until the rows that cannot be written are singled out.
+
+        Returns:
+            The committed model instances, and the number of rows dropped
+        """
+        rows = self._commit(batch)
+        if rows is not None:
+            return rows, 0
+
+        committed, dropped = [], 0
+        failed = [[(model, values) for model, values in batch if model is not None]]
+        while failed:
+            part = failed.pop()
+            if len(part) == 1:
+                logger.error(f"Dropping {part[0][0].__name__} row that cannot be written: {part[0][1]}")
+                dropped += 1
+                continue
+            # Halves are tried once, since the whole batch already failed every attempt
+            for half in (part[:len(part) // 2], part[len(part) // 2:]):
+                rows = self._commit(half, attempts=1) if half else []
+                if rows is None:
+                    failed.append(half)
+                else:
+                    committed.extend(rows)
+        return committed, dropped
+
+    def _run(self):
+        """Drain the queue until stopped."""
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+
+            start = time.perf_counter()
+            rows, dropped = self._commit_split(batch)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            with self.stats_lock:
+                self.batches += 1
+                self.last_commit_ms = elapsed_ms
+                self.max_commit_ms = max(self.max_commit_ms, elapsed_ms)
+                self.total_commit_ms += elapsed_ms
+                self.rows_dropped += dropped
+                self.rows_written += len(rows)
+            for _ in batch:
+                self.queue.task_done()
+
+            if rows:
+                for listener in self.listeners:
+                    try:
+                        listener(rows)
+                    except Exception as e:
+                        logger.error(f"Error in database writer listener: {str(e)}")
+
+    def flush(self):
+        """Block until every row queued so far has been written or dropped."""
+        self.queue.join()
+
+    def stop(self, timeout: float = 10.0):
+        """Write the rows still queued and stop the writer thread.
+
+        Args:
+            timeout: Maximum seconds to wait for the queue to drain
+        """
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"Database writer stopped with {self.queue.qsize()} rows unwritten")
+        else:
+            logger.info("Database writer flushed and stopped")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue and commit statistics.
+
+        Returns:
+            Dictionary with the queue depth and capacity, row and batch counts, and commit latency in milliseconds
+        """
+        with self.stats_lock:
+            return {
+                'queue_depth': self.queue.qsize(),
+                'queue_capacity': self.queue.maxsize,
+                'rows_written': self.rows_written,
+                'rows_dropped': self.rows_dropped,
+                'batches': self.batches,
+                'avg_batch_size': round(self.rows_written / self.batches, 1) if self.batches else 0,
+                'last_commit_ms': round(self.last_commit_ms, 2),
+                'avg_commit_ms': round(self.total_commit_ms / self.batches, 2) if self.batches else 0,
+                'max_commit_ms': round(self.max_commit_ms, 2),
+            }
+
+# Rows keep their ids and column values after commit, for the listeners
+WriterSession = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+# Global writer instance
+attempt_writer = AttemptWriter(WriterSession)
+
+# Keep the dashboard rollups in step with the attempts they count
+attempt_writer.add_transaction_hook(update_rollups)
+
+# Count repeated identical attempts on their first row, when DEDUP_WINDOW is set
+attempt_deduplicator = AttemptDeduplicator(DEDUP_WINDOW, attempt_writer.request_batch)
+attempt_writer.add_transaction_hook(attempt_deduplicator.apply)
+
+# Fill in locations looked up after their attempts were stored, after the rows and repeats are counted
+attempt_enricher = AttemptEnricher(attempt_writer.request_batch)
+attempt_writer.add_transaction_hook(attempt_enricher.apply)
+attempt_enricher.add_listener(attempt_deduplicator.relocate)
+
+# Write what is still queued when the interpreter exits
+atexit.register(attempt_writer.stop)
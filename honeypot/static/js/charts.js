@@ -374,7 +374,7 @@ function updateUsernameChart(filteredAttempts) {
         if (!usernameData[attempt.username]) {
             usernameData[attempt.username] = { ssh: 0, telnet: 0, ftp: 0, smtp: 0, rdp: 0, sip: 0, mysql: 0 };
         }
-        usernameData[attempt.username][attempt.protocol]++;
+        usernameData[attempt.username][attempt.protocol] += attemptUtils.hits(attempt);
     });
 
     const topUsernames = Object.entries(usernameData)
@@ -1802,6 +1802,8 @@ const uiManager = (function() {
         const passwordDisplay = attempt.protocol === 'rdp' ? '[Password Unavailable]' : 
                               (attempt.password ? attempt.password : '[Password Null]');
 
+        const hits = attemptUtils.hits(attempt);
+
         const isSelected = window.singleAttackMode && window.currentSingleAttack && 
                          window.currentSingleAttack.id === attempt.id;
 
@@ -1826,6 +1828,7 @@ const uiManager = (function() {
                 </div>
                 <div class="text-gray-600 mt-2">
                     <div class="break-all">Password: ${passwordDisplay}</div>
+                    ${hits > 1 ? `<div class="text-sm mt-1">Repeated ×${hits}, last at ${formatUtils.formatDateToLocalTime(attempt.last_seen)}</div>` : ''}
                     ${location ? `<div class="text-sm mt-1">Location: ${location}</div>` : ''}
                 </div>
             </div>
@@ -2386,7 +2389,7 @@ const websocketManager = (function() {
             // Add new attempt to the beginning of the array
             attempts.unshift(newAttempt);
             
-            uiManager.updateCounterWithAnimation('totalAttempts', attempts.length);
+            uiManager.updateCounterWithAnimation('totalAttempts', attemptUtils.totalHits(attempts));
             
             // Only update unique attackers if this is a new IP
             if (isNewAttacker) {
@@ -2420,6 +2423,56 @@ const websocketManager = (function() {
             }
         },
         
+        attempt_hits: function(data) {
+            // Repeats of stored attempts, counted by the server instead of sent one by one
+            const totals = new Map(data.map(total => [total.id, total]));
+            for (const attempt of attempts) {
+                const total = totals.get(attempt.id);
+                if (total) {
+                    attempt.hits = total.hits;
+                    attempt.last_seen = total.last_seen;
+                    totals.delete(attempt.id);
+                    if (totals.size === 0) break;
+                }
+            }
+            
+            uiManager.updateCounterWithAnimation('totalAttempts', attemptUtils.totalHits(attempts));
+            if (!window.singleAttackMode) {
+                uiManager.updateUI(true);
+            }
+        },
+        
+        attempt_enriched: function(data) {
+            // Locations looked up after the attempts were stored and broadcast without one
+            const locations = new Map(data.map(location => [location.id, location]));
+            const located = [];
+            for (const attempt of attempts) {
+                const location = locations.get(attempt.id);
+                if (location) {
+                    attempt.latitude = location.latitude;
+                    attempt.longitude = location.longitude;
+                    attempt.country = location.country;
+                    attempt.city = location.city;
+                    attempt.region = location.region;
+                    located.push(attempt);
+                    locations.delete(attempt.id);
+                    if (locations.size === 0) break;
+                }
+            }
+            if (located.length === 0 || window.singleAttackMode) {
+                return;
+            }
+            
+            for (const attempt of located) {
+                try {
+                    updateMap(attempt);
+                } catch (error) {
+                    console.warn("Error updating map with located attempt:", error);
+                }
+            }
+            uiManager.updateUI(true);
+        },
+        
         batch_start: function(data) {
             console.log('Starting batch data transfer', data);
             isReceivingBatches = true;
@@ -2588,7 +2641,7 @@ const websocketManager = (function() {
             if (attempts.length > 0) {
                 console.log(`Processing ${attempts.length} login attempts`);
                 // Initialize the counters with animation
-                uiManager.updateCounterWithAnimation('totalAttempts', attempts.length);
+                uiManager.updateCounterWithAnimation('totalAttempts', attemptUtils.totalHits(attempts));
                 uiManager.updateUniqueAttackersCount();
                 
                 // Initialize UI with the data
@@ -2643,7 +2696,7 @@ const websocketManager = (function() {
             // Update loading progress
             uiManager.updateLoadingPercentageWithDelay(70).then(() => {
                 // Initialize the counters with animation
-                uiManager.updateCounterWithAnimation('totalAttempts', attempts.length);
+                uiManager.updateCounterWithAnimation('totalAttempts', attemptUtils.totalHits(attempts));
                 uiManager.updateUniqueAttackersCount();
                 
                 return uiManager.updateLoadingPercentageWithDelay(90);
@@ -3156,7 +3209,7 @@ const websocketManager = (function() {
         
         uiManager.updateLoadingPercentageWithDelay(70).then(() => {
             // Initialize the counters with animation
-            uiManager.updateCounterWithAnimation('totalAttempts', attempts.length);
+            uiManager.updateCounterWithAnimation('totalAttempts', attemptUtils.totalHits(attempts));
             uiManager.updateUniqueAttackersCount();
             
             // Keep the same message format and similar length for consistency
@@ -3552,6 +3605,14 @@ const init = (function() {
             });
         }
 
+        const exportNftablesButton = domUtils.getElement('exportNftables');
+        if (exportNftablesButton) {
+            exportNftablesButton.addEventListener('click', () => {
+                menuUtils.hideMenu(exportDataModal);
+                window.open('/api/export/nftables', '_blank');
+            });
+        }
+
         const exportCiscoButton = domUtils.getElement('exportCisco');
         if (exportCiscoButton) {
             exportCiscoButton.addEventListener('click', () => {
@@ -115,6 +115,12 @@ function processSystemMetrics(data) {
             animationUtils.updateElementWithAnimation('load1min', data.load['1min'].toFixed(2));
             animationUtils.updateElementWithAnimation('load5min', data.load['5min'].toFixed(2));
         }
+        
+        // Update honeypot admission queue
+        if (data.honeypot) {
+            animationUtils.updateElementWithAnimation('queueDepth', `${data.honeypot.queue_depth}/${data.honeypot.queue_capacity}`);
+            animationUtils.updateElementWithAnimation('queueShed', data.honeypot.shed_total.toString());
+        }
     } catch (error) {
         console.error('Error processing system metrics:', error);
     }
@@ -224,6 +224,23 @@ const formatUtils = {
     }
 };
 
+// Login attempt counting utilities
+const attemptUtils = {
+    // Number of attempts a record stands for; repeats within the dedup window are counted on one record
+    hits: function(attempt) {
+        return attempt.hits || 1;
+    },
+
+    // Total number of attempts in a list of records
+    totalHits: function(attempts) {
+        let total = 0;
+        for (const attempt of attempts) {
+            total += attempt.hits || 1;
+        }
+        return total;
+    }
+};
+
 // UI animation utilities
 const animationUtils = {
     // Function to update element with animation
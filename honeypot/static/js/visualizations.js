@@ -152,7 +152,7 @@ function updateLastHourData(sortedAttempts, now, timeLabels, sshData, telnetData
         if (minutesAgo <= 60) {
             const intervalIndex = Math.floor((60 - minutesAgo) / 5);
             if (intervalIndex >= 0 && intervalIndex < intervals) {
-                incrementProtocolData(attempt.protocol, intervalIndex, sshData, telnetData, ftpData, smtpData, rdpData, sipData, mysqlData);
+                incrementProtocolData(attempt.protocol, intervalIndex, sshData, telnetData, ftpData, smtpData, rdpData, sipData, mysqlData, attemptUtils.hits(attempt));
             }
         }
     });
@@ -183,7 +183,7 @@ function updateTodayData(sortedAttempts, now, timeLabels, sshData, telnetData, f
         const date = new Date(attempt.timestamp + 'Z');
         if (date.toLocaleDateString() === now.toLocaleDateString()) {
             const hour = date.getHours();
-            incrementProtocolData(attempt.protocol, hour, sshData, telnetData, ftpData, smtpData, rdpData, sipData, mysqlData);
+            incrementProtocolData(attempt.protocol, hour, sshData, telnetData, ftpData, smtpData, rdpData, sipData, mysqlData, attemptUtils.hits(attempt));
         }
     });
 }
@@ -215,7 +215,7 @@ function updateThisWeekData(sortedAttempts, now, timeLabels, sshData, telnetData
         const daysAgo = Math.floor((now - date) / (1000 * 60 * 60 * 24));
         if (daysAgo < 7) {
             const dayIndex = 6 - daysAgo;
-            incrementProtocolData(attempt.protocol, dayIndex, sshData, telnetData, ftpData, smtpData, rdpData, sipData, mysqlData);
+            incrementProtocolData(attempt.protocol, dayIndex, sshData, telnetData, ftpData, smtpData, rdpData, sipData, mysqlData, attemptUtils.hits(attempt));
         }
     });
 }
@@ -331,33 +331,33 @@ function updateAllTimeData(sortedAttempts, now, timeLabels, sshData, telnetData,
         const date = new Date(attempt.timestamp + 'Z');
         const intervalIndex = Math.floor((date - startDate) / (intervalSize * 60 * 60 * 1000));
         if (intervalIndex >= 0 && intervalIndex < totalIntervals) {
-            incrementProtocolData(attempt.protocol, intervalIndex, sshData, telnetData, ftpData, smtpData, rdpData, sipData, mysqlData);
+            incrementProtocolData(attempt.protocol, intervalIndex, sshData, telnetData, ftpData, smtpData, rdpData, sipData, mysqlData, attemptUtils.hits(attempt));
         }
     });
 }
 
-function incrementProtocolData(protocol, index, sshData, telnetData, ftpData, smtpData, rdpData, sipData, mysqlData) {
+function incrementProtocolData(protocol, index, sshData, telnetData, ftpData, smtpData, rdpData, sipData, mysqlData, hits = 1) {
     switch (protocol) {
         case 'ssh':
-            sshData[index]++;
+            sshData[index] += hits;
             break;
         case 'telnet':
-            telnetData[index]++;
+            telnetData[index] += hits;
             break;
         case 'ftp':
-            ftpData[index]++;
+            ftpData[index] += hits;
             break;
         case 'smtp':
-            smtpData[index]++;
+            smtpData[index] += hits;
             break;
         case 'rdp':
-            rdpData[index]++;
+            rdpData[index] += hits;
             break;
         case 'sip':
-            sipData[index]++;
+            sipData[index] += hits;
             break;
         case 'mysql':
-            mysqlData[index]++;
+            mysqlData[index] += hits;
             break;
     }
 }
@@ -390,7 +390,7 @@ function updateUsernameChart(filteredAttempts) {
         if (!protocolData[attempt.protocol][username]) {
             protocolData[attempt.protocol][username] = 0;
         }
-        protocolData[attempt.protocol][username]++;
+        protocolData[attempt.protocol][username] += attemptUtils.hits(attempt);
     });
     
     // Get top 10 usernames overall
@@ -440,7 +440,7 @@ function updateIPChart(filteredAttempts) {
     const ipCount = {};
     
     filteredAttempts.forEach(attempt => {
-        ipCount[attempt.client_ip] = (ipCount[attempt.client_ip] || 0) + 1;
+        ipCount[attempt.client_ip] = (ipCount[attempt.client_ip] || 0) + attemptUtils.hits(attempt);
     });
     
     const topIPs = Object.entries(ipCount)
@@ -457,7 +457,7 @@ function updateCountryChart(filteredAttempts) {
     
     filteredAttempts.forEach(attempt => {
         if (attempt.country) {
-            countryCount[attempt.country] = (countryCount[attempt.country] || 0) + 1;
+            countryCount[attempt.country] = (countryCount[attempt.country] || 0) + attemptUtils.hits(attempt);
         }
     });
     
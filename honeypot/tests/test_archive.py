@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from honeypot.database.archive import AttemptArchiver, attempt_from_record
+from honeypot.database.models import ArchivedChunk, Base, LoginAttempt, Protocol
+from honeypot.database.rollups import ROLLUP_MODELS, rebuild_rollups, update_rollups
+
+NOW = datetime(2024, 6, 20, 12, 0, tzinfo=ZoneInfo("UTC"))
+
+class TestAttemptArchiver(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.archive_dir = Path(self.directory.name) / 'archive'
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.directory.name, 'test.db')}")
+        Base.metadata.create_all(self.engine)
+        self.sessions = sessionmaker(bind=self.engine, expire_on_commit=False)
+
+        # Six attempts a day from April 1st up to NOW
+        with self.sessions() as session:
+            day = datetime(2024, 4, 1, tzinfo=ZoneInfo("UTC"))
+            attempts = []
+            while day < NOW:
+                for i in range(6):
+                    attempts.append(LoginAttempt(
+                        protocol=(Protocol.SSH, Protocol.FTP)[i % 2], username=f"user{i}", password="secret",
+                        client_ip=f"192.0.2.{i}", country="FR" if i % 3 else None,
+                        timestamp=day + timedelta(hours=i), hits=i + 1
+                    ))
+                day += timedelta(days=1)
+            session.add_all(attempts)
+            update_rollups(session, attempts)
+            session.commit()
+        self.total = len(attempts)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def archiver(self, after_days: int, retention_days: int = 0) -> AttemptArchiver:
+        return AttemptArchiver(self.sessions, str(self.archive_dir), after_days, retention_days, chunk_size=50)
+
+    def rollup_snapshot(self, session) -> dict:
+        return {
+            model.__tablename__: sorted(
+                tuple(str(getattr(row, column.name)) for column in model.__table__.columns)
+                for row in session.query(model)
+            )
+            for model in ROLLUP_MODELS
+        }
+
+    def months(self) -> dict:
+        with self.sessions() as session:
+            return {month: count for month, count in session.query(ArchivedChunk.month, ArchivedChunk.rows)}
+
+    def test_archive_and_read_back(self):
+        """Test that old attempts move to compacted monthly files that read back unchanged."""
+        with self.sessions() as session:
+            expected = [row.to_dict() for row in session.query(LoginAttempt)
+                        .filter(LoginAttempt.timestamp < NOW - timedelta(days=10)).order_by(LoginAttempt.id)]
+
+        result = self.archiver(10).run(now=NOW)
+        self.assertEqual(result, {'archived': len(expected), 'compacted': 2, 'expired': 0})
+        # April and May are complete and were compacted into one file each
+        self.assertEqual(len(list((self.archive_dir / '2024-04').iterdir())), 1)
+        self.assertEqual(self.months()['2024-04'], 30 * 6)
+        self.assertEqual(len(list((self.archive_dir / '2024-05').iterdir())), 1)
+
+        with self.sessions() as session:
+            self.assertEqual(session.query(LoginAttempt).count(), self.total - len(expected))
+            self.assertEqual(list(self.archiver(10).iter_attempts(session)), expected)
+
+            # Rollups rebuilt from the database and the archive keep every attempt
+            counts = self.rollup_snapshot(session)
+            archived = (attempt_from_record(record) for record in self.archiver(10).iter_attempts(session))
+            self.assertEqual(rebuild_rollups(session, archived), self.total)
+            self.assertEqual(self.rollup_snapshot(session), counts)
+
+        # A second run has nothing left to move
+        self.assertEqual(self.archiver(10).run(now=NOW), {'archived': 0, 'compacted': 0, 'expired': 0})
+
+    def test_retention_deletes_files(self):
+        """Test that expired months are dropped with their files and orphans are removed."""
+        self.archiver(10).run(now=NOW)
+        orphan = self.archive_dir / '2024-06' / 'attempts-1-2.jsonl.gz'
+        orphan.write_bytes(b'')
+        os.utime(orphan, (0, 0))
+
+        result = self.archiver(10, retention_days=40).run(now=NOW)
+        self.assertEqual(result['expired'], 1)
+        self.assertFalse((self.archive_dir / '2024-04').exists())
+        self.assertFalse(orphan.exists())
+        self.assertEqual(sorted(self.months()), ['2024-05', '2024-06'])
+        with self.sessions() as session:
+            # The hot attempts are untouched
+            self.assertEqual(session.query(LoginAttempt).filter(LoginAttempt.timestamp >= NOW - timedelta(days=10))
+                             .count(), 10 * 6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from honeypot.database.models import Base, LoginAttempt, Protocol
+from honeypot.database.writer import AttemptWriter
+
+class TestAttemptWriter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.directory.name, 'test.db')}")
+        Base.metadata.create_all(self.engine)
+        self.sessions = sessionmaker(bind=self.engine, expire_on_commit=False)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def count(self) -> int:
+        with self.sessions() as session:
+            return session.query(LoginAttempt).count()
+
+    def write(self, writer, i):
+        return writer.write(LoginAttempt, protocol=Protocol.SSH, username=f"user{i}",
+                            password="pw", client_ip="10.0.0.1")
+
+    def test_rows_are_group_committed(self):
+        """Test that concurrent writes land in few commits and reach the listeners."""
+        writer = AttemptWriter(self.sessions, batch_size=100, batch_window=0.2)
+        committed = []
+        writer.add_listener(committed.extend)
+        try:
+            threads = [threading.Thread(target=lambda i=i: self.write(writer, i)) for i in range(250)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            writer.flush()
+
+            stats = writer.get_stats()
+            self.assertEqual(stats['rows_written'], 250)
+            self.assertLessEqual(stats['batches'], 10)
+            self.assertEqual(self.count(), 250)
+            self.assertEqual(len(committed), 250)
+            self.assertTrue(all(row.id is not None for row in committed))
+        finally:
+            writer.stop()
+
+    def test_bad_row_only_drops_itself(self):
+        """Test that a row the database rejects is dropped without the rest of its batch."""
+        writer = AttemptWriter(self.sessions, batch_size=100, batch_window=0.2)
+        committed = []
+        writer.add_listener(committed.extend)
+        try:
+            for i in range(6):
+                if i == 3:
+                    # protocol is NOT NULL
+                    writer.write(LoginAttempt, protocol=None, username="user3", password="pw", client_ip="10.0.0.1")
+                else:
+                    self.write(writer, i)
+            writer.flush()
+
+            stats = writer.get_stats()
+            self.assertEqual((stats['rows_written'], stats['rows_dropped']), (5, 1))
+            self.assertEqual(self.count(), 5)
+            self.assertEqual(sorted(row.username for row in committed), [f"user{i}" for i in (0, 1, 2, 4, 5)])
+        finally:
+            writer.stop()
+
+    def test_stop_flushes_queue(self):
+        """Test that stopping the writer commits the rows still queued."""
+        writer = AttemptWriter(self.sessions, batch_size=5, batch_window=0.05)
+        for i in range(20):
+            self.assertTrue(self.write(writer, i))
+        writer.stop()
+        self.assertEqual(self.count(), 20)
+        self.assertFalse(self.write(writer, 99))
+
+    def test_full_queue_drops_rows(self):
+        """Test that the queue is bounded when the database cannot keep up."""
+        release = threading.Event()
+
+        def blocked_session():
+            release.wait(5)
+            return self.sessions()
+
+        writer = AttemptWriter(blocked_session, batch_size=1, batch_window=0, max_queue=2)
+        try:
+            # The first row is taken by the blocked writer, the next two fill the queue
+            self.assertTrue(self.write(writer, 0))
+            while writer.get_stats()['queue_depth']:
+                time.sleep(0.01)
+            results = [self.write(writer, i) for i in range(1, 4)]
+            self.assertEqual(results, [True, True, False])
+            self.assertEqual(writer.get_stats()['rows_dropped'], 1)
+        finally:
+            release.set()
+            writer.stop()
+        self.assertEqual(self.count(), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from honeypot.database.blocklist import IPBlocklist, collapse_networks
+from honeypot.database.models import Base, LoginAttempt, Protocol
+
+def attempt(client_ip: str) -> LoginAttempt:
+    return LoginAttempt(protocol=Protocol.SSH, username="root", password="root", client_ip=client_ip,
+                        timestamp=datetime(2024, 5, 1, tzinfo=ZoneInfo("UTC")))
+
+class TestIPBlocklist(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.directory.name, 'test.db')}")
+        Base.metadata.create_all(self.engine)
+        self.sessions = sessionmaker(bind=self.engine)
+        with self.sessions() as session:
+            session.add_all(attempt(ip) for ip in ["10.0.0.10", "2001:db8::1", "not-an-ip", "10.0.0.9"])
+            session.commit()
+        self.blocklist = IPBlocklist(self.sessions)
+        self.rendered = 0
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def lines(self, entries, count):
+        self.rendered += 1
+        return "\n".join(entries)
+
+    def test_incremental_order_and_etag(self):
+        """Test that added addresses keep numeric order and change the ETag only when new."""
+        etag, text = self.blocklist.render("plain", self.lines)
+        self.assertEqual(text.split("\n"), ["not-an-ip", "10.0.0.9", "10.0.0.10", "2001:db8::1"])
+
+        # An unchanged list is not rendered again
+        self.assertEqual(self.blocklist.render("plain", self.lines), (etag, text))
+        self.blocklist.add_rows([attempt("10.0.0.9")])
+        self.assertEqual(self.blocklist.render("plain", self.lines)[0], etag)
+        self.assertEqual(self.rendered, 1)
+
+        self.blocklist.add_rows([attempt("10.0.0.11"), attempt("1.2.3.4")])
+        new_etag, text = self.blocklist.render("plain", self.lines)
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(text.split("\n"), ["not-an-ip", "1.2.3.4", "10.0.0.9", "10.0.0.10", "10.0.0.11",
+                                            "2001:db8::1"])
+
+        # A reload reads the database again, which no longer has the addresses added only in memory
+        self.blocklist.invalidate()
+        self.assertEqual(self.blocklist.render("plain", self.lines)[1].split("\n"),
+                         ["not-an-ip", "10.0.0.9", "10.0.0.10", "2001:db8::1"])
+
+    def test_aggregation(self):
+        """Test that addresses collapse into covering networks per IP version."""
+        self.assertEqual(collapse_networks(["10.0.0.1", "10.0.0.0", "10.0.0.2", "10.0.0.3", "::ffff:10.0.0.4",
+                                            "2001:db8::1", "2001:db8::", "junk", "192.0.2.7"]),
+                         ["10.0.0.0/30", "10.0.0.4", "192.0.2.7", "2001:db8::/127"])
+
+        self.blocklist.add(["10.0.0.8", "10.0.0.11"])
+        _, text = self.blocklist.render("plain", self.lines, aggregate=True)
+        self.assertEqual(text.split("\n"), ["10.0.0.8/30", "2001:db8::1"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+from honeypot.database.dedup import AttemptDeduplicator
+from honeypot.database.models import Base, LoginAttempt, MinuteRollup, IPRollup, Protocol, migrate_attempt_counters
+from honeypot.database.rollups import ROLLUP_MODELS, rebuild_rollups, update_rollups
+from honeypot.database.writer import AttemptWriter
+
+START = datetime(2024, 5, 31, 23, 59, 58, tzinfo=ZoneInfo("UTC"))
+
+class TestAttemptDeduplicator(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.directory.name, 'test.db')}")
+        Base.metadata.create_all(self.engine)
+        self.sessions = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.writer = AttemptWriter(self.sessions, batch_size=25, batch_window=0.02)
+        self.writer.add_transaction_hook(update_rollups)
+
+    def tearDown(self):
+        self.writer.stop()
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def deduplicator(self, window: float) -> AttemptDeduplicator:
+        deduplicator = AttemptDeduplicator(window, self.writer.request_batch)
+        self.writer.add_transaction_hook(deduplicator.apply)
+        return deduplicator
+
+    def record(self, deduplicator: AttemptDeduplicator, i: int, password: str = "toor"):
+        """Record an attempt the way base_server.store_attempt does."""
+        timestamp = START + timedelta(milliseconds=i)
+        if deduplicator.admit(Protocol.SSH, "root", password, "198.51.100.7", timestamp):
+            self.writer.write(LoginAttempt, protocol=Protocol.SSH, username="root", password=password,
+                              client_ip="198.51.100.7", country="DE", timestamp=timestamp)
+
+    def snapshot(self) -> dict:
+        with self.sessions() as session:
+            return {
+                model.__tablename__: sorted(
+                    tuple(str(getattr(row, column.name)) for column in model.__table__.columns)
+                    for row in session.query(model)
+                )
+                for model in ROLLUP_MODELS
+            }
+
+    def test_repeats_are_counted_on_one_row(self):
+        """Test that repeats within the window keep their exact count on the first attempt."""
+        deduplicator = self.deduplicator(60)
+        broadcast = []
+        deduplicator.add_listener(broadcast.extend)
+        for i in range(1000):
+            self.record(deduplicator, i, password="toor" if i % 10 else "admin")
+            if i % 100 == 0:
+                self.writer.flush()
+        self.writer.flush()
+
+        with self.sessions() as session:
+            rows = {row.password: row for row in session.query(LoginAttempt)}
+            self.assertEqual(len(rows), 2)
+            self.assertEqual(rows["toor"].hits, 900)
+            self.assertEqual(rows["admin"].hits, 100)
+            self.assertEqual(rows["toor"].last_seen.replace(tzinfo=None),
+                             (START + timedelta(milliseconds=999)).replace(tzinfo=None))
+            self.assertEqual(sum(row.count for row in session.query(MinuteRollup)), 1000)
+            self.assertEqual(session.get(IPRollup, "198.51.100.7").count, 1000)
+        latest = {total['id']: total['hits'] for total in broadcast}
+        self.assertEqual(latest, {rows["toor"].id: 900, rows["admin"].id: 100})
+        self.assertEqual(deduplicator.get_stats()['repeats'], 998)
+
+        # Rollups counted batch by batch equal a rebuild from the counted rows
+        incremental = self.snapshot()
+        with self.sessions() as session:
+            rebuild_rollups(session)
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_window_expiry_and_disabled(self):
+        """Test that attempts after the window, or with no window, get their own rows."""
+        deduplicator = self.deduplicator(0.2)
+        for i in range(3):
+            self.record(deduplicator, i)
+        self.writer.flush()
+        time.sleep(0.25)
+        self.record(deduplicator, 3)
+        self.writer.flush()
+
+        disabled = self.deduplicator(0)
+        for i in range(3):
+            self.record(disabled, 4 + i, password="other")
+        self.writer.flush()
+
+        with self.sessions() as session:
+            hits = [row.hits for row in session.query(LoginAttempt).order_by(LoginAttempt.id)]
+        self.assertEqual(hits, [3, 1, 1, 1, 1])
+
+    def test_migration_adds_counters(self):
+        """Test that a login_attempts table without counters gets them, counting each row once."""
+        engine = create_engine(f"sqlite:///{os.path.join(self.directory.name, 'old.db')}")
+        try:
+            with engine.begin() as connection:
+                connection.exec_driver_sql("CREATE TABLE login_attempts (id INTEGER PRIMARY KEY, username_id INTEGER)")
+                connection.exec_driver_sql("INSERT INTO login_attempts (id, username_id) VALUES (1, 1)")
+            migrate_attempt_counters(engine)
+            migrate_attempt_counters(engine)  # A second run finds nothing to do
+            columns = {column['name'] for column in inspect(engine).get_columns('login_attempts')}
+            self.assertTrue({'hits', 'last_seen'} <= columns)
+            with engine.connect() as connection:
+                self.assertEqual(connection.exec_driver_sql("SELECT hits FROM login_attempts").scalar(), 1)
+        finally:
+            engine.dispose()
+
+if __name__ == '__main__':
+    unittest.main()
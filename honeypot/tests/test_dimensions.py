@@ -0,0 +1,131 @@
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from honeypot.database.models import (
+    Base, ClientIP, Location, LoginAttempt, Password, Protocol, Username, migrate_dimensions, query_client_ips
+)
+from honeypot.database.writer import AttemptWriter
+
+class TestDimensionStorage(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.directory.name, 'test.db')}")
+        self.sessions = sessionmaker(bind=self.engine, expire_on_commit=False)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def attempts(self) -> list:
+        with self.sessions() as session:
+            rows = session.query(LoginAttempt).order_by(LoginAttempt.id).all()
+            return [{key: value for key, value in row.to_dict().items() if key != 'timestamp'} for row in rows]
+
+    def test_writes_intern_repeated_values(self):
+        """Test that repeated values are stored once and read back unchanged."""
+        Base.metadata.create_all(self.engine)
+        committed = []
+        writer = AttemptWriter(self.sessions, batch_size=7, batch_window=0.05)
+        writer.add_listener(committed.extend)
+        try:
+            for i in range(50):
+                writer.write(LoginAttempt, protocol=Protocol.SSH, username=("root", "admin")[i % 2],
+                             password=f"pw{i % 3}", client_ip=f"192.0.2.{i % 4}",
+                             country="NL" if i % 5 else None, city="Amsterdam" if i % 5 else None, region=None)
+            writer.flush()
+        finally:
+            writer.stop()
+
+        with self.sessions() as session:
+            self.assertEqual(session.query(Username).count(), 2)
+            self.assertEqual(session.query(Password).count(), 3)
+            self.assertEqual(session.query(ClientIP).count(), 4)
+            self.assertEqual(session.query(Location).count(), 1)
+            self.assertEqual(sorted(ip for ip, in query_client_ips(session)), [f"192.0.2.{i}" for i in range(4)])
+            self.assertEqual(session.query(LoginAttempt).filter(LoginAttempt.username == "admin").count(), 25)
+
+        stored = self.attempts()
+        self.assertEqual(stored, [{key: value for key, value in row.to_dict().items() if key != 'timestamp'}
+                                  for row in committed])
+        self.assertEqual(stored[0]['country'], None)
+        self.assertEqual(stored[1]['city'], "Amsterdam")
+        self.assertEqual(stored[1]['region'], None)
+
+    def test_missing_credentials_are_stored_empty(self):
+        """Test that a None username or password is interned as an empty value instead of failing the batch."""
+        Base.metadata.create_all(self.engine)
+        committed = []
+        writer = AttemptWriter(self.sessions, batch_size=10, batch_window=0.05)
+        writer.add_listener(committed.extend)
+        try:
+            writer.write(LoginAttempt, protocol=Protocol.FTP, username="anonymous", password=None,
+                         client_ip="192.0.2.1")
+            writer.write(LoginAttempt, protocol=Protocol.FTP, username=None, password="secret",
+                         client_ip="192.0.2.1")
+            writer.flush()
+            self.assertEqual(writer.get_stats()['rows_dropped'], 0)
+        finally:
+            writer.stop()
+
+        stored = self.attempts()
+        self.assertEqual([(row['username'], row['password']) for row in stored],
+                         [("anonymous", ""), ("", "secret")])
+        self.assertEqual([(row.username, row.password) for row in committed], [("anonymous", ""), ("", "secret")])
+
+    def test_rolled_back_ids_are_not_cached(self):
+        """Test that ids created by a rolled back transaction are resolved again."""
+        Base.metadata.create_all(self.engine)
+        with self.sessions() as session:
+            session.add(LoginAttempt(protocol=Protocol.FTP, username="ghost", password="x", client_ip="10.0.0.1"))
+            session.flush()
+            session.rollback()
+        with self.sessions() as session:
+            session.add(LoginAttempt(protocol=Protocol.FTP, username="ghost", password="x", client_ip="10.0.0.1"))
+            session.commit()
+            attempt = session.query(LoginAttempt).one()
+            self.assertEqual(session.get(Username, attempt.username_id).value, "ghost")
+
+    def test_migration_keeps_attempts(self):
+        """Test that a database with text columns is converted without changing its attempts."""
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(
+                "CREATE TABLE login_attempts (id INTEGER PRIMARY KEY, protocol VARCHAR(6) NOT NULL, "
+                "username VARCHAR NOT NULL, password VARCHAR NOT NULL, client_ip VARCHAR NOT NULL, "
+                "timestamp DATETIME, latitude FLOAT, longitude FLOAT, country VARCHAR, city VARCHAR, region VARCHAR)"
+            )
+            connection.exec_driver_sql("CREATE INDEX ix_login_attempts_timestamp ON login_attempts (timestamp)")
+            connection.exec_driver_sql(
+                "INSERT INTO login_attempts (id, protocol, username, password, client_ip, timestamp, "
+                "latitude, longitude, country, city, region) VALUES "
+                "(3, 'SSH', 'root', 'toor', '10.0.0.1', '2024-01-01 00:00:00', 52.4, 4.9, 'NL', 'Amsterdam', NULL), "
+                "(5, 'FTP', 'root', '', '10.0.0.2', '2024-01-01 00:01:00', NULL, NULL, NULL, NULL, NULL), "
+                "(8, 'SSH', 'pi', 'toor', '10.0.0.1', '2024-01-01 00:02:00', 52.4, 4.9, 'NL', 'Amsterdam', NULL)"
+            )
+
+        Base.metadata.create_all(self.engine)
+        migrate_dimensions(self.engine)
+        migrate_dimensions(self.engine)  # A second run finds nothing to do
+
+        self.assertEqual(self.attempts(), [
+            {'id': 3, 'protocol': 'ssh', 'username': 'root', 'password': 'toor', 'client_ip': '10.0.0.1',
+             'latitude': 52.4, 'longitude': 4.9, 'country': 'NL', 'city': 'Amsterdam', 'region': None,
+             'hits': 1, 'last_seen': None},
+            {'id': 5, 'protocol': 'ftp', 'username': 'root', 'password': '', 'client_ip': '10.0.0.2',
+             'latitude': None, 'longitude': None, 'country': None, 'city': None, 'region': None,
+             'hits': 1, 'last_seen': None},
+            {'id': 8, 'protocol': 'ssh', 'username': 'pi', 'password': 'toor', 'client_ip': '10.0.0.1',
+             'latitude': 52.4, 'longitude': 4.9, 'country': 'NL', 'city': 'Amsterdam', 'region': None,
+             'hits': 1, 'last_seen': None},
+        ])
+        with self.sessions() as session:
+            self.assertEqual(session.query(Username).count(), 2)
+            self.assertEqual(session.query(Location).count(), 1)
+            # New attempts continue after the migrated ids
+            session.add(LoginAttempt(protocol=Protocol.SSH, username="root", password="new", client_ip="10.0.0.3"))
+            session.commit()
+        self.assertEqual(self.attempts()[-1]['id'], 9)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from honeypot.database.dedup import AttemptDeduplicator
+from honeypot.database.enrichment import AttemptEnricher
+from honeypot.database.models import Base, CountryDayRollup, LoginAttempt, Protocol
+from honeypot.database.rollups import ROLLUP_MODELS, rebuild_rollups, update_rollups
+from honeypot.database.writer import AttemptWriter
+
+START = datetime(2024, 5, 31, 23, 59, 58, tzinfo=ZoneInfo("UTC"))
+
+TOKYO = {'latitude': 35.69, 'longitude': 139.69, 'country': 'Japan', 'city': 'Tokyo', 'region': 'Tokyo'}
+
+class TestAttemptEnricher(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.directory.name, 'test.db')}")
+        Base.metadata.create_all(self.engine)
+        self.sessions = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.writer = AttemptWriter(self.sessions, batch_size=25, batch_window=0.02)
+        self.writer.add_transaction_hook(update_rollups)
+        self.deduplicator = AttemptDeduplicator(60, self.writer.request_batch)
+        self.writer.add_transaction_hook(self.deduplicator.apply)
+        self.enricher = AttemptEnricher(self.writer.request_batch)
+        self.writer.add_transaction_hook(self.enricher.apply)
+        self.enricher.add_listener(self.deduplicator.relocate)
+
+    def tearDown(self):
+        self.writer.stop()
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def record(self, i: int, client_ip: str, password: str = "toor"):
+        """Record an attempt from an address that is not located yet, like base_server.store_attempt."""
+        timestamp = START + timedelta(seconds=i)
+        if self.deduplicator.admit(Protocol.SSH, "root", password, client_ip, timestamp):
+            self.writer.write(LoginAttempt, protocol=Protocol.SSH, username="root", password=password,
+                              client_ip=client_ip, timestamp=timestamp)
+            return self.enricher.expect(client_ip)
+
+    def snapshot(self) -> dict:
+        with self.sessions() as session:
+            return {
+                model.__tablename__: sorted(
+                    tuple(str(getattr(row, column.name)) for column in model.__table__.columns)
+                    for row in session.query(model)
+                )
+                for model in ROLLUP_MODELS
+            }
+
+    def test_locations_are_filled_in_after_storing(self):
+        """Test that finished lookups locate stored attempts and move their rollup counts."""
+        enriched = []
+        self.enricher.add_listener(enriched.extend)
+        callbacks = [self.record(i, "203.0.113.9", password=f"pw{i}") for i in range(3)]
+        unlocated = self.record(3, "198.51.100.7")
+        self.writer.flush()
+        with self.sessions() as session:
+            self.assertTrue(all(row.country is None for row in session.query(LoginAttempt)))
+
+        # Repeats of the first attempt, half before and half after its address is located
+        for i in range(5):
+            self.record(10 + i, "203.0.113.9", password="pw0")
+        callbacks[0](TOKYO)
+        for callback in callbacks[1:]:
+            callback(dict(TOKYO))
+        unlocated(None)
+        self.writer.flush()
+        for i in range(5):
+            self.record(20 + i, "203.0.113.9", password="pw0")
+        self.writer.flush()
+
+        with self.sessions() as session:
+            rows = {row.password: row for row in session.query(LoginAttempt)}
+            for password in ("pw0", "pw1", "pw2"):
+                self.assertEqual(rows[password].country, "Japan")
+                self.assertEqual(rows[password].latitude, 35.69)
+            self.assertEqual(rows["pw0"].hits, 11)
+            self.assertIsNone(rows["toor"].country)
+            countries = {}
+            for row in session.query(CountryDayRollup):
+                countries[row.country] = countries.get(row.country, 0) + row.count
+            self.assertEqual(countries, {'Japan': 13, '': 1})
+        self.assertEqual(sorted(attempt['id'] for attempt in enriched),
+                         sorted(rows[password].id for password in ("pw0", "pw1", "pw2")))
+        self.assertEqual(self.enricher.get_stats(), {
+            'lookups_pending': 0, 'lookups_failed': 1, 'addresses_waiting': 0, 'attempts_enriched': 3
+        })
+
+        # Counts moved batch by batch equal a rebuild from the located rows
+        incremental = self.snapshot()
+        with self.sessions() as session:
+            rebuild_rollups(session)
+            session.commit()
+        self.assertEqual(self.snapshot(), incremental)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from honeypot.database.models import Base, LoginAttempt, Protocol, iter_attempt_records, snapshot_client_ips
+from honeypot.web import exports
+from honeypot.web.exports import attempt_records, csv_lines, json_lines, stream_lines
+
+START = datetime(2024, 5, 1, tzinfo=ZoneInfo("UTC"))
+ADDRESSES = ["10.0.0.10", "10.0.0.9", "2001:db8::1", "192.0.2.1", "::ffff:1.2.3.4", "not-an-ip"]
+
+class TestStreamingExports(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.directory.name, 'test.db')}")
+        Base.metadata.create_all(self.engine)
+        self.sessions = sessionmaker(bind=self.engine)
+        self.add_attempts(0, 40)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def add_attempts(self, start: int, stop: int):
+        with self.sessions() as session:
+            session.add_all(LoginAttempt(
+                protocol=Protocol.TELNET, username=f"user{i}", password='pa"ss' if i % 2 else "",
+                client_ip=ADDRESSES[i % len(ADDRESSES)], country="JP" if i % 3 else None,
+                timestamp=START + timedelta(minutes=i), hits=i % 4 + 1
+            ) for i in range(start, stop))
+            session.commit()
+
+    def test_keyset_pages(self):
+        """Test that paging by id reads each attempt once and skips attempts added meanwhile."""
+        attempts = iter_attempt_records(self.sessions, page_size=7)
+        first = [next(attempts) for _ in range(10)]
+        self.add_attempts(40, 50)
+        ids = [attempt['id'] for attempt in first + list(attempts)]
+        self.assertEqual(ids, list(range(1, 41)))
+
+        count, addresses = snapshot_client_ips(self.sessions, page_size=2)
+        self.add_attempts(50, 51)
+        self.assertEqual(list(addresses), ["not-an-ip", "::ffff:1.2.3.4", "10.0.0.9", "10.0.0.10", "192.0.2.1",
+                                           "2001:db8::1"])
+        self.assertEqual(count, len(ADDRESSES))
+
+    def test_formats(self):
+        """Test that the streamed JSON and CSV parse back to the attempts."""
+        with self.sessions() as session:
+            expected = [row.to_dict() for row in session.query(LoginAttempt).order_by(LoginAttempt.id)]
+
+        self.assertEqual(''.join(stream_lines([["a", "b"], [], ["c"]], "test")), "a\nb\nc")
+        original_block = exports.EXPORT_BLOCK_LINES
+        exports.EXPORT_BLOCK_LINES = 3
+        try:
+            exported = json.loads(''.join(stream_lines([json_lines(attempt_records(self.sessions))], "JSON")))
+            table = ''.join(stream_lines([csv_lines(attempt_records(self.sessions))], "CSV"))
+        finally:
+            exports.EXPORT_BLOCK_LINES = original_block
+
+        self.assertEqual(exported, [{key: value for key, value in attempt.items() if key != 'id'}
+                                    for attempt in expected])
+        self.assertEqual(json.loads(''.join(json_lines([]))), [])
+
+        self.assertTrue(table.endswith('\n'))
+        rows = list(csv.DictReader(io.StringIO(table)))
+        self.assertEqual(len(rows), len(expected))
+        self.assertEqual(rows[1]['password'], 'pa"ss')
+        self.assertEqual(rows[0]['password'], '')
+        self.assertEqual([int(row['hits']) for row in rows], [attempt['hits'] for attempt in expected])
+        self.assertEqual([row['client_ip'] for row in rows], [attempt['client_ip'] for attempt in expected])
+
+if __name__ == '__main__':
+    unittest.main()
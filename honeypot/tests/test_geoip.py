@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from honeypot.core.geoip import RangeTable, TABLE_SUFFIX, open_local_provider
+
+DBIP_ROWS = """\
+8.8.8.0,8.8.8.255,NA,US,California,Mountain View,37.4223,-122.085
+1.0.0.0,1.0.0.255,OC,AU,Queensland,South Brisbane,-27.4767,153.017
+2001:db8::,2001:db8::ffff,EU,DE,Berlin,Berlin,52.52,13.405
+1.0.1.0,1.0.3.255,AS,CN,Fujian,Fuzhou,26.0614,119.306
+"""
+
+class TestRangeTable(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.source = Path(self.directory.name) / 'dbip.csv'
+        self.source.write_text(DBIP_ROWS)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_lookups(self):
+        """Test that addresses resolve to the range containing them, in any row order."""
+        table = open_local_provider(str(self.source))
+        try:
+            self.assertEqual(table.lookup("1.0.2.200"), {
+                'latitude': 26.0614, 'longitude': 119.306, 'country': 'CN', 'city': 'Fuzhou', 'region': 'Fujian'
+            })
+            self.assertEqual(table.lookup("8.8.8.8")['city'], "Mountain View")
+            self.assertEqual(table.lookup("::ffff:8.8.8.8")['city'], "Mountain View")
+            self.assertEqual(table.lookup("2001:db8::42")['country'], "DE")
+            for uncovered in ("1.0.4.0", "0.0.0.1", "255.255.255.255", "2001:db8::1:0", "::1", "not-an-ip"):
+                self.assertIsNone(table.lookup(uncovered), uncovered)
+        finally:
+            table.close()
+
+    def test_header_and_recompile(self):
+        """Test that a dump with a header row is read by column name and recompiled when it changes."""
+        self.source.write_text("ip_from,ip_to,country_code,country_name,region_name,city_name,latitude,longitude\n"
+                               "16777216,16777471,AU,Australia,Queensland,South Brisbane,-27.4767,153.017\n")
+        table = RangeTable.open(self.source)
+        self.assertEqual(table.lookup("1.0.0.1")['country'], "Australia")
+        table.close()
+        self.assertTrue((Path(self.directory.name) / ('dbip.csv' + TABLE_SUFFIX)).exists())
+
+        self.source.write_text("start,end,country\n1.0.0.0,1.0.0.255,Japan\n")
+        os.utime(self.source, ns=(0, 10 ** 9))
+        table = RangeTable.open(self.source)
+        self.assertEqual(table.lookup("1.0.0.1"), {
+            'latitude': None, 'longitude': None, 'country': 'Japan', 'city': None, 'region': None
+        })
+        table.close()
+
+if __name__ == '__main__':
+    unittest.main()
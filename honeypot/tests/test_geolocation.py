@@ -0,0 +1,80 @@
+import threading
+import time
+import unittest
+from honeypot.core.geolocation import GeolocationService
+from honeypot.core.location_cache import LocationCache
+
+class CountingGeolocationService(GeolocationService):
+    """Geolocation service answering from a slow fake API that counts its requests."""
+
+    def __init__(self):
+        self.fetched = []
+        super().__init__()
+        self.persist_cache = False
+        self.local_provider = None
+
+    def _load_cache(self):
+        self.cache = LocationCache(None, 100)
+
+    def _fetch_location(self, ip):
+        self.fetched.append(ip)
+        time.sleep(0.2)
+        if ip.startswith('198.51.100.'):
+            # Fails, like a network error
+            return None
+        location = {'latitude': 1.0, 'longitude': 2.0, 'country': 'Japan', 'city': None, 'region': None}
+        self._cache_location(ip, location, self.cache_ttl)
+        return location
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.service = CountingGeolocationService()
+
+    def tearDown(self):
+        self.service.running = False
+
+    def test_concurrent_lookups_share_one_fetch(self):
+        """Test that concurrent and queued lookups of one IP make a single API request."""
+        results = []
+        callbacks = []
+        self.service.get_location_async("203.0.113.5", callbacks.append)
+        threads = [threading.Thread(target=lambda: results.append(self.service.get_location("203.0.113.5")))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        self.service.get_location_async("203.0.113.5", callbacks.append)
+        for thread in threads:
+            thread.join()
+        self.service.batch_queue.join()
+
+        self.assertEqual(self.service.fetched, ["203.0.113.5"])
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(result['country'] == 'Japan' for result in results))
+        self.assertEqual(len(callbacks), 2)
+
+        stats = self.service.get_stats()
+        self.assertEqual(stats['pending'], 0)
+        # Whoever did not fetch either shared the pending lookup or found the queue entry already taken
+        self.assertEqual(stats['coalesced_requests'] + stats['skipped_queue_entries'] + len(self.service.fetched), 10)
+
+        # Cached now, so nothing is queued or fetched again
+        self.service.get_location_async("203.0.113.5", callbacks.append)
+        self.assertEqual(self.service.get_location("203.0.113.5")['country'], 'Japan')
+        self.assertEqual(self.service.fetched, ["203.0.113.5"])
+        self.assertEqual(len(callbacks), 3)
+
+    def test_failed_lookups_are_retried_after_failure_ttl(self):
+        """Test that a failed lookup is cached as no location until the failure TTL passes."""
+        self.service.failure_ttl = 0.3
+        self.assertIsNone(self.service.get_location("198.51.100.9"))
+        self.assertEqual(self.service.peek_location("198.51.100.9"), (True, None))
+        self.assertIsNone(self.service.get_location("198.51.100.9"))
+        self.assertEqual(self.service.fetched, ["198.51.100.9"])
+
+        time.sleep(0.3)
+        self.assertEqual(self.service.peek_location("198.51.100.9"), (False, None))
+        self.assertIsNone(self.service.get_location("198.51.100.9"))
+        self.assertEqual(self.service.fetched, ["198.51.100.9", "198.51.100.9"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import enum
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine, func, inspect, select
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import sessionmaker
+from honeypot.database.models import (
+    Base, LoginAttempt, Protocol, Username, migrate_dimensions, migrate_indexes, query_attempts_in_network,
+    query_client_ips
+)
+
+class TestLoginAttemptIndexes(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.directory.name, 'test.db')}")
+        self.session = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def plan(self, query) -> str:
+        """Return SQLite's query plan for a SQLAlchemy query or statement as one string."""
+        statement = getattr(query, 'statement', query).compile(dialect=sqlite.dialect())
+        # Enum columns store member names; blobs cannot be rendered as literals
+        parameters = tuple(value.name if isinstance(value, enum.Enum) else value
+                           for value in (statement.params[name] for name in statement.positiontup))
+        with self.engine.connect() as connection:
+            rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+        return " | ".join(row[-1] for row in rows)
+
+    def test_migration_adds_indexes_in_place(self):
+        """Test that a database created without indexes gains them and keeps its rows."""
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(
+                "CREATE TABLE login_attempts (id INTEGER PRIMARY KEY, protocol VARCHAR(6) NOT NULL, "
+                "username VARCHAR NOT NULL, password VARCHAR NOT NULL, client_ip VARCHAR NOT NULL, "
+                "timestamp DATETIME, latitude FLOAT, longitude FLOAT, country VARCHAR, city VARCHAR, region VARCHAR)"
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO login_attempts (protocol, username, password, client_ip) VALUES ('SSH', 'root', 'x', '10.0.0.1')"
+            )
+
+        Base.metadata.create_all(self.engine)
+        migrate_dimensions(self.engine)
+        migrate_indexes(self.engine)
+        migrate_indexes(self.engine)  # A second run finds nothing to do
+
+        names = {index['name'] for index in inspect(self.engine).get_indexes('login_attempts')}
+        self.assertTrue({index.name for index in LoginAttempt.__table__.indexes} <= names)
+        self.assertEqual(self.session.query(LoginAttempt).count(), 1)
+
+    def test_endpoint_queries_use_indexes(self):
+        """Test that the web interface's queries do not scan the whole table."""
+        Base.metadata.create_all(self.engine)
+        query = self.session.query
+
+        # Dashboard, WebSocket batches and /api/attempts: newest first
+        self.assertIn("USING INDEX ix_login_attempts_timestamp",
+                      self.plan(query(LoginAttempt).order_by(LoginAttempt.timestamp.desc()).limit(5000)))
+        # IP exports
+        self.assertIn("SEARCH login_attempts USING INDEX ix_login_attempts_client_ip_id (client_ip_id=?)",
+                      self.plan(query_client_ips(self.session)))
+        # CIDR range queries
+        self.assertIn("USING INDEX ix_client_ips_packed (packed>? AND packed<?)",
+                      self.plan(query_client_ips(self.session, network="45.148.10.0/24")))
+        self.assertIn("USING COVERING INDEX ix_client_ips_packed (packed>? AND packed<?)",
+                      self.plan(query_attempts_in_network(self.session, "45.148.10.0/24")))
+        # Totals, as emitted by Query.count()
+        self.assertIn("COVERING INDEX",
+                      self.plan(select(func.count()).select_from(query(LoginAttempt).statement.subquery())))
+        # Per-protocol views
+        self.assertIn("USING INDEX ix_login_attempts_protocol_timestamp (protocol=?)",
+                      self.plan(query(LoginAttempt).filter(LoginAttempt.protocol == Protocol.SSH)
+                                .order_by(LoginAttempt.timestamp.desc())))
+        # Username lookups
+        username_id = select(Username.id).where(Username.value == "root").scalar_subquery()
+        self.assertIn("USING INDEX ix_login_attempts_username_id (username_id=?)",
+                      self.plan(query(LoginAttempt).filter(LoginAttempt.username_id == username_id)))
+
+if __name__ == '__main__':
+    unittest.main()
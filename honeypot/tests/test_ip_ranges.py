@@ -0,0 +1,71 @@
+import ipaddress
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+from honeypot.database.models import (
+    Base, ClientIP, LoginAttempt, Protocol, migrate_packed_ips, network_bounds, pack_ip, query_attempts_in_network,
+    query_client_ips
+)
+
+ADDRESSES = ["45.148.10.7", "9.9.9.9", "45.148.10.200", "2001:db8::1", "45.148.11.1", "10.0.0.1", "::1"]
+
+class TestPackedIPs(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.directory.name, 'test.db')}")
+        self.session = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def add_attempts(self):
+        Base.metadata.create_all(self.engine)
+        for address in ADDRESSES:
+            self.session.add(LoginAttempt(protocol=Protocol.SSH, username="root", password="x", client_ip=address))
+        self.session.commit()
+
+    def test_packing_sorts_numerically(self):
+        """Test that packed addresses sort like the addresses and networks bound them."""
+        v4 = sorted((a for a in ADDRESSES if ":" not in a), key=lambda a: int(ipaddress.ip_address(a)))
+        self.assertEqual(sorted((a for a in ADDRESSES if ":" not in a), key=pack_ip), v4)
+        self.assertEqual(len(pack_ip("::1")), 16)
+        self.assertIsNone(pack_ip("not-an-ip"))
+
+        first, last = network_bounds("45.148.10.99/24")
+        self.assertEqual(first, pack_ip("45.148.10.0"))
+        self.assertEqual(last, pack_ip("45.148.10.255"))
+        self.assertEqual(network_bounds("2001:db8::/32")[1], pack_ip("2001:db8:ffff:ffff:ffff:ffff:ffff:ffff"))
+        with self.assertRaises(ValueError):
+            network_bounds("45.148.10.0/33")
+
+    def test_client_ips_in_order_and_by_network(self):
+        """Test that the database returns addresses sorted and answers CIDR queries."""
+        self.add_attempts()
+        self.assertEqual([ip for ip, in query_client_ips(self.session)],
+                         ["::1", "9.9.9.9", "10.0.0.1", "45.148.10.7", "45.148.10.200", "45.148.11.1", "2001:db8::1"])
+        self.assertEqual([ip for ip, in query_client_ips(self.session, network="45.148.10.0/24")],
+                         ["45.148.10.7", "45.148.10.200"])
+        self.assertEqual([ip for ip, in query_client_ips(self.session, network="2001:db8::/32")], ["2001:db8::1"])
+        attempts = query_attempts_in_network(self.session, "45.148.0.0/16").all()
+        self.assertEqual(sorted(attempt.client_ip for attempt in attempts), ["45.148.10.200", "45.148.10.7", "45.148.11.1"])
+
+    def test_migration_packs_existing_addresses(self):
+        """Test that a client_ips table without the packed column gains it, filled in."""
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql("CREATE TABLE client_ips (id INTEGER PRIMARY KEY, value VARCHAR NOT NULL UNIQUE)")
+            connection.exec_driver_sql("INSERT INTO client_ips (value) VALUES ('45.148.10.7'), ('2001:db8::1'), ('bogus')")
+
+        migrate_packed_ips(self.engine)
+        migrate_packed_ips(self.engine)  # A second run finds nothing to do
+
+        self.assertIn('packed', {column['name'] for column in inspect(self.engine).get_columns('client_ips')})
+        packed = dict(self.session.query(ClientIP.value, ClientIP.packed))
+        self.assertEqual(packed, {'45.148.10.7': pack_ip('45.148.10.7'), '2001:db8::1': pack_ip('2001:db8::1'),
+                                  'bogus': None})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import socket
+import unittest
+from honeypot.core.line_reader import LineReader, LineTooLongError
+
+class TestLineReader(unittest.TestCase):
+    def setUp(self):
+        self.server, self.client = socket.socketpair()
+
+    def tearDown(self):
+        self.server.close()
+        self.client.close()
+
+    def test_splits_crlf_and_lf_lines(self):
+        """Test that both CRLF and bare LF end a line."""
+        self.client.sendall(b"USER root\r\nPASS toor\nQUIT\r\n")
+        reader = LineReader(self.server)
+        self.assertEqual(reader.readline(), b"USER root")
+        self.assertEqual(reader.readline(), b"PASS toor")
+        self.assertEqual(reader.readline(), b"QUIT")
+
+    def test_lone_cr_is_data(self):
+        """Test that a CR not followed by LF is kept in the line."""
+        self.client.sendall(b"a\rb\r\n")
+        reader = LineReader(self.server)
+        self.assertEqual(reader.readline(), b"a\rb")
+
+    def test_returns_partial_line_and_empty_on_eof(self):
+        """Test that a line cut off by EOF is returned, then empty bytes."""
+        self.client.sendall(b"partial")
+        self.client.close()
+        reader = LineReader(self.server)
+        self.assertEqual(reader.readline(), b"partial")
+        self.assertEqual(reader.readline(), b"")
+        self.assertTrue(reader.eof)
+
+    def test_reads_in_chunks(self):
+        """Test that many lines are served from few recv calls."""
+        calls = []
+        self.client.sendall(b"line\r\n" * 100)
+        reader = LineReader(self.server, on_data=lambda: calls.append(1))
+        for _ in range(100):
+            self.assertEqual(reader.readline(), b"line")
+        self.assertLess(len(calls), 5)
+
+    def test_rejects_oversized_line(self):
+        """Test that a line longer than the limit raises instead of buffering."""
+        self.client.sendall(b"x" * 100)
+        self.client.close()
+        reader = LineReader(self.server, max_line_length=16, chunk_size=8)
+        with self.assertRaises(LineTooLongError):
+            reader.readline()
+
+    def test_rejects_oversized_terminated_line(self):
+        """Test that an oversized line is dropped and the next line still reads."""
+        self.client.sendall(b"x" * 32 + b"\r\nok\r\n")
+        reader = LineReader(self.server, max_line_length=16)
+        with self.assertRaises(LineTooLongError):
+            reader.readline()
+        self.assertEqual(reader.readline(), b"ok")
+
+    def test_read_byte_uses_buffer(self):
+        """Test that read_byte and readline share the same buffer."""
+        self.client.sendall(b"\xff\xfb\x01login\r\n")
+        reader = LineReader(self.server)
+        self.assertEqual(reader.read_byte(), b"\xff")
+        self.assertEqual(reader.read_byte(), b"\xfb")
+        self.assertEqual(reader.read_byte(), b"\x01")
+        self.assertEqual(reader.readline(), b"login")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from honeypot.core.location_cache import LocationCache
+
+TOKYO = {'latitude': 35.69, 'longitude': 139.69, 'country': 'Japan', 'city': 'Tokyo', 'region': 'Tokyo'}
+
+class TestLocationCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / 'cache.db'
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_memory_is_bounded_and_entries_persist(self):
+        """Test that entries evicted from memory are read back from the file, also after a restart."""
+        cache = LocationCache(self.path, max_entries=2)
+        for i in range(5):
+            cache.put(f"203.0.113.{i}", dict(TOKYO, city=f"City {i}"), ttl=60)
+        cache.put("192.0.2.1", None, ttl=60)
+        self.assertEqual(len(cache), 2)
+
+        self.assertEqual(cache.get("203.0.113.0"), (True, dict(TOKYO, city="City 0")))
+        self.assertEqual(cache.get("192.0.2.1"), (True, None))
+        self.assertEqual(cache.get("203.0.113.99"), (False, None))
+        stats = cache.get_stats()
+        self.assertEqual((stats['entries'], stats['evictions'], stats['store_hits'], stats['misses']), (2, 5, 1, 1))
+        cache.close()
+
+        reopened = LocationCache(self.path, max_entries=2)
+        self.assertFalse(reopened.is_empty())
+        self.assertEqual(reopened.get("203.0.113.4"), (True, dict(TOKYO, city="City 4")))
+        reopened.close()
+
+    def test_expired_entries_are_missed_and_purged(self):
+        """Test that entries past their TTL are no longer found and are purged from the file."""
+        cache = LocationCache(self.path, max_entries=10)
+        cache.put("203.0.113.1", TOKYO, ttl=0.2)
+        cache.put("203.0.113.2", None, ttl=60)
+        cache.put("203.0.113.3", TOKYO, ttl=60, persist=False)
+        self.assertEqual(cache.get("203.0.113.1"), (True, TOKYO))
+
+        time.sleep(0.2)
+        self.assertEqual(cache.get("203.0.113.1"), (False, None))
+        self.assertEqual(cache.purge_expired(), 1)
+        cache.close()
+
+        reopened = LocationCache(self.path, max_entries=10)
+        self.assertEqual(reopened.get("203.0.113.2"), (True, None))
+        self.assertEqual(reopened.get("203.0.113.3"), (False, None))
+        reopened.close()
+
+if __name__ == '__main__':
+    unittest.main()
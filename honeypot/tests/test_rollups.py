@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from honeypot.database.models import (
+    Base, LoginAttempt, Protocol, MinuteRollup, CountryDayRollup, PasswordRollup, IPRollup
+)
+from honeypot.database.rollups import ROLLUP_MODELS, get_timeline, get_top, rebuild_rollups, update_rollups
+from honeypot.database.writer import AttemptWriter
+
+START = datetime(2024, 5, 31, 23, 58, tzinfo=ZoneInfo("UTC"))
+
+def attempt_values(i: int) -> dict:
+    """Attempts spread over a few minutes across midnight, protocols, countries and IPs."""
+    return {
+        'protocol': (Protocol.SSH, Protocol.FTP, Protocol.TELNET)[i % 3],
+        'username': ('root', 'admin', 'pi')[i % 4 % 3],
+        'password': f"pw{i % 5}",
+        'client_ip': f"203.0.113.{i % 7}",
+        'country': ('NL', 'US', None)[i % 3],
+        'timestamp': START + timedelta(seconds=17 * i),
+    }
+
+class TestRollups(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.directory.name, 'test.db')}")
+        Base.metadata.create_all(self.engine)
+        self.sessions = sessionmaker(bind=self.engine, expire_on_commit=False)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def snapshot(self) -> dict:
+        with self.sessions() as session:
+            return {
+                model.__tablename__: sorted(
+                    tuple(str(getattr(row, column.name)) for column in model.__table__.columns)
+                    for row in session.query(model)
+                )
+                for model in ROLLUP_MODELS
+            }
+
+    def write_through_writer(self, count: int):
+        writer = AttemptWriter(self.sessions, batch_size=40, batch_window=0.05)
+        writer.add_transaction_hook(update_rollups)
+        try:
+            for i in range(count):
+                writer.write(LoginAttempt, **attempt_values(i))
+            writer.flush()
+        finally:
+            writer.stop()
+
+    def test_incremental_matches_rebuild(self):
+        """Test that rollups maintained batch by batch equal a rebuild from the raw attempts."""
+        self.write_through_writer(300)
+        incremental = self.snapshot()
+        self.assertTrue(all(incremental.values()))
+
+        with self.sessions() as session:
+            self.assertEqual(rebuild_rollups(session), 300)
+        self.assertEqual(self.snapshot(), incremental)
+
+        with self.sessions() as session:
+            self.assertEqual(sum(row.count for row in session.query(MinuteRollup)), 300)
+            self.assertEqual(sum(row.count for row in session.query(PasswordRollup)), 300)
+            ip = session.get(IPRollup, "203.0.113.0")
+            self.assertEqual(ip.count, 43)
+            self.assertEqual(ip.first_seen.replace(tzinfo=None), START.replace(tzinfo=None))
+            unknown = session.query(CountryDayRollup).filter_by(country='').all()
+            self.assertEqual(sum(row.count for row in unknown), 100)
+
+    def test_failed_hook_rolls_back_batch(self):
+        """Test that attempts are not committed without their rollup counts."""
+        def failing_hook(session, rows):
+            raise RuntimeError("rollup failed")
+
+        writer = AttemptWriter(self.sessions, batch_size=10, batch_window=0.05)
+        writer.add_transaction_hook(failing_hook)
+        try:
+            writer.write(LoginAttempt, **attempt_values(0))
+            writer.flush()
+            self.assertEqual(writer.get_stats()['rows_dropped'], 1)
+        finally:
+            writer.stop()
+        with self.sessions() as session:
+            self.assertEqual(session.query(LoginAttempt).count(), 0)
+
+    def test_queries(self):
+        """Test the timeline and top-N queries served to the dashboard."""
+        self.write_through_writer(300)
+        with self.sessions() as session:
+            days = get_timeline(session, bucket='day')
+            self.assertEqual({row['bucket'] for row in days}, {'2024-05-31', '2024-06-01'})
+            self.assertEqual(sum(row['count'] for row in days), 300)
+            recent = get_timeline(session, since=START + timedelta(hours=1), bucket='minute')
+            self.assertTrue(all(row['bucket'] >= '2024-06-01T00:58' for row in recent))
+
+            usernames = get_top(session, 'username', limit=2)
+            self.assertEqual(usernames[0]['value'], 'root')
+            self.assertEqual(sum(usernames[0]['protocols'].values()), usernames[0]['count'])
+            self.assertEqual(len(get_top(session, 'password', limit=3)), 3)
+            self.assertEqual(sorted(row['value'] for row in get_top(session, 'country')), ['NL', 'US'])
+            with self.assertRaises(ValueError):
+                get_top(session, 'browser')
+
+if __name__ == '__main__':
+    unittest.main()
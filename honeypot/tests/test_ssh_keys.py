@@ -0,0 +1,34 @@
+import os
+import stat
+import tempfile
+import unittest
+from honeypot.core.ssh_keys import KEY_TYPES, load_host_keys
+
+class TestLoadHostKeys(unittest.TestCase):
+    def setUp(self):
+        self.key_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.key_dir.cleanup()
+
+    def test_keys_are_generated_once(self):
+        """Test that missing keys are generated and reused on the next load."""
+        first = load_host_keys(self.key_dir.name, ['ed25519', 'ecdsa-256'])
+        second = load_host_keys(self.key_dir.name, ['ed25519', 'ecdsa-256'])
+        self.assertEqual([key.get_name() for key in first], ['ssh-ed25519', 'ecdsa-sha2-nistp256'])
+        self.assertEqual([key.asbytes() for key in first], [key.asbytes() for key in second])
+
+    def test_key_files_are_private(self):
+        """Test that generated key files are readable by the owner only."""
+        load_host_keys(self.key_dir.name, ['ed25519'])
+        path = os.path.join(self.key_dir.name, KEY_TYPES['ed25519'][0])
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+        self.assertEqual(os.listdir(self.key_dir.name), [KEY_TYPES['ed25519'][0]])
+
+    def test_unknown_key_type(self):
+        """Test that an unsupported key type is rejected."""
+        with self.assertRaises(ValueError):
+            load_host_keys(self.key_dir.name, ['dsa'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import socket
+import unittest
+from unittest import mock
+import paramiko
+from honeypot.core.ssh_server import (
+    SSHHoneypot, SERVER_VERSION, PROBE_EMPTY, PROBE_NON_SSH, PROBE_SILENT
+)
+
+class TestClassifyClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.honeypot = SSHHoneypot(host_keys=[paramiko.ECDSAKey.generate(bits=256)])
+
+    def setUp(self):
+        self.server, self.client = socket.socketpair()
+
+    def tearDown(self):
+        self.server.close()
+        self.client.close()
+
+    def test_ssh_client_is_promoted(self):
+        """Test that an SSH identification string is left unread for paramiko."""
+        self.client.sendall(b"SSH-2.0-OpenSSH_9.6\r\n")
+        self.assertEqual(self.honeypot._classify_client(self.server), (None, b''))
+        self.assertEqual(self.client.recv(100), f"{SERVER_VERSION}\r\n".encode())
+        self.assertTrue(self.server.recv(100).startswith(b"SSH-2.0-OpenSSH_9.6"))
+
+    def test_non_ssh_payload(self):
+        """Test that a non-SSH payload is classified and captured."""
+        self.client.sendall(b"GET / HTTP/1.1\r\n\r\n")
+        self.assertEqual(self.honeypot._classify_client(self.server), (PROBE_NON_SSH, b"GET / HTTP/1.1\r\n\r\n"))
+
+    def test_empty_connect(self):
+        """Test that a client closing without sending anything is a banner grab."""
+        self.client.shutdown(socket.SHUT_WR)
+        self.assertEqual(self.honeypot._classify_client(self.server), (PROBE_EMPTY, b''))
+
+    def test_silent_and_partial_clients(self):
+        """Test the banner deadline with no data, a short non-SSH payload and a partial SSH identification."""
+        with mock.patch('honeypot.core.ssh_server.SSH_BANNER_TIMEOUT', 0.2):
+            self.assertEqual(self.honeypot._classify_client(self.server), (PROBE_SILENT, b''))
+            self.client.sendall(b"\x16")
+            self.assertEqual(self.honeypot._classify_client(self.server), (PROBE_NON_SSH, b"\x16"))
+            self.client.sendall(b"SS")
+            self.assertEqual(self.honeypot._classify_client(self.server), (None, b''))
+            # The partial identification is left unread for paramiko
+            self.server.setblocking(True)
+            self.assertEqual(self.server.recv(100), b"SS")
+
+if __name__ == '__main__':
+    unittest.main()
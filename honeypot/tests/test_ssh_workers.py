@@ -0,0 +1,70 @@
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import paramiko
+from honeypot.core import base_server
+from honeypot.core.ssh_keys import load_host_keys
+from honeypot.core.ssh_server import SERVER_VERSION
+from honeypot.core.ssh_workers import SSHHandshakePool
+
+class TestSSHHandshakePool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Worker processes read their configuration from the environment
+        cls.key_dir = tempfile.TemporaryDirectory()
+        cls.environ = mock.patch.dict(os.environ, SSH_HOST_KEY_DIR=cls.key_dir.name, SSH_HOST_KEY_TYPES='ecdsa-256')
+        cls.environ.start()
+        cls.host_key = load_host_keys(cls.key_dir.name, ['ecdsa-256'])[0]
+        cls.pool = SSHHandshakePool(1)
+        cls.pool.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.stop()
+        cls.environ.stop()
+        cls.key_dir.cleanup()
+
+    def setUp(self):
+        self.attempts = []
+        self.recorded = threading.Event()
+
+        def sink(protocol, username, password, client_ip):
+            self.attempts.append((protocol.value, username, password, client_ip))
+            self.recorded.set()
+
+        base_server.set_attempt_sink(sink)
+
+    def tearDown(self):
+        base_server.set_attempt_sink(None)
+
+    def test_worker_reports_credentials(self):
+        """Test that a handshake passed to a worker process reports the login back."""
+        server, client = socket.socketpair()
+        # The accepting process sends the banner before handing the connection over
+        server.sendall(f"{SERVER_VERSION}\r\n".encode())
+        result = {}
+        waiter = threading.Thread(target=lambda: result.update(
+            handled=self.pool.handshake(server, "198.51.100.7")
+        ))
+        waiter.start()
+
+        transport = paramiko.Transport(client)
+        try:
+            transport.start_client(timeout=30)
+            self.assertEqual(transport.get_remote_server_key().asbytes(), self.host_key.asbytes())
+            transport.auth_password("root", "toor")
+        finally:
+            transport.close()
+            client.close()
+
+        waiter.join(30)
+        server.close()
+        self.assertTrue(result.get('handled'))
+        self.assertTrue(self.recorded.wait(5))
+        self.assertEqual(self.attempts, [("ssh", "root", "toor", "198.51.100.7")])
+
+if __name__ == '__main__':
+    unittest.main()
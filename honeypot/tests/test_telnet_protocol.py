@@ -0,0 +1,75 @@
+import unittest
+from honeypot.core.line_reader import LineTooLongError
+from honeypot.core.telnet_protocol import (
+    TelnetParser, TelnetProtocolError, command,
+    IAC, DO, DONT, WILL, WONT, SB, SE, ECHO, SUPPRESS_GO_AHEAD, LINEMODE
+)
+
+class TestTelnetParser(unittest.TestCase):
+    def setUp(self):
+        self.parser = TelnetParser(
+            offered=(ECHO, SUPPRESS_GO_AHEAD),
+            requested=(ECHO, SUPPRESS_GO_AHEAD)
+        )
+    
+    def lines(self):
+        """Drain all completed lines from the parser."""
+        result = []
+        while (line := self.parser.next_line()) is not None:
+            result.append(line)
+        return result
+    
+    def test_mirai_style_burst(self):
+        """Test that negotiation and credentials in one chunk yield lines and one reply batch."""
+        data = (command(WILL, 24) + command(WILL, 31) + command(DO, ECHO) +
+                b"root\r\nxc3511\r\n")
+        replies = self.parser.feed(data)
+        self.assertEqual(replies, command(DONT, 24) + command(DONT, 31))
+        self.assertEqual(self.lines(), [b"root", b"xc3511"])
+    
+    def test_sequences_split_across_chunks(self):
+        """Test that IAC sequences and line endings may be split between chunks."""
+        data = command(DO, LINEMODE) + b"adm" + bytes([IAC]) + b"\xff" + b"in\r\n"
+        replies = b"".join(self.parser.feed(data[i:i + 1]) for i in range(len(data)))
+        self.assertEqual(replies, command(WONT, LINEMODE))
+        self.assertEqual(self.lines(), [b"adm\xffin"])
+    
+    def test_replies_once_per_option(self):
+        """Test that repeated option requests are only answered once."""
+        replies = self.parser.feed(command(DO, LINEMODE) * 50)
+        self.assertEqual(replies, command(WONT, LINEMODE))
+        self.assertEqual(self.parser.feed(command(WONT, ECHO) + command(DONT, 5)), b"")
+    
+    def test_skips_subnegotiation(self):
+        """Test that subnegotiation payloads are skipped, including escaped IACs."""
+        data = bytes([IAC, SB, 24, 0]) + b"xterm\xff\xff" + bytes([IAC, SE]) + b"user\n"
+        self.assertEqual(self.parser.feed(data), b"")
+        self.assertEqual(self.lines(), [b"user"])
+    
+    def test_caps_subnegotiation_length(self):
+        """Test that an unterminated subnegotiation is rejected once over the limit."""
+        parser = TelnetParser(max_subnegotiation_length=64)
+        parser.feed(bytes([IAC, SB, 24]))
+        with self.assertRaises(TelnetProtocolError):
+            for _ in range(10):
+                parser.feed(b"A" * 16)
+    
+    def test_cr_nul_ends_line(self):
+        """Test that CR NUL, as sent by some clients, ends a line."""
+        self.parser.feed(b"guest\r\x00pass\r\n")
+        self.assertEqual(self.lines(), [b"guest", b"pass"])
+    
+    def test_caps_line_length(self):
+        """Test that an oversized line raises instead of buffering."""
+        parser = TelnetParser(max_line_length=8)
+        with self.assertRaises(LineTooLongError):
+            parser.feed(b"A" * 32)
+    
+    def test_pending_returns_partial_line(self):
+        """Test that the unterminated line is available on EOF."""
+        self.parser.feed(b"partial")
+        self.assertIsNone(self.parser.next_line())
+        self.assertEqual(self.parser.pending(), b"partial")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,264 @@
+import socket
+import threading
+import time
+import unittest
+from honeypot.core.thread_manager import (
+    AdmissionQueue, ConnectionHandle, ConnectionRegistry, ThreadManager, TimerWheel,
+    DROP_NEWEST, DROP_OLDEST, PREFER_NEW_IPS
+)
+
+class TestConnectionRegistry(unittest.TestCase):
+    def test_enforces_per_ip_limit(self):
+        """Test that an IP at its limit is rejected until a slot is freed."""
+        registry = ConnectionRegistry(max_connections_per_ip=2)
+        first = registry.register("10.0.0.1")
+        second = registry.register("10.0.0.1")
+        self.assertIsNotNone(first)
+        self.assertIsNotNone(second)
+        self.assertIsNone(registry.register("10.0.0.1"))
+        self.assertIsNotNone(registry.register("10.0.0.2"))
+
+        registry.unregister(first)
+        self.assertIsNotNone(registry.register("10.0.0.1"))
+
+    def test_counts_are_exact(self):
+        """Test that live counts drop back to zero once handles are removed."""
+        registry = ConnectionRegistry(max_connections_per_ip=5)
+        handles = [registry.register(f"10.0.0.{i % 3}") for i in range(9)]
+        self.assertEqual(registry.count(), 9)
+        self.assertEqual(registry.unique_ips(), 3)
+        self.assertEqual(registry.count("10.0.0.0"), 3)
+
+        for handle in handles:
+            self.assertTrue(registry.unregister(handle))
+        self.assertEqual(registry.count(), 0)
+        self.assertEqual(registry.unique_ips(), 0)
+        self.assertEqual(registry.connections_by_ip(), {})
+
+    def test_unregister_twice(self):
+        """Test that removing a handle twice is harmless."""
+        registry = ConnectionRegistry(max_connections_per_ip=5)
+        handle = registry.register("10.0.0.1")
+        self.assertTrue(registry.unregister(handle))
+        self.assertFalse(registry.unregister(handle))
+        self.assertEqual(registry.count(), 0)
+
+class TestTimerWheel(unittest.TestCase):
+    def test_fires_only_due_handles(self):
+        """Test that advancing the wheel returns exactly the expired handles."""
+        wheel = TimerWheel(tick=1.0, slots=8)
+        now = time.time()
+        soon = ConnectionHandle(1, "10.0.0.1")
+        later = ConnectionHandle(2, "10.0.0.2")
+        wheel.schedule(soon, now + 2)
+        wheel.schedule(later, now + 5)
+
+        self.assertEqual(wheel.advance(now + 3), [soon])
+        self.assertEqual(wheel.advance(now + 3), [])
+        self.assertEqual(wheel.advance(now + 6), [later])
+        self.assertEqual(len(wheel), 0)
+
+    def test_deadline_beyond_one_turn(self):
+        """Test that a deadline further out than the ring survives earlier turns."""
+        wheel = TimerWheel(tick=1.0, slots=4)
+        now = time.time()
+        handle = ConnectionHandle(1, "10.0.0.1")
+        wheel.schedule(handle, now + 10)
+
+        self.assertEqual(wheel.advance(now + 5), [])
+        self.assertEqual(wheel.advance(now + 9), [])
+        self.assertEqual(wheel.advance(now + 11), [handle])
+
+    def test_cancel_and_reschedule(self):
+        """Test that cancelled handles never fire and rescheduling moves them."""
+        wheel = TimerWheel(tick=1.0, slots=8)
+        now = time.time()
+        cancelled = ConnectionHandle(1, "10.0.0.1")
+        moved = ConnectionHandle(2, "10.0.0.2")
+        wheel.schedule(cancelled, now + 2)
+        wheel.schedule(moved, now + 2)
+        wheel.cancel(cancelled)
+        wheel.schedule(moved, now + 6)
+
+        self.assertEqual(wheel.advance(now + 3), [])
+        self.assertEqual(wheel.advance(now + 7), [moved])
+
+class TestAdmissionQueue(unittest.TestCase):
+    def fill(self, queue, ips):
+        handles = [ConnectionHandle(i, ip) for i, ip in enumerate(ips)]
+        return handles, [queue.put(handle, lambda: None) for handle in handles]
+
+    def test_drop_newest(self):
+        """Test that drop-newest rejects arrivals once the queue is full."""
+        queue = AdmissionQueue(2, DROP_NEWEST)
+        handles, shed = self.fill(queue, ["10.0.0.1", "10.0.0.2", "10.0.0.3"])
+        self.assertEqual(shed, [None, None, handles[2]])
+        self.assertEqual(queue.get()[0], handles[0])
+        self.assertEqual(queue.shed_counts[DROP_NEWEST], 1)
+
+    def test_drop_oldest(self):
+        """Test that drop-oldest evicts the connection that waited longest."""
+        queue = AdmissionQueue(2, DROP_OLDEST)
+        handles, shed = self.fill(queue, ["10.0.0.1", "10.0.0.2", "10.0.0.3"])
+        self.assertEqual(shed, [None, None, handles[0]])
+        self.assertEqual([queue.get()[0], queue.get()[0]], handles[1:])
+        self.assertEqual(queue.shed_counts[DROP_OLDEST], 1)
+
+    def test_prefer_new_ips(self):
+        """Test that first-time IPs displace returning IPs but not each other."""
+        queue = AdmissionQueue(2, PREFER_NEW_IPS)
+        handles, shed = self.fill(queue, ["10.0.0.1", "10.0.0.1", "10.0.0.2", "10.0.0.3"])
+        # The returning 10.0.0.1 makes room for 10.0.0.2; 10.0.0.3 finds only first-time IPs
+        self.assertEqual(shed, [None, None, handles[1], handles[3]])
+        self.assertEqual([queue.get()[0], queue.get()[0]], [handles[0], handles[2]])
+
+    def test_quota_prefers_pools_under_quota(self):
+        """Test that a pool at its quota yields to waiting pools but borrows when alone."""
+        queue = AdmissionQueue(10)
+        queue.set_quota("ssh", 1)
+        ssh = [ConnectionHandle(i, "10.0.0.1") for i in range(3)]
+        telnet = ConnectionHandle(9, "10.0.0.2")
+        for handle in ssh:
+            queue.put(handle, lambda: None, "ssh")
+        queue.put(telnet, lambda: None, "telnet")
+
+        self.assertEqual(queue.get()[0], ssh[0])
+        # ssh is at its quota, so the later telnet connection goes first
+        self.assertEqual(queue.get()[0], telnet)
+        # Nothing else is waiting, so ssh borrows an idle worker
+        self.assertEqual(queue.get()[0], ssh[1])
+        self.assertEqual(queue.pool_stats()["ssh"], {'running': 2, 'queued': 1, 'quota': 1})
+
+        queue.task_done("ssh")
+        queue.task_done("ssh")
+        self.assertEqual(queue.pool_stats()["ssh"]['running'], 0)
+
+    def test_close_drains_queue(self):
+        """Test that get() keeps returning queued work after close, then None."""
+        queue = AdmissionQueue(2)
+        handles, _ = self.fill(queue, ["10.0.0.1"])
+        queue.close()
+        self.assertEqual(queue.get()[0], handles[0])
+        self.assertIsNone(queue.get())
+        with self.assertRaises(RuntimeError):
+            queue.put(ConnectionHandle(9, "10.0.0.9"), lambda: None)
+
+class TestThreadManagerTracking(unittest.TestCase):
+    def setUp(self):
+        self.manager = ThreadManager(max_workers=4, max_connections_per_ip=2, connection_timeout=60)
+
+    def tearDown(self):
+        self.manager.shutdown()
+
+    def test_handler_touches_its_own_connection(self):
+        """Test that update_activity inside a handler touches only that connection."""
+        idle = self.manager.acquire_connection("10.0.0.1")
+        idle.last_activity = 0
+        seen = {}
+        done = threading.Event()
+
+        def handler():
+            handle = self.manager.current_connection()
+            handle.last_activity = 0
+            self.manager.update_activity("10.0.0.1")
+            seen['handle'] = handle
+            seen['last_activity'] = handle.last_activity
+            done.set()
+
+        self.assertTrue(self.manager.submit_connection(handler, "10.0.0.1"))
+        self.assertTrue(done.wait(5))
+        self.assertGreater(seen['last_activity'], 0)
+        self.assertEqual(seen['handle'].client_ip, "10.0.0.1")
+        self.assertEqual(idle.last_activity, 0)
+        self.manager.release_connection(idle)
+
+    def test_full_queue_sheds_without_leaking_slots(self):
+        """Test that shed connections are rejected and release their slots."""
+        manager = ThreadManager(max_workers=1, max_connections_per_ip=10, max_queued_connections=1)
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocker():
+            started.set()
+            release.wait(5)
+
+        try:
+            self.assertTrue(manager.submit_connection(blocker, "10.0.0.1"))
+            self.assertTrue(started.wait(5))
+            self.assertTrue(manager.submit_connection(lambda: None, "10.0.0.2"))
+            self.assertFalse(manager.submit_connection(lambda: None, "10.0.0.3"))
+
+            stats = manager.get_stats()
+            self.assertEqual(stats['queue_depth'], 1)
+            self.assertEqual(stats['shed_total'], 1)
+            self.assertEqual(stats['active_connections'], 2)
+        finally:
+            release.set()
+            manager.shutdown()
+        self.assertEqual(manager.get_stats()['active_connections'], 0)
+
+    def test_finished_connections_are_released(self):
+        """Test that completed handlers leave no tracked connections behind."""
+        for _ in range(10):
+            while not self.manager.submit_connection(lambda: None, "10.0.0.1"):
+                time.sleep(0.01)
+
+        deadline = time.time() + 5
+        while self.manager.get_stats()['active_connections'] and time.time() < deadline:
+            time.sleep(0.01)
+        stats = self.manager.get_stats()
+        self.assertEqual(stats['active_connections'], 0)
+        self.assertEqual(stats['unique_ips'], 0)
+
+class TestThreadManagerDeadlines(unittest.TestCase):
+    def setUp(self):
+        self.manager = ThreadManager(max_workers=2, connection_timeout=1, tick_interval=0.1)
+        self.server, self.client = socket.socketpair()
+
+    def tearDown(self):
+        self.manager.shutdown()
+        self.server.close()
+        self.client.close()
+
+    def test_idle_socket_is_shut_down(self):
+        """Test that a handler blocked on an idle socket is woken and its slot freed."""
+        result = {}
+
+        def handler(sock):
+            result['data'] = sock.recv(1024)
+
+        self.assertTrue(self.manager.submit_connection(
+            handler, "10.0.0.1", self.server, client_socket=self.server
+        ))
+
+        deadline = time.time() + 5
+        while self.manager.get_stats()['active_connections'] and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(result.get('data'), b'')
+        self.assertEqual(self.manager.get_stats()['active_connections'], 0)
+        self.assertEqual(self.manager.get_stats()['expired_connections'], 1)
+
+    def test_activity_extends_deadline(self):
+        """Test that touching a connection keeps it open past the idle timeout."""
+        handle = self.manager.acquire_connection("10.0.0.1", closer=lambda: None)
+        end = time.time() + 1.5
+        while time.time() < end:
+            handle.touch()
+            time.sleep(0.1)
+        self.assertEqual(self.manager.get_stats()['expired_connections'], 0)
+        self.manager.release_connection(handle)
+
+    def test_max_lifetime_closes_active_connection(self):
+        """Test that the absolute deadline applies even to active connections."""
+        self.manager.connection_max_lifetime = 0.5
+        closed = threading.Event()
+        handle = self.manager.acquire_connection("10.0.0.1", closer=closed.set)
+        end = time.time() + 3
+        while not closed.is_set() and time.time() < end:
+            handle.touch()
+            time.sleep(0.05)
+        self.assertTrue(closed.is_set())
+        self.manager.release_connection(handle)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,22 +3,32 @@ import json
 from fastapi import FastAPI, WebSocket, Depends, Request, Response, BackgroundTasks
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict, Set, Any
+from typing import List, Dict, Set, Any, Iterator, Optional, Tuple
 from pathlib import Path
 from honeypot.core.config import TEMPLATE_DIR, STATIC_DIR, HOST, WEB_PORT, SSH_PORT, TELNET_PORT, FTP_PORT, SMTP_PORT, RDP_PORT, SIP_PORT, MYSQL_PORT
-from honeypot.database.models import get_db, LoginAttempt
+from honeypot.database.models import (
+    get_read_db, LoginAttempt, ReadSessionLocal, dimension_cache, query_attempts_in_network, query_client_ips
+)
+from honeypot.database.writer import attempt_deduplicator, attempt_enricher, attempt_writer
+from honeypot.database.rollups import get_timeline, get_top
+from honeypot.database.archive import attempt_archiver
+from honeypot.database.blocklist import ip_blocklist
+from honeypot.core.geolocation import geolocation_service
+from honeypot.web.exports import attempt_records, csv_lines, json_lines, stream_lines
 from honeypot.core.system_monitor import SystemMonitor
+from honeypot.core.thread_manager import thread_manager
 from honeypot.web.utility import versioned_static
 from honeypot.web.static_handler import VersionedStaticFiles
-import ipaddress
 import logging
 import asyncio
+import ipaddress
 import os
 import time
 import weakref
 from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
 
 logger = logging.getLogger(__name__)
 
@@ -248,6 +258,9 @@ class ConnectionManager:
 # Initialize connection manager
 connection_manager = ConnectionManager()
 
+# Event loop serving the web interface, set when it starts; the WebSockets belong to it
+web_loop: Optional[asyncio.AbstractEventLoop] = None
+
 # For backwards compatibility, maintain a list view of active connections
 @property
 def active_connections() -> List[WebSocket]:
@@ -256,6 +269,9 @@ def active_connections() -> List[WebSocket]:
 @app.on_event("startup")
 async def startup_event():
     """Run startup tasks"""
+    global web_loop
+    web_loop = asyncio.get_running_loop()
+    
     # Check for psutil for memory monitoring
     try:
         import psutil
@@ -291,8 +307,13 @@ async def get_server_location():
     location = system_monitor.get_server_location()
     return JSONResponse(location)
 
+@app.get("/api/system/connections")
+async def get_connection_stats():
+    """Get honeypot connection, worker and admission queue statistics."""
+    return JSONResponse(thread_manager.get_stats())
+
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket, db: Session = Depends(get_db)):
+async def websocket_endpoint(websocket: WebSocket, db: Session = Depends(get_read_db)):
     """Handle WebSocket connections."""
     client_info = f"{websocket.client.host}:{websocket.client.port}"
     logger.info(f"New WebSocket connection from {client_info}")
@@ -449,9 +470,22 @@ async def websocket_endpoint(websocket: WebSocket, db: Session = Depends(get_db)
         except Exception as cleanup_err:
             logger.error(f"Error during connection cleanup: {str(cleanup_err)}")
 
+def get_system_metrics_payload() -> Dict[str, Any]:
+    """Get system metrics together with the honeypot connection statistics."""
+    metrics = dict(system_monitor.get_system_metrics())
+    metrics['honeypot'] = thread_manager.get_stats()
+    metrics['database_writer'] = attempt_writer.get_stats()
+    metrics['dimension_cache'] = dimension_cache.get_stats()
+    metrics['attempt_dedup'] = attempt_deduplicator.get_stats()
+    metrics['enrichment'] = attempt_enricher.get_stats()
+    metrics['archive'] = attempt_archiver.get_stats()
+    metrics['blocklist'] = ip_blocklist.get_stats()
+    metrics['geolocation'] = geolocation_service.get_stats()
+    return metrics
+
 async def send_system_metrics(websocket: WebSocket):
     """Send system metrics to a specific client."""
-    metrics = system_monitor.get_system_metrics()
+    metrics = get_system_metrics_payload()
     message = {
         'type': 'system_metrics',
         'data': metrics
@@ -560,7 +594,7 @@ async def send_periodic_updates(websocket: WebSocket):
                 # Send metrics to client
                 message = {
                     'type': 'system_metrics',
-                    'data': metrics
+                    'data': get_system_metrics_payload()
                 }
                 await connection_manager.send_text(websocket, json.dumps(message))
                 
@@ -602,7 +636,7 @@ async def send_periodic_updates(websocket: WebSocket):
         # Don't need to remove from connections here as send_text will handle it
 
 @app.get("/api/attempts")
-def get_attempts(db: Session = Depends(get_db)):
+def get_attempts(db: Session = Depends(get_read_db)):
     """Get all login attempts (legacy endpoint).
     
     WebSocket connection is the required method for retrieving attempts.
@@ -638,369 +672,351 @@ def get_attempts(db: Session = Depends(get_db)):
         logger.error(f"Error retrieving attempts: {str(e)}")
         return JSONResponse({"error": "Failed to retrieve login attempts"}, status_code=500)
 
-@app.get("/api/export/plaintext")
-def export_plaintext(db: Session = Depends(get_db), download: bool = False):
-    """Export all login attempts in plaintext format."""
+@app.get("/api/attempts/range")
+def get_attempts_in_range(cidr: str, db: Session = Depends(get_read_db), limit: int = 1000):
+    """Get the client IPs and newest login attempts from a CIDR range.
+    
+    Both lookups are index range scans on the packed client addresses.
+    
+    Args:
+        cidr: Network such as 45.148.10.0/24 or 2001:db8::/32
+        limit: Maximum number of attempts, at most 10000
+    """
     try:
-        # Use an explicit transaction
-        db.begin()
-        
-        # Only select distinct IPs directly in the query for efficiency
-        ips = db.query(LoginAttempt.client_ip).distinct().all()
-        
-        # Convert IPs to a list and sort them numerically using ipaddress module
-        ip_list = sorted([ip[0] for ip in ips], key=lambda x: int(ipaddress.ip_address(x)))
-        ip_text = "\n".join(ip_list)
-        
-        # Explicitly commit to ensure transaction is closed
-        db.commit()
-        
-        if download:
-            return PlainTextResponse(ip_text, headers={
-                "Content-Disposition": "attachment; filename=attempted_ips.txt"
-            })
-        return PlainTextResponse(ip_text)
+        ips = [ip[0] for ip in query_client_ips(db, network=cidr)]
+        attempts = query_attempts_in_network(db, cidr).limit(max(1, min(limit, 10000))).all()
+        return JSONResponse({
+            "cidr": cidr,
+            "ips": ips,
+            "attempts": [attempt.to_dict() for attempt in attempts]
+        })
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
     except Exception as e:
-        # Ensure transaction is rolled back on error
-        db.rollback()
-        logger.error(f"Error exporting plaintext: {str(e)}")
+        logger.error(f"Error retrieving attempts for {cidr}: {str(e)}")
+        return JSONResponse({"error": "Failed to retrieve login attempts"}, status_code=500)
+
+@app.get("/api/rollups/timeline")
+def get_rollup_timeline(db: Session = Depends(get_read_db), bucket: str = "hour", hours: Optional[float] = 24):
+    """Get login attempts per protocol per minute, hour or day from the rollup tables.
+    
+    Args:
+        bucket: 'minute', 'hour' or 'day'
+        hours: How far back to look, omit for all time
+    """
+    since = datetime.now(ZoneInfo("UTC")) - timedelta(hours=hours) if hours else None
+    try:
+        return JSONResponse(get_timeline(db, since=since, bucket=bucket))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        logger.error(f"Error reading timeline rollup: {str(e)}")
+        return JSONResponse({"error": "Failed to read timeline"}, status_code=500)
+
+@app.get("/api/rollups/top")
+def get_rollup_top(db: Session = Depends(get_read_db), dimension: str = "username", limit: int = 10,
+                   days: Optional[int] = None):
+    """Get the most frequent usernames, passwords, IPs or countries from the rollup tables.
+    
+    Args:
+        dimension: 'username', 'password', 'ip' or 'country'
+        limit: Maximum number of values, at most 1000
+        days: For countries, only count the last N days
+    """
+    since = datetime.now(ZoneInfo("UTC")) - timedelta(days=days) if days else None
+    try:
+        return JSONResponse(get_top(db, dimension, limit=max(1, min(limit, 1000)), since=since))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        logger.error(f"Error reading {dimension} rollup: {str(e)}")
+        return JSONResponse({"error": "Failed to read rollup"}, status_code=500)
+
+# New sessions for the streaming exports, which outlive the request's session
+ExportSession = ReadSessionLocal.session_factory
+
+def _export_response(body: Iterator[str], media_type: str, download: bool, filename: str) -> StreamingResponse:
+    """Stream an export, as an attachment when downloading."""
+    headers = {"Content-Disposition": f"attachment; filename={filename}"} if download else None
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag, ignoring weak validator prefixes."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+def _blocklist_response(request: Request, name: str, formatter, aggregate: bool, download: bool,
+                        filename: str) -> Response:
+    """Answer a blocklist export from the in-memory blocklist, or with 304 if the client's copy is current."""
+    try:
+        etag, text = ip_blocklist.render(name, formatter, aggregate)
+    except Exception as e:
+        logger.error(f"Error exporting {name}: {str(e)}")
         return PlainTextResponse(f"Error exporting data: {str(e)}", status_code=500)
+    
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if download:
+        headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return PlainTextResponse(text, headers=headers)
+
+def _generated_on() -> str:
+    """Format the current local time for the header of a generated export."""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def _split_ip_versions(entries: List[str]) -> Tuple[List[str], List[str]]:
+    """Split addresses and networks into IPv4 and IPv6, dropping values that are neither."""
+    ipv4, ipv6 = [], []
+    for entry in entries:
+        try:
+            network = ipaddress.ip_network(entry, strict=False)
+        except ValueError:
+            continue
+        if network.version == 6 and network.prefixlen == 128 and network.network_address.ipv4_mapped:
+            ipv4.append(str(network.network_address.ipv4_mapped))
+        else:
+            (ipv4 if network.version == 4 else ipv6).append(entry)
+    return ipv4, ipv6
+
+def _plaintext_list(entries: List[str], count: int) -> str:
+    """Render addresses one per line."""
+    return "\n".join(entries)
+
+@app.get("/api/export/plaintext")
+def export_plaintext(request: Request, download: bool = False, aggregate: bool = False):
+    """Export all attempted IPs in plaintext format, optionally merged into CIDR networks."""
+    return _blocklist_response(request, "plaintext", _plaintext_list, aggregate, download, "attempted_ips.txt")
 
 @app.get("/api/export/json")
-def export_json(db: Session = Depends(get_db), download: bool = False):
+def export_json(download: bool = False):
     """Export all login attempts in JSON format."""
     try:
-        # Use an explicit transaction with chunked processing
-        db.begin()
-        
-        # Get total count for chunking
-        total_count = db.query(LoginAttempt).count()
-        attempts_data = []
-        
-        # Process large results in chunks to avoid memory issues
-        CHUNK_SIZE = 5000
-        
-        if total_count > CHUNK_SIZE:
-            logger.info(f"Processing large JSON export ({total_count} records) in chunks")
-            
-            for offset in range(0, total_count, CHUNK_SIZE):
-                chunk = db.query(LoginAttempt).limit(CHUNK_SIZE).offset(offset).all()
-                
-                for attempt in chunk:
-                    attempt_dict = {
-                        "client_ip": attempt.client_ip,
-                        "username": attempt.username,
-                        "password": attempt.password,
-                        "protocol": attempt.protocol.value if attempt.protocol else None,
-                        "country": attempt.country,
-                        "city": attempt.city,
-                        "region": attempt.region,
-                        "latitude": attempt.latitude,
-                        "longitude": attempt.longitude
-                    }
-                    
-                    # Handle timestamp conversion safely
-                    if attempt.timestamp:
-                        attempt_dict["timestamp"] = attempt.timestamp.isoformat()
-                    else:
-                        attempt_dict["timestamp"] = None
-                        
-                    attempts_data.append(attempt_dict)
-                
-                # Clear SQLAlchemy's identity map between chunks
-                db.expire_all()
-        else:
-            # Small enough to process at once
-            attempts = db.query(LoginAttempt).all()
-            
-            for attempt in attempts:
-                attempt_dict = {
-                    "client_ip": attempt.client_ip,
-                    "username": attempt.username,
-                    "password": attempt.password,
-                    "protocol": attempt.protocol.value if attempt.protocol else None,
-                    "country": attempt.country,
-                    "city": attempt.city,
-                    "region": attempt.region,
-                    "latitude": attempt.latitude,
-                    "longitude": attempt.longitude
-                }
-                
-                # Handle timestamp conversion safely
-                if attempt.timestamp:
-                    attempt_dict["timestamp"] = attempt.timestamp.isoformat()
-                else:
-                    attempt_dict["timestamp"] = None
-                    
-                attempts_data.append(attempt_dict)
-        
-        # Explicitly commit to ensure transaction is closed
-        db.commit()
-        
-        # Generate JSON response with streaming for large datasets
-        json_data = json.dumps(attempts_data, indent=2)
-        
-        if download:
-            return Response(
-                json_data,
-                media_type="application/json",
-                headers={"Content-Disposition": "attachment; filename=login_attempts.json"}
-            )
-        return Response(json_data, media_type="application/json")
+        records = attempt_records(ExportSession)
     except Exception as e:
-        # Ensure transaction is rolled back on error
-        db.rollback()
         logger.error(f"Error exporting JSON: {str(e)}")
         return JSONResponse({"error": f"Failed to export data: {str(e)}"}, status_code=500)
+    
+    return _export_response(stream_lines([json_lines(records)], "JSON"), "application/json", download,
+                            "login_attempts.json")
 
 @app.get("/api/export/csv")
-def export_csv(db: Session = Depends(get_db), download: bool = False):
+def export_csv(download: bool = False):
     """Export all login attempts in CSV format."""
     try:
-        # Use an explicit transaction with chunked processing
-        db.begin()
-        
-        # Get total count for chunking
-        total_count = db.query(LoginAttempt).count()
-        
-        # Create CSV header
-        csv_data = "timestamp,protocol,client_ip,username,password,country,city,region,latitude,longitude\n"
-        
-        def escape_field(value):
-            """Helper to properly escape and quote CSV fields."""
-            if value is None or value == "":
-                return ""
-            # Replace double quotes with two double quotes and wrap in quotes
-            return '"{}"'.format(str(value).replace('"', '""'))
-        
-        # Process large results in chunks to avoid memory issues
-        CHUNK_SIZE = 5000
-        
-        if total_count > CHUNK_SIZE:
-            logger.info(f"Processing large CSV export ({total_count} records) in chunks")
-            
-            for offset in range(0, total_count, CHUNK_SIZE):
-                chunk = db.query(LoginAttempt).limit(CHUNK_SIZE).offset(offset).all()
-                
-                # Add data rows for current chunk
-                for attempt in chunk:
-                    row = [
-                        attempt.timestamp.isoformat() if attempt.timestamp else "",
-                        attempt.protocol.value if attempt.protocol else "",
-                        attempt.client_ip or "",
-                        escape_field(attempt.username),
-                        escape_field(attempt.password),
-                        escape_field(attempt.country),
-                        escape_field(attempt.city),
-                        escape_field(attempt.region),
-                        str(attempt.latitude) if attempt.latitude is not None else "",
-                        str(attempt.longitude) if attempt.longitude is not None else ""
-                    ]
-                    csv_data += ",".join(row) + "\n"
-                
-                # Clear SQLAlchemy's identity map between chunks
-                db.expire_all()
-        else:
-            # Small enough to process at once
-            attempts = db.query(LoginAttempt).all()
-            
-            # Add data rows
-            for attempt in attempts:
-                row = [
-                    attempt.timestamp.isoformat() if attempt.timestamp else "",
-                    attempt.protocol.value if attempt.protocol else "",
-                    attempt.client_ip or "",
-                    escape_field(attempt.username),
-                    escape_field(attempt.password),
-                    escape_field(attempt.country),
-                    escape_field(attempt.city),
-                    escape_field(attempt.region),
-                    str(attempt.latitude) if attempt.latitude is not None else "",
-                    str(attempt.longitude) if attempt.longitude is not None else ""
-                ]
-                csv_data += ",".join(row) + "\n"
-        
-        # Explicitly commit to ensure transaction is closed
-        db.commit()
-        
-        if download:
-            return Response(
-                csv_data,
-                media_type="text/csv",
-                headers={"Content-Disposition": "attachment; filename=login_attempts.csv"}
-            )
-        return Response(csv_data, media_type="text/csv")
+        records = attempt_records(ExportSession)
     except Exception as e:
-        # Ensure transaction is rolled back on error
-        db.rollback()
         logger.error(f"Error exporting CSV: {str(e)}")
         return PlainTextResponse(f"Error exporting data: {str(e)}", status_code=500)
+    
+    return _export_response(stream_lines([csv_lines(records)], "CSV"), "text/csv", download, "login_attempts.csv")
+
+def _mikrotik_rules(entries: List[str], count: int) -> str:
+    """Render MikroTik firewall address-list and drop rules for the addresses."""
+    lines = ["# Honeypotter - Mikrotik Firewall Rules", 
+             "# Generated on: " + _generated_on(),
+             "# Total IPs: " + str(count),
+             "",
+             "# Add address list",
+             "/ip firewall address-list"]
+    
+    # Add each IP or network to the address list
+    lines.extend(f"add address={entry} list=honeypot-blacklist comment=\"Honeypotter detected attack\""
+                 for entry in entries)
+    
+    # Add firewall filter rule if it doesn't exist
+    lines.extend([
+        "",
+        "# Add firewall filter rule (run once)",
+        "/ip firewall filter",
+        "add chain=input src-address-list=honeypot-blacklist action=drop comment=\"Block Honeypotter detected attacks\" place-before=0"
+    ])
+    return "\n".join(lines)
 
 @app.get("/api/export/mikrotik")
-def export_mikrotik(db: Session = Depends(get_db), download: bool = False):
+def export_mikrotik(request: Request, download: bool = False, aggregate: bool = False):
     """Export Mikrotik router firewall rules to block all attempted IPs."""
-    try:
-        # Use an explicit transaction
-        db.begin()
-        
-        # Only select distinct IPs directly in the query for efficiency
-        ips = db.query(LoginAttempt.client_ip).distinct().all()
-        
-        # Convert IPs to a list and sort them numerically using ipaddress module
-        ip_list = sorted([ip[0] for ip in ips], key=lambda x: int(ipaddress.ip_address(x)))
-        
-        # Generate Mikrotik firewall rules
-        mikrotik_commands = ["# Honeypotter - Mikrotik Firewall Rules", 
-                             "# Generated on: " + datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                             "# Total IPs: " + str(len(ip_list)),
-                             "",
-                             "# Add address list",
-                             "/ip firewall address-list"]
-        
-        # Add each IP to the address list
-        for ip in ip_list:
-            mikrotik_commands.append(f"add address={ip} list=honeypot-blacklist comment=\"Honeypotter detected attack\"")
-        
-        # Add firewall filter rule if it doesn't exist
-        mikrotik_commands.extend([
+    return _blocklist_response(request, "Mikrotik rules", _mikrotik_rules, aggregate, download,
+                               "mikrotik_firewall_rules.rsc")
+
+def _iptables_rules(entries: List[str], count: int) -> str:
+    """Render a shell script adding an iptables drop rule per address to a HONEYPOTTER chain."""
+    lines = ["#!/bin/bash", 
+             "# Honeypotter - IPTables Firewall Rules", 
+             "# Generated on: " + _generated_on(),
+             "# Total IPs: " + str(count),
+             "",
+             "# Create a new chain for Honeypotter blocks",
+             "iptables -N HONEYPOTTER 2>/dev/null || iptables -F HONEYPOTTER",
+             "",
+             "# Link the chain to INPUT if not already done",
+             "iptables -C INPUT -j HONEYPOTTER 2>/dev/null || iptables -A INPUT -j HONEYPOTTER",
+             "",
+             "# Block all IPs from honeypot"]
+    
+    # Add each IP or network to the chain
+    lines.extend(f"iptables -A HONEYPOTTER -s {entry} -j DROP" for entry in entries)
+    
+    # Add commands to save rules
+    lines.extend([
+        "",
+        "# Save the rules (uncomment the line for your distribution)",
+        "# Debian/Ubuntu:",
+        "# iptables-save > /etc/iptables/rules.v4",
+        "",
+        "# RHEL/CentOS/Fedora:",
+        "# service iptables save",
+        "",
+        "echo \"IPTables rules for ${#ip_list[@]} IPs have been applied.\""
+    ])
+    return "\n".join(lines)
+
+def _ipset_rules(entries: List[str], count: int) -> str:
+    """Render a shell script loading the addresses into ipset lists matched by one rule per IP version."""
+    lines = ["#!/bin/bash",
+             "# Honeypotter - IPTables Firewall Rules using ipset",
+             "# Generated on: " + _generated_on(),
+             "# Total IPs: " + str(count),
+             "",
+             "# Fill new sets and swap them in, so the old lists stay active until the new ones are complete",
+             "set -e"]
+    for name, family, command, addresses in zip(("honeypotter", "honeypotter6"), ("inet", "inet6"),
+                                               ("iptables", "ip6tables"), _split_ip_versions(entries)):
+        maxelem = max(65536, len(addresses))
+        lines.extend([
             "",
-            "# Add firewall filter rule (run once)",
-            "/ip firewall filter",
-            "add chain=input src-address-list=honeypot-blacklist action=drop comment=\"Block Honeypotter detected attacks\" place-before=0"
+            f"ipset create {name} hash:net family {family} -exist",
+            f"ipset destroy {name}-new 2>/dev/null || true",
+            f"ipset create {name}-new hash:net family {family} maxelem {maxelem}",
+            "ipset restore <<'EOF'"
         ])
-        
-        # Join all commands
-        mikrotik_text = "\n".join(mikrotik_commands)
-        
-        # Explicitly commit to ensure transaction is closed
-        db.commit()
-        
-        if download:
-            return PlainTextResponse(mikrotik_text, headers={
-                "Content-Disposition": "attachment; filename=mikrotik_firewall_rules.rsc"
-            })
-        return PlainTextResponse(mikrotik_text)
-    except Exception as e:
-        # Ensure transaction is rolled back on error
-        db.rollback()
-        logger.error(f"Error exporting Mikrotik rules: {str(e)}")
-        return PlainTextResponse(f"Error exporting data: {str(e)}", status_code=500)
+        lines.extend(f"add {name}-new {address}" for address in addresses)
+        lines.extend([
+            "EOF",
+            f"ipset swap {name}-new {name}",
+            f"ipset destroy {name}-new",
+            f"{command} -C INPUT -m set --match-set {name} src -j DROP 2>/dev/null || "
+            f"{command} -I INPUT -m set --match-set {name} src -j DROP"
+        ])
+    lines.extend([
+        "",
+        "echo \"ipset lists for " + str(count) + " IPs have been applied.\""
+    ])
+    return "\n".join(lines)
 
 @app.get("/api/export/iptables")
-def export_iptables(db: Session = Depends(get_db), download: bool = False):
-    """Export IPTables firewall rules to block all attempted IPs."""
-    try:
-        # Use an explicit transaction
-        db.begin()
-        
-        # Only select distinct IPs directly in the query for efficiency
-        ips = db.query(LoginAttempt.client_ip).distinct().all()
-        
-        # Convert IPs to a list and sort them numerically using ipaddress module
-        ip_list = sorted([ip[0] for ip in ips], key=lambda x: int(ipaddress.ip_address(x)))
-        
-        # Generate IPTables firewall rules
-        iptables_commands = ["#!/bin/bash", 
-                            "# Honeypotter - IPTables Firewall Rules", 
-                            "# Generated on: " + datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            "# Total IPs: " + str(len(ip_list)),
-                            "",
-                            "# Create a new chain for Honeypotter blocks",
-                            "iptables -N HONEYPOTTER 2>/dev/null || iptables -F HONEYPOTTER",
-                            "",
-                            "# Link the chain to INPUT if not already done",
-                            "iptables -C INPUT -j HONEYPOTTER 2>/dev/null || iptables -A INPUT -j HONEYPOTTER",
-                            "",
-                            "# Block all IPs from honeypot"]
-        
-        # Add each IP to the chain
-        for ip in ip_list:
-            iptables_commands.append(f"iptables -A HONEYPOTTER -s {ip} -j DROP")
-        
-        # Add commands to save rules
-        iptables_commands.extend([
-            "",
-            "# Save the rules (uncomment the line for your distribution)",
-            "# Debian/Ubuntu:",
-            "# iptables-save > /etc/iptables/rules.v4",
-            "",
-            "# RHEL/CentOS/Fedora:",
-            "# service iptables save",
-            "",
-            "echo \"IPTables rules for ${#ip_list[@]} IPs have been applied.\""
-        ])
-        
-        # Join all commands
-        iptables_text = "\n".join(iptables_commands)
-        
-        # Explicitly commit to ensure transaction is closed
-        db.commit()
-        
-        if download:
-            return PlainTextResponse(iptables_text, headers={
-                "Content-Disposition": "attachment; filename=honeypotter_iptables.sh"
-            })
-        return PlainTextResponse(iptables_text)
-    except Exception as e:
-        # Ensure transaction is rolled back on error
-        db.rollback()
-        logger.error(f"Error exporting IPTables rules: {str(e)}")
-        return PlainTextResponse(f"Error exporting data: {str(e)}", status_code=500)
+def export_iptables(request: Request, download: bool = False, aggregate: bool = False, ipset: bool = False):
+    """Export IPTables firewall rules to block all attempted IPs, as one rule per IP or as ipset lists."""
+    if ipset:
+        return _blocklist_response(request, "ipset rules", _ipset_rules, aggregate, download,
+                                   "honeypotter_ipset.sh")
+    return _blocklist_response(request, "IPTables rules", _iptables_rules, aggregate, download,
+                               "honeypotter_iptables.sh")
+
+def _nftables_set(name: str, address_type: str, addresses: List[str]) -> List[str]:
+    """Render the lines of an nftables interval set holding the addresses."""
+    lines = [f"    set {name} {{",
+             f"        type {address_type}",
+             "        flags interval"]
+    if addresses:
+        lines.append("        elements = {")
+        lines.append(",\n".join(f"            {address}" for address in addresses))
+        lines.append("        }")
+    lines.append("    }")
+    return lines
+
+def _nftables_rules(entries: List[str], count: int) -> str:
+    """Render an nftables table dropping traffic from the addresses."""
+    ipv4, ipv6 = _split_ip_versions(entries)
+    lines = ["#!/usr/sbin/nft -f",
+             "# Honeypotter - nftables Blocklist",
+             "# Generated on: " + _generated_on(),
+             "# Total IPs: " + str(count),
+             "",
+             "# Replace the honeypotter table in one transaction",
+             "table inet honeypotter",
+             "delete table inet honeypotter",
+             "",
+             "table inet honeypotter {"]
+    lines.extend(_nftables_set("blocklist_v4", "ipv4_addr", ipv4))
+    lines.extend(_nftables_set("blocklist_v6", "ipv6_addr", ipv6))
+    lines.extend([
+        "",
+        "    chain input {",
+        "        type filter hook input priority filter - 10; policy accept;",
+        "        ip saddr @blocklist_v4 drop",
+        "        ip6 saddr @blocklist_v6 drop",
+        "    }",
+        "}"
+    ])
+    return "\n".join(lines)
+
+@app.get("/api/export/nftables")
+def export_nftables(request: Request, download: bool = False, aggregate: bool = False):
+    """Export an nftables table whose sets block all attempted IPs."""
+    return _blocklist_response(request, "nftables rules", _nftables_rules, aggregate, download,
+                               "honeypotter.nft")
+
+def _cisco_config(entries: List[str], count: int) -> str:
+    """Render a Cisco ASA object group and access list denying the addresses."""
+    lines = ["! Honeypotter - Cisco ASA Firewall Configuration", 
+             "! Generated on: " + _generated_on(),
+             "! Total IPs: " + str(count),
+             "!",
+             "! First, create a network object group for the blocked IPs",
+             "object-group network HONEYPOTTER_BLOCKED_IPS"]
+    
+    # Add each IP or network to the object group
+    for entry in entries:
+        if "/" not in entry:
+            lines.append(f" network-object host {entry}")
+        elif ":" in entry:
+            lines.append(f" network-object {entry}")
+        else:
+            network = ipaddress.ip_network(entry)
+            lines.append(f" network-object {network.network_address} {network.netmask}")
+    
+    # Add access control entries
+    lines.extend([
+        "!",
+        "! Apply the access control list to block traffic",
+        "access-list OUTSIDE_IN deny ip object-group HONEYPOTTER_BLOCKED_IPS any",
+        "!",
+        "! If you don't have an access-list applied yet, use something like this:",
+        "! access-group OUTSIDE_IN in interface outside",
+        "!",
+        "! To save the configuration:",
+        "! write memory"
+    ])
+    return "\n".join(lines)
 
 @app.get("/api/export/cisco")
-def export_cisco(db: Session = Depends(get_db), download: bool = False):
+def export_cisco(request: Request, download: bool = False, aggregate: bool = False):
     """Export Cisco ASA firewall configuration to block all attempted IPs."""
-    try:
-        # Use an explicit transaction
-        db.begin()
-        
-        # Only select distinct IPs directly in the query for efficiency
-        ips = db.query(LoginAttempt.client_ip).distinct().all()
-        
-        # Convert IPs to a list and sort them numerically using ipaddress module
-        ip_list = sorted([ip[0] for ip in ips], key=lambda x: int(ipaddress.ip_address(x)))
-        
-        # Generate Cisco ASA firewall configuration
-        cisco_commands = ["! Honeypotter - Cisco ASA Firewall Configuration", 
-                         "! Generated on: " + datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                         "! Total IPs: " + str(len(ip_list)),
-                         "!",
-                         "! First, create a network object group for the blocked IPs",
-                         "object-group network HONEYPOTTER_BLOCKED_IPS"]
-        
-        # Add each IP to the object group
-        for ip in ip_list:
-            cisco_commands.append(f" network-object host {ip}")
-        
-        # Add access control entries
-        cisco_commands.extend([
-            "!",
-            "! Apply the access control list to block traffic",
-            "access-list OUTSIDE_IN deny ip object-group HONEYPOTTER_BLOCKED_IPS any",
-            "!",
-            "! If you don't have an access-list applied yet, use something like this:",
-            "! access-group OUTSIDE_IN in interface outside",
-            "!",
-            "! To save the configuration:",
-            "! write memory"
-        ])
-        
-        # Join all commands
-        cisco_text = "\n".join(cisco_commands)
-        
-        # Explicitly commit to ensure transaction is closed
-        db.commit()
-        
-        if download:
-            return PlainTextResponse(cisco_text, headers={
-                "Content-Disposition": "attachment; filename=honeypotter_cisco_asa.txt"
-            })
-        return PlainTextResponse(cisco_text)
-    except Exception as e:
-        # Ensure transaction is rolled back on error
-        db.rollback()
-        logger.error(f"Error exporting Cisco ASA configuration: {str(e)}")
-        return PlainTextResponse(f"Error exporting data: {str(e)}", status_code=500)
+    return _blocklist_response(request, "Cisco ASA configuration", _cisco_config, aggregate, download,
+                               "honeypotter_cisco_asa.txt")
+
+def schedule_broadcast(coroutine) -> None:
+    """Run a broadcast coroutine on the web interface's event loop from another thread.
+    
+    Broadcasts made before the web interface has started are dropped, since
+    no client can be connected yet.
+    
+    Args:
+        coroutine: The broadcast coroutine, such as broadcast_attempt(attempt)
+    """
+    loop = web_loop
+    if loop is None or loop.is_closed():
+        coroutine.close()
+        return
+    asyncio.run_coroutine_threadsafe(coroutine, loop).add_done_callback(_log_broadcast_failure)
+
+def _log_broadcast_failure(future) -> None:
+    """Log the error a scheduled broadcast ended with, since nothing waits for its result."""
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"Error broadcasting to WebSocket clients: {str(future.exception())}")
 
 async def broadcast_attempt(attempt: dict):
     """Broadcast a login attempt to all connected clients."""
@@ -1016,6 +1032,34 @@ async def broadcast_attempt(attempt: dict):
     logger.debug(f"Broadcast login attempt to {success_count} clients")
     return success_count
 
+async def broadcast_attempt_hits(totals: List[Dict]):
+    """Broadcast new hit counts of deduplicated login attempts to all connected clients.
+    
+    Args:
+        totals: List of {'id', 'hits', 'last_seen'} dicts
+    """
+    message_json = json.dumps({
+        'type': 'attempt_hits',
+        'data': totals
+    })
+    success_count = await connection_manager.broadcast(message_json)
+    logger.debug(f"Broadcast hit counts of {len(totals)} attempts to {success_count} clients")
+    return success_count
+
+async def broadcast_attempt_enriched(enriched: List[Dict]):
+    """Broadcast locations filled in on stored login attempts to all connected clients.
+    
+    Args:
+        enriched: List of {'id', 'client_ip', 'latitude', 'longitude', 'country', 'city', 'region'} dicts
+    """
+    message_json = json.dumps({
+        'type': 'attempt_enriched',
+        'data': enriched
+    })
+    success_count = await connection_manager.broadcast(message_json)
+    logger.debug(f"Broadcast locations of {len(enriched)} attempts to {success_count} clients")
+    return success_count
+
 async def send_data_in_batches(websocket: WebSocket, db: Session):
     """Send login attempts data in batches to a client."""
     client_info = f"{websocket.client.host}:{websocket.client.port}"
@@ -1040,7 +1084,9 @@ async def send_data_in_batches(websocket: WebSocket, db: Session):
             LoginAttempt.longitude,
             LoginAttempt.country,
             LoginAttempt.city,
-            LoginAttempt.region
+            LoginAttempt.region,
+            LoginAttempt.hits,
+            LoginAttempt.last_seen
         ).order_by(LoginAttempt.timestamp.desc())
         
         # Set a statement timeout to prevent long-running queries
@@ -1065,7 +1111,9 @@ async def send_data_in_batches(websocket: WebSocket, db: Session):
                 'longitude': attempt.longitude,
                 'country': attempt.country,
                 'city': attempt.city,
-                'region': attempt.region
+                'region': attempt.region,
+                'hits': attempt.hits or 1,
+                'last_seen': attempt.last_seen.isoformat() if attempt.last_seen else None
             }
             for attempt in attempts
         ]
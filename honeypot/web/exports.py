@@ -0,0 +1,113 @@
+"""Streaming bodies for the JSON and CSV exports."""
+import json
+import logging
+from json.encoder import encode_basestring_ascii
+from itertools import chain
+from typing import Callable, Dict, Iterable, Iterator
+from honeypot.database.archive import attempt_archiver
+from honeypot.database.models import iter_attempt_records
+
+logger = logging.getLogger(__name__)
+
+# Lines joined into each chunk of a streamed export
+EXPORT_BLOCK_LINES = 1000
+
+CSV_HEADER = "timestamp,protocol,client_ip,username,password,country,city,region,latitude,longitude,hits,last_seen"
+
+def stream_lines(parts: Iterable[Iterable[str]], name: str) -> Iterator[str]:
+    """Join lines with newlines, yielding them in blocks.
+
+    The result is the same as "\\n".join() over all lines. Errors after the
+    response has started cannot become an error status, so they are logged
+    and re-raised to cut the response short.
+
+    Args:
+        parts: Iterables of lines, such as a header, the rows and a footer
+        name: The export's name for the error log
+
+    Returns:
+        Iterator of text blocks
+    """
+    block = []
+    separator = ''
+    try:
+        for line in chain.from_iterable(parts):
+            block.append(line)
+            if len(block) >= EXPORT_BLOCK_LINES:
+                yield separator + '\n'.join(block)
+                separator = '\n'
+                block = []
+        if block:
+            yield separator + '\n'.join(block)
+    except Exception as e:
+        logger.error(f"Error streaming {name} export: {str(e)}")
+        raise
+
+def attempt_records(session_factory: Callable) -> Iterator[Dict]:
+    """Read every login attempt, archived ones first, in the LoginAttempt.to_dict() form.
+
+    The archive files are listed before this returns, so database errors
+    surface before a response starts.
+
+    Args:
+        session_factory: Callable returning a new read session
+
+    Returns:
+        Iterator of attempt dictionaries
+    """
+    with session_factory() as session:
+        archived = attempt_archiver.iter_attempts(session)
+    return chain(archived, iter_attempt_records(session_factory))
+
+# Key lines of the exported JSON objects, in export order
+JSON_KEYS = ("client_ip", "username", "password", "protocol", "country", "city", "region", "latitude",
+             "longitude", "hits", "last_seen", "timestamp")
+_JSON_KEY_PREFIXES = tuple(f'    "{key}": ' for key in JSON_KEYS)
+
+def _json_value(value) -> str:
+    """Encode a value as JSON, handling strings and nulls without a json.dumps() call."""
+    if value is None:
+        return 'null'
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    return json.dumps(value)
+
+def json_lines(records: Iterable[Dict]) -> Iterator[str]:
+    """Format attempts as a JSON array indented like json.dumps(indent=2), one line per attempt object."""
+    yield '['
+    previous = None
+    for record in records:
+        if previous is not None:
+            yield previous + ','
+        previous = '  {\n' + ',\n'.join(
+            prefix + _json_value(record[key]) for prefix, key in zip(_JSON_KEY_PREFIXES, JSON_KEYS)
+        ) + '\n  }'
+    if previous is not None:
+        yield previous
+    yield ']'
+
+def _csv_field(value) -> str:
+    """Quote a text field, doubling its quotes; empty and missing values stay empty."""
+    if value is None or value == "":
+        return ""
+    return '"{}"'.format(str(value).replace('"', '""'))
+
+def csv_lines(records: Iterable[Dict]) -> Iterator[str]:
+    """Format attempts as CSV lines with a header, ending in a newline."""
+    yield CSV_HEADER
+    for record in records:
+        yield ",".join((
+            record['timestamp'] or "",
+            record['protocol'] or "",
+            record['client_ip'] or "",
+            _csv_field(record['username']),
+            _csv_field(record['password']),
+            _csv_field(record['country']),
+            _csv_field(record['city']),
+            _csv_field(record['region']),
+            str(record['latitude']) if record['latitude'] is not None else "",
+            str(record['longitude']) if record['longitude'] is not None else "",
+            str(record['hits']),
+            record['last_seen'] or "",
+        ))
+    yield ""
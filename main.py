@@ -19,16 +19,23 @@ from honeypot.core.rdp_server import RDPHoneypot
 from honeypot.core.sip_server import SIPHoneypot
 from honeypot.core.mysql_server import MySQLHoneypot
 from honeypot.database.models import init_db, start_connection_monitor, get_db, get_connection_stats, SessionLocal
+from honeypot.database.writer import attempt_enricher, attempt_writer
+from honeypot.database.archive import attempt_archiver
 from honeypot.web.app import app
 from honeypot.core.base_server import BaseHoneypot
+from honeypot.core.geolocation import geolocation_service
+from honeypot.core.prefork import PreforkSupervisor
 from honeypot.core.config import (
     HOST, SSH_PORT, TELNET_PORT, FTP_PORT, SMTP_PORT, RDP_PORT, SIP_PORT, MYSQL_PORT, WEB_PORT, 
-    LOG_LEVEL, LOG_FILE, MAX_THREADS, MAX_CONNECTIONS_PER_IP, CONNECTION_TIMEOUT
+    LOG_LEVEL, LOG_FILE, MAX_THREADS, MAX_CONNECTIONS_PER_IP, CONNECTION_TIMEOUT, WORKER_PROCESSES
 )
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Supervisor of the listener worker processes when WORKER_PROCESSES is set
+prefork_supervisor = None
+
 class SafeLogFormatter(logging.Formatter):
     """Custom formatter that sanitizes log messages to prevent control character attacks."""
     
@@ -239,21 +246,47 @@ def periodic_thread_stats():
             
             # Log thread pool stats
             thread_manager = BaseHoneypot.thread_manager
-            active_connections = sum(thread_manager.connections.values())
+            stats = thread_manager.get_stats()
             
             # Count active threads
             active_threads = len(threading.enumerate())
             
-            logger.info(f"Thread stats: {active_connections} active connections, "
-                       f"{len(thread_manager.connections)} unique IPs, "
+            logger.info(f"Thread stats: {stats['active_connections']} active connections, "
+                       f"{stats['unique_ips']} unique IPs, "
+                       f"{stats['busy_workers']}/{stats['max_workers']} busy workers, "
+                       f"{stats['queue_depth']}/{stats['queue_capacity']} queued, "
+                       f"{stats['shed_total']} shed, "
                        f"{active_threads} total threads")
             
+            # Log per-protocol worker usage
+            for pool, pool_stats in stats['pools'].items():
+                logger.info(f"  {pool}: {pool_stats['running']}/{pool_stats['quota'] or stats['max_workers']} workers "
+                           f"({pool_stats['utilization']}%), {pool_stats['queued']} queued")
+            
+            # Log database writer throughput
+            writer_stats = attempt_writer.get_stats()
+            logger.info(f"DB writer: {writer_stats['queue_depth']}/{writer_stats['queue_capacity']} queued, "
+                       f"{writer_stats['rows_written']} rows in {writer_stats['batches']} batches, "
+                       f"{writer_stats['rows_dropped']} dropped, "
+                       f"commit avg {writer_stats['avg_commit_ms']}ms / max {writer_stats['max_commit_ms']}ms")
+            
+            # Log geolocation lookups, and the duplicate fetches avoided by sharing pending ones
+            geo_stats = geolocation_service.get_stats()
+            logger.info(f"Geolocation: {geo_stats['cached']} cached, {geo_stats['pending']} pending, "
+                       f"{geo_stats['api_requests']} API requests, "
+                       f"{geo_stats['coalesced_requests'] + geo_stats['skipped_queue_entries']} duplicate fetches avoided")
+            enrichment_stats = attempt_enricher.get_stats()
+            logger.info(f"Enrichment: {enrichment_stats['lookups_pending']} lookups pending, "
+                       f"{enrichment_stats['attempts_enriched']} attempts located after storing, "
+                       f"{enrichment_stats['lookups_failed']} lookups failed")
+            
             # Add more detailed stats at debug level
             if LOG_LEVEL == 'DEBUG':
                 # Log the busiest IPs
-                if thread_manager.connections:
+                connections_by_ip = thread_manager.registry.connections_by_ip()
+                if connections_by_ip:
                     busiest_ips = sorted(
-                        thread_manager.connections.items(), 
+                        connections_by_ip.items(), 
                         key=lambda x: x[1], 
                         reverse=True
                     )[:10]  # Top 10 IPs
@@ -274,6 +307,13 @@ def signal_handler(sig, frame):
     """Handle termination signals gracefully."""
     logger.info("Received shutdown signal, shutting down...")
     
+    # Stop the listener worker processes
+    if prefork_supervisor:
+        try:
+            prefork_supervisor.stop()
+        except Exception as e:
+            logger.error(f"Error stopping worker processes: {str(e)}")
+
     # Shutdown the thread manager
     try:
         BaseHoneypot.thread_manager.shutdown()
@@ -281,6 +321,15 @@ def signal_handler(sig, frame):
     except Exception as e:
         logger.error(f"Error shutting down thread manager: {str(e)}")
     
+    # Stop archiving; a chunk cut off by the exit stays in the database
+    attempt_archiver.stop()
+    
+    # Write the attempts still queued for the database
+    try:
+        attempt_writer.stop()
+    except Exception as e:
+        logger.error(f"Error flushing database writer: {str(e)}")
+    
     # Additional cleanup if needed
     
     # Exit
@@ -288,6 +337,7 @@ def signal_handler(sig, frame):
 
 def main():
     """Main entry point for the application."""
+    global prefork_supervisor
     try:
         # Set up logging first
         setup_logging()
@@ -301,6 +351,9 @@ def main():
         init_db()
         logger.info("Database initialized successfully")
         
+        # Bring the JSON geolocation cache of earlier versions into the cache file
+        geolocation_service.import_legacy_cache()
+        
         # Start the database connection monitor
         start_connection_monitor()
         logger.info("Database connection monitoring started")
@@ -311,6 +364,10 @@ def main():
         health_check_thread.start()
         logger.info("Database health check thread started")
         
+        # Move old attempts to the archive and delete expired archives, if configured
+        if attempt_archiver.enabled:
+            attempt_archiver.start()
+        
         # Start the thread statistics monitor
         thread_stats_thread = threading.Thread(target=periodic_thread_stats, daemon=True)
         thread_stats_thread.name = "Thread-Stats-Monitor"
@@ -322,8 +379,12 @@ def main():
                    f"max_connections_per_ip={MAX_CONNECTIONS_PER_IP}, "
                    f"connection_timeout={CONNECTION_TIMEOUT}s")
 
-        # Start all registered honeypot servers
-        registry.start_servers()
+        # Start all registered honeypot servers, in worker processes if configured
+        if WORKER_PROCESSES > 0:
+            prefork_supervisor = PreforkSupervisor(WORKER_PROCESSES)
+            prefork_supervisor.start()
+        else:
+            registry.start_servers()
         
         # Display all active ports for debugging
         server_types = registry.get_server_types()